@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#=============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#=============================================================================
+"""Micro-benchmark of the TensorFlow converter's GraphMatcher.
+
+Matches layer sequences like those of the layer resolvers against synthetic
+graphs of convolution blocks, and reports the time of each match_sequence.
+
+usage: graph_matcher_bench.py [--sizes 10000 50000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib', 'python'))
+from converters.tensorflow.graph_matcher import (
+    ConverterSequenceNode,
+    GraphMatcher,
+    GraphSequence,
+    NonConsumableConverterSequenceNode,
+    TFGraphBuilder
+)
+
+
+class SyntheticTensor(object):
+    def __init__(self, op):
+        self.op = op
+
+
+class SyntheticOp(object):
+    """Stands for a tf.Operation, with the attributes TFGraphBuilder uses"""
+    def __init__(self, name, op_type, inputs):
+        self.name = name
+        self.type = op_type
+        self.inputs = [SyntheticTensor(op) for op in inputs]
+
+
+def create_graph(num_ops, seed=0):
+    """Chains of Conv2D/BiasAdd/Relu blocks, with a batchnorm or a residual Add every few blocks"""
+    rnd = random.Random(seed)
+    ops = [SyntheticOp('input', 'Placeholder', [])]
+
+    def add(op_type, inputs):
+        ops.append(SyntheticOp('%s_%d' % (op_type.lower(), len(ops)), op_type, inputs))
+        return ops[-1]
+
+    current = ops[0]
+    while len(ops) < num_ops:
+        block_input = current
+        conv = add('Conv2D', [current, add('Identity', [add('Const', [])])])
+        current = add('Relu', [add('BiasAdd', [conv, add('Const', [])])])
+        choice = rnd.random()
+        if choice < 0.2:
+            scale = add('Mul', [current, add('Const', [])])
+            current = add('Add', [scale, add('Const', [])])
+        elif choice < 0.4:
+            current = add('Add', [current, block_input])
+    return ops
+
+
+def create_sequences():
+    conv_bias_relu = GraphSequence([
+        NonConsumableConverterSequenceNode('inputs', ['?']),
+        ConverterSequenceNode('weights', ['Identity', 'Const']),
+        ConverterSequenceNode('conv', ['Conv2D']),
+        ConverterSequenceNode('bias', ['?']),
+        ConverterSequenceNode('bias_add', ['BiasAdd']),
+        ConverterSequenceNode('relu', ['Relu'])
+    ])
+    conv_bias_relu.set_inputs('conv', ['inputs', 'weights'])
+    conv_bias_relu.set_inputs('bias_add', ['conv', 'bias'])
+    conv_bias_relu.set_inputs('relu', ['bias_add'])
+    conv_bias_relu.set_outputs(['relu'])
+
+    scale_shift = GraphSequence([
+        NonConsumableConverterSequenceNode('inputs', ['?']),
+        ConverterSequenceNode('scale', ['Const']),
+        ConverterSequenceNode('shift', ['Const']),
+        ConverterSequenceNode('mul', ['Mul']),
+        ConverterSequenceNode('add', ['Add'])
+    ])
+    scale_shift.set_inputs('mul', ['inputs', 'scale'])
+    scale_shift.set_inputs('add', ['mul', 'shift'])
+    scale_shift.set_outputs(['add'])
+
+    residual = GraphSequence([
+        NonConsumableConverterSequenceNode('a', ['?']),
+        NonConsumableConverterSequenceNode('b', ['?']),
+        ConverterSequenceNode('add', ['Add'])
+    ])
+    residual.set_inputs('add', ['a', 'b'])
+    residual.set_outputs(['add'])
+
+    relu = GraphSequence([ConverterSequenceNode('relu', ['Relu'])])
+    relu.set_outputs(['relu'])
+    return [('conv_bias_relu', conv_bias_relu), ('scale_shift', scale_shift),
+            ('residual_add', residual), ('relu', relu)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times GraphMatcher.match_sequence on synthetic graphs.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000],
+                        help="Number of ops of the graphs.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measure, the best one is kept.")
+    args = parser.parse_args()
+
+    print "%-10s %-16s %10s %12s" % ('ops', 'sequence', 'matches', 'seconds')
+    for size in args.sizes:
+        builder = TFGraphBuilder(create_graph(size))
+        builder.link_nodes()
+        start = time.time()
+        graph_matcher = GraphMatcher(builder.nodes)
+        print "%-10d %-16s %10s %12.4f" % (size, '(indexing)', '', time.time() - start)
+        for name, sequence in create_sequences():
+            best = None
+            for _ in range(args.repeat):
+                start = time.time()
+                matches = graph_matcher.match_sequence(sequence)
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print "%-10d %-16s %10d %12.4f" % (size, name, len(matches), best)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#=============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#=============================================================================
+"""Micro-benchmark of the TensorFlow converter's TopologyResolver.
+
+Resolves the topology of synthetic layers, chains with residual
+connections and wide branches of layers of a few ops each, and sorts them
+in execution order.
+
+usage: topology_resolver_bench.py [--sizes 1000 5000 20000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib', 'python'))
+from converters.tensorflow.common import InputLayerDescriptor, LayerDescriptor
+from converters.tensorflow.converter import TopologyResolver
+
+
+class SyntheticTensor(object):
+    def __init__(self, op):
+        self.op = op
+        self.name = op.name + ':0'
+
+
+class SyntheticOp(object):
+    """Stands for a tf.Operation, with the attributes TopologyResolver uses"""
+    def __init__(self, name, inputs):
+        self.name = name
+        self.inputs = [op.outputs[0] for op in inputs]
+        self.outputs = [SyntheticTensor(self)]
+
+
+def create_descriptors(num_descriptors, seed=0):
+    """
+    A chain of layers of 1 to 4 ops, where one layer in 4 also reads an earlier layer and one in 8 starts a
+    branch of 8 parallel layers concatenated back.
+    :rtype: (list(LayerDescriptor), list(LayerDescriptor))
+    """
+    rnd = random.Random(seed)
+    input_op = SyntheticOp('input', [])
+    input_descriptors = [InputLayerDescriptor('input', [input_op])]
+    descriptors = []
+    outputs = [input_op]
+
+    def add_layer(inputs):
+        ops = []
+        for i in range(rnd.randint(1, 4)):
+            ops.append(SyntheticOp('layer_{}/op_{}'.format(len(descriptors), i), ops[-1:] + inputs))
+            inputs = []
+        descriptors.append(LayerDescriptor('Synthetic', 'layer_{}'.format(len(descriptors)), ops))
+        return ops[-1]
+
+    while len(descriptors) < num_descriptors:
+        choice = rnd.random()
+        if choice < 0.125:
+            branches = [add_layer([outputs[-1]]) for _ in range(8)]
+            outputs.append(add_layer(branches))
+        elif choice < 0.375:
+            outputs.append(add_layer([outputs[-1], rnd.choice(outputs[-20:])]))
+        else:
+            outputs.append(add_layer([outputs[-1]]))
+    return input_descriptors, descriptors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times TopologyResolver on synthetic layers.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="Number of layers.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measure, the best one is kept.")
+    args = parser.parse_args()
+
+    print "%-10s %18s %18s" % ('layers', 'resolve seconds', 'sort seconds')
+    for size in args.sizes:
+        input_descriptors, descriptors = create_descriptors(size)
+        resolve_time = None
+        sort_time = None
+        for _ in range(args.repeat):
+            resolver = TopologyResolver()
+            start = time.time()
+            resolver.resolve_topology(input_descriptors + descriptors)
+            elapsed = time.time() - start
+            resolve_time = elapsed if resolve_time is None else min(resolve_time, elapsed)
+
+            start = time.time()
+            sorted_descriptors = resolver.sort_descriptors_in_execution_order(descriptors, input_descriptors)
+            elapsed = time.time() - start
+            sort_time = elapsed if sort_time is None else min(sort_time, elapsed)
+            if len(sorted_descriptors) != len(descriptors):
+                raise RuntimeError('Sorted {} layers out of {}'.format(len(sorted_descriptors), len(descriptors)))
+        print "%-10d %18.4f %18.4f" % (size, resolve_time, sort_time)
+
+
+if __name__ == '__main__':
+    main()
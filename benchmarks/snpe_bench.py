@@ -9,7 +9,10 @@ from snpebm_config import *
 from snpebm_device import *
 from snpebm_parser import *
 from snpebm_csvwriter import *
+from snpebm_jsonwriter import *
+from snpebm_compare import snpe_bench_compare, CompareError
 from snpebm_md5 import perform_md5_check
+from snpebm_scheduler import DeviceScheduler
 
 
 def __get_logger(debug,device_id=None):
@@ -42,6 +45,107 @@ def _find_shell_binary_on_target(device, logger):
             sh_path = ''
     return sh_path.rstrip()
 
+def _benchmark_device(device_id, config, args_parser, results_dir, device_msm_os_dict, multi_device):
+    """
+    Syncs artifacts, runs every benchmark and writes the results for one device
+
+    Returns: list of (run_flavor_measure, benchmark) that ran successfully
+    """
+    logger = __get_logger(args_parser.debug_enabled, device_id)
+    if multi_device:
+        # concurrent devices must not share result or command script directories
+        device_results_dir = os.path.join(results_dir, device_id)
+        script_dir = os.path.join(config.host_rootpath, device_id)
+        stats_name = "benchmark_stats_{0}_{1}".format(config.name, device_id)
+    else:
+        device_results_dir = results_dir
+        script_dir = None
+        stats_name = "benchmark_stats_{0}".format(config.name)
+
+    # Dictionary is {"cpu_arm_all_Memory":ZdlSnapDnnCppDroidBenchmark object}
+    benchmarks, _ = BenchmarkFactory.make_benchmarks(config, device_results_dir, script_dir)
+
+    device = DeviceFactory.make_device(device_id, config)
+    test_device_access(device, logger)
+    device_info = get_device_info(device, logger, fatal=((args_parser.device_os_type_override != 'le' and args_parser.device_os_type_override != 'le64')))
+    logger.debug("Perform md5 checksum on %s"%device_id)
+    perform_md5_check(device,[item for sublist in config.artifacts.values() for item in sublist]+config.dnn_model.artifacts, logger)
+    logger.debug("Artifacts on %s passed checksum"%device_id)
+    sh_path = _find_shell_binary_on_target(device, logger)
+
+    benchmarks_ran = []
+    # Run each benchmark on device, and pull results
+    for run_flavor_measure, bm in benchmarks:
+        logger.info(run_flavor_measure)
+        bm.sh_path = sh_path
+        # running iterations of the same runtime.  Two possible failure cases:
+        # 1. Say GPU runtime is not available
+        # 2. Transient failure
+        # For now, for either of those cases, we will mark the whole runtime
+        # as bad, so I break out of for loop as soon as a failure is detected
+        # Warm-up runs come first and are not part of the stats.  In adaptive
+        # mode timing runs continue past config.iterations until converged,
+        # the other measurements have no CONVERGENCE_CHANNEL to converge on.
+        adaptive = config.convergence_percent is not None and bm._measurement.type == MEASURE_TIMING
+        max_runs = config.max_iterations if adaptive else config.iterations
+        failed = False
+        runs = 0
+        for i in range(1, config.warmup_iterations + max_runs + 1):
+            warmup = i <= config.warmup_iterations
+            run = i if warmup else i - config.warmup_iterations
+            logger.info(("Warm-up run " if warmup else "Run ") + str(run))
+            bm.run_number(run, warmup)
+            device.execute(bm.pre_commands, logger)
+            device.start_measurement(bm, logger)
+            #Sleep to let things cool off
+            if args_parser.sleep != 0:
+                logger.debug("Sleeping: " + str(args_parser.sleep))
+                sleep(args_parser.sleep)
+            try:
+                device.execute(bm.commands, logger)
+            except AdbShellCmdFailedException as e:
+                logger.warning('Failed to perform benchmark for %s.' % run_flavor_measure)
+                failed = True
+                break
+            finally:
+                device.stop_measurement(bm, logger)
+
+            device.execute(bm.post_commands, logger)
+            if warmup:
+                continue
+            bm.process_results(logger)
+            runs = run
+            if run >= config.iterations and (not adaptive or
+                                              bm._measurement.converged(CONVERGENCE_CHANNEL, config.convergence_percent)):
+                break
+        if not failed:
+            if adaptive:
+                if bm._measurement.converged(CONVERGENCE_CHANNEL, config.convergence_percent):
+                    logger.info('%s converged within %s%% after %d runs' % (run_flavor_measure, config.convergence_percent, runs))
+                else:
+                    logger.warning('%s did not converge within %s%% after %d runs' % (run_flavor_measure, config.convergence_percent, runs))
+            benchmarks_ran.append((run_flavor_measure, bm))
+
+    if len(benchmarks_ran) == 0:
+        logger.error('None of the selected benchmarks ran, therefore no results reported')
+        sys.exit(ERRNUM_NOBENCHMARKRAN_ERROR)
+    else:
+        if(device_msm_os_dict != None):
+            chipset = ('Chipset' , device_msm_os_dict[device_id][1])
+            OS = ()
+            if(device_msm_os_dict[device_id][2] == ''):
+                OS = ('OS', device_msm_os_dict[device_id][3])
+            else:
+                OS = ('OS', device_msm_os_dict[device_id][2])
+            device_info.append(chipset)
+            device_info.append(OS)
+        csv_writer = CsvWriterFactory.make_csv_writer(benchmarks_ran, config, device_info, args_parser.sleep, logger)
+        csv_writer.write(os.path.join(results_dir, stats_name + ".csv"), logger)
+        json_writer = JsonWriterFactory.make_json_writer(benchmarks_ran, config, device_id, device_info, args_parser.sleep, logger)
+        json_writer.write(os.path.join(results_dir, stats_name + ".json"), logger)
+        json_writer.append_jsonl(os.path.join(config.host_resultspath, BENCHMARK_RESULTS_JSONL_NAME), results_dir, logger)
+    return benchmarks_ran
+
 def snpe_bench(program_name,args_list, device_msm_os_dict=None):
     try:
         args_parser = ArgsParser(program_name,args_list)
@@ -59,66 +163,33 @@ def snpe_bench(program_name,args_list, device_msm_os_dict=None):
         # Set environment variable needed by some of the classes we use
         os.environ[SNPE_BENCH_ROOT] = config.host_rootpath
 
-        # Dictionary is {"cpu_arm_all_Memory":ZdlSnapDnnCppDroidBenchmark object}
-        benchmarks, results_dir = BenchmarkFactory.make_benchmarks(config)
-
-        # Now loop through all the devices and run the benchmarks on them
-        for device_id in config.devices:
-            device = DeviceFactory.make_device(device_id, config)
-            test_device_access(device, logger)
-            device_info = get_device_info(device, logger, fatal=((args_parser.device_os_type_override != 'le' and args_parser.device_os_type_override != 'le64')))
-            logger.debug("Perform md5 checksum on %s"%device_id)
-            perform_md5_check(device,[item for sublist in config.artifacts.values() for item in sublist]+config.dnn_model.artifacts, logger)
-            logger.debug("Artifacts on %s passed checksum"%device_id)
-            sh_path = _find_shell_binary_on_target(device, logger)
-
-            benchmarks_ran = []
-            # Run each benchmark on device, and pull results
-            for run_flavor_measure, bm in benchmarks:
-                logger.info(run_flavor_measure)
-                bm.sh_path = sh_path
-                # running iterations of the same runtime.  Two possible failure cases:
-                # 1. Say GPU runtime is not available
-                # 2. Transient failure
-                # For now, for either of those cases, we will mark the whole runtime
-                # as bad, so I break out of for loop as soon as a failure is detected
-                for i in range(1, config.iterations + 1):
-                    logger.info("Run " + str(i))
-                    bm.run_number(i)
-                    device.execute(bm.pre_commands, logger)
-                    device.start_measurement(bm, logger)
-                    #Sleep to let things cool off
-                    if args_parser.sleep != 0:
-                        logger.debug("Sleeping: " + str(args_parser.sleep))
-                        sleep(args_parser.sleep)
-                    try:
-                        device.execute(bm.commands, logger)
-                    except AdbShellCmdFailedException as e:
-                        logger.warning('Failed to perform benchmark for %s.' % run_flavor_measure)
-                        break
-                    finally:
-                        device.stop_measurement(bm, logger)
-
-                    device.execute(bm.post_commands, logger)
-                    bm.process_results(logger)
-                else:  # Ran through iterations without failing
-                    benchmarks_ran.append((run_flavor_measure, bm))
-
-            if len(benchmarks_ran) == 0:
-                logger.error('None of the selected benchmarks ran, therefore no results reported')
-                sys.exit(ERRNUM_NOBENCHMARKRAN_ERROR)
-            else:
-                if(device_msm_os_dict != None):
-                    chipset = ('Chipset' , device_msm_os_dict[device_id][1])
-                    OS = ()
-                    if(device_msm_os_dict[device_id][2] == ''):
-                        OS = ('OS', device_msm_os_dict[device_id][3])
-                    else:
-                        OS = ('OS', device_msm_os_dict[device_id][2])
-                    device_info.append(chipset)
-                    device_info.append(OS)
-                csv_writer = CsvWriterFactory.make_csv_writer(benchmarks_ran, config, device_info, args_parser.sleep, logger)
-                csv_writer.write(os.path.join(results_dir, "benchmark_stats_{0}.csv".format(config.name)), logger)
+        results_dir = SnapDnnCppDroidBenchmark.create_host_result_dir(config.host_resultspath)
+
+        multi_device = len(config.devices) > 1
+        max_workers = args_parser.max_parallel_devices
+        if MEASURE_POWER in config.measurements:
+            # there is only one power monitor attached to the host
+            max_workers = 1
+        scheduler = DeviceScheduler(config.devices, max_workers)
+        if multi_device:
+            logger.info("Benchmarking {0} devices, {1} at a time".format(len(config.devices), scheduler.max_workers))
+
+        # Now run the benchmarks on all the devices
+        device_results = scheduler.run(_benchmark_device, config, args_parser, results_dir, device_msm_os_dict, multi_device)
+
+        device_benchmarks = [(device_id, benchmarks_ran)
+                             for device_id, (benchmarks_ran, error) in device_results.iteritems() if error is None]
+        if multi_device and device_benchmarks:
+            summary_writer = SummaryCsvWriter(device_benchmarks)
+            summary_writer.write(os.path.join(results_dir, "benchmark_stats_{0}_summary.csv".format(config.name)), logger)
+
+        errors = [(device_id, error) for device_id, (_, error) in device_results.iteritems() if error is not None]
+        for device_id, error in errors:
+            if not isinstance(error, SystemExit):
+                logger.error("Benchmarking failed on {0}: {1}".format(device_id, error))
+        if errors:
+            # surface the first failure through the error codes below
+            raise errors[0][1]
 
     except ConfigError as ce:
         print ce
@@ -133,5 +204,16 @@ def snpe_bench(program_name,args_list, device_msm_os_dict=None):
         print e
         sys.exit(ERRNUM_GENERALEXCEPTION_ERROR)
 
+def snpe_bench_compare_main(program_name, args_list):
+    logger = __get_logger(False)
+    try:
+        sys.exit(snpe_bench_compare(program_name, args_list, logger))
+    except CompareError as ce:
+        print ce
+        sys.exit(ERRNUM_GENERALEXCEPTION_ERROR)
+
 if __name__ == "__main__":
-    snpe_bench(sys.argv[0],sys.argv[1:])
+    if sys.argv[1:2] == ['compare']:
+        snpe_bench_compare_main(sys.argv[0] + ' compare', sys.argv[2:])
+    else:
+        snpe_bench(sys.argv[0],sys.argv[1:])
@@ -1,14 +1,20 @@
 from abc import ABCMeta, abstractproperty, abstractmethod
 from snpebm_config_restrictions import *
 from snpebm_parser import LogParserFactory
+from snpebm_stats import SampleStats
 from collections import OrderedDict
 import time
 import os
 
 
 class BenchmarkStat:
+    PERCENTILES = [50, 90, 95, 99]
+
     def __init__(self, log_parser, stat_type):
         self._stats = []
+        self._distributions = OrderedDict()
+        # per channel, run index to number of samples of that run
+        self._run_sample_counts = OrderedDict()
         self._log_parser = log_parser
         self._type = stat_type
         return
@@ -24,12 +30,90 @@ class BenchmarkStat:
     def type(self):
         return self._type
 
+    def _add_data_frame(self, data_frame):
+        # the samples live on in the distributions only, so that memory
+        # stays bounded once these are sketched
+        run_index = len(self._stats)
+        self._stats.append(data_frame)
+        for channel, samples in data_frame.samples.iteritems():
+            if channel not in self._distributions:
+                self._distributions[channel] = SampleStats()
+                self._run_sample_counts[channel] = OrderedDict()
+            self._distributions[channel].extend(samples)
+            self._run_sample_counts[channel][run_index] = len(samples)
+        data_frame.drop_samples()
+
     def _process(self, input_dir, logger):
         data_frame = self._log_parser.parse(input_dir, logger)
-        self._stats.append(data_frame)
+        self._add_data_frame(data_frame)
         if self._type == MEASURE_POWER:
             self._log_parser.plot(input_dir, logger)
 
+    @property
+    def distributions(self):
+        """
+        SampleStats per channel, for the channels whose samples are known
+        """
+        return self._distributions
+
+    def run_samples(self, channel):
+        """
+        Samples of channel per run, None for the runs without samples, or
+        None altogether once the distribution of channel is sketched
+        """
+        dist = self._distributions.get(channel)
+        if dist is None:
+            return [None] * len(self._stats)
+        if not dist.is_exact:
+            return None
+        counts = self._run_sample_counts[channel]
+        runs = []
+        offset = 0
+        for run_index in range(len(self._stats)):
+            count = counts.get(run_index)
+            if count is None:
+                runs.append(None)
+            else:
+                runs.append(list(dist.samples[offset:offset + count]))
+                offset += count
+        return runs
+
+    def run_averages(self, channel):
+        """
+        Average of channel per run, None for the runs without it
+        """
+        averages = []
+        for stat in self._stats:
+            _sum, _len = 0, 0
+            for _channel, channel_sum, channel_len, _max, _min in stat:
+                if _channel == channel:
+                    _sum += channel_sum
+                    _len += channel_len
+            averages.append(float(_sum) / _len if _len else None)
+        return averages
+
+    def percentile(self, p):
+        return OrderedDict((channel, dist.percentile(p)) for channel, dist in self._distributions.iteritems())
+
+    def converged(self, channel, percent):
+        """
+        True once the 95% confidence interval of the mean of channel is
+        within percent of the mean
+        """
+        dist = self._distributions.get(channel)
+        if dist is None or not dist.mean:
+            return False
+        half_width = dist.confidence_interval()
+        return half_width is not None and half_width / abs(dist.mean) * 100 <= percent
+
+    @property
+    def stddev(self):
+        return OrderedDict((channel, dist.stddev) for channel, dist in self._distributions.iteritems())
+
+    @property
+    def cv(self):
+        return OrderedDict((channel, dist.cv) for channel, dist in self._distributions.iteritems())
+
     @property
     def average(self):
         avg_dict = OrderedDict()
@@ -72,7 +156,7 @@ class ValidateModelBenchmarkStat(BenchmarkStat):
 
     def _process(self, input_dir, logger):
         data_frame = self._log_parser.parse(input_dir, logger)
-        self._stats.append(data_frame)
+        self._add_data_frame(data_frame)
         if self._type == MEASURE_ACCURACY:
             logger.info('_process for accuracy, input_dir: ' + input_dir)
 
@@ -93,15 +177,34 @@ class BenchmarkFactory:
         pass
 
     @staticmethod
-    def make_benchmarks(config):
+    def make_benchmarks(config, host_result_dir=None, host_script_dir=None):
+        """
+        Creates the benchmarks for every run flavor and measurement
+
+        Args:
+            config: benchmark configuration
+            host_result_dir: existing results directory to use instead of
+                             creating a new timestamped one
+            host_script_dir: directory the per run command script is
+                             generated in, defaults to $SNPE_BENCH_ROOT.
+                             Benchmarks running concurrently on different
+                             devices need distinct directories
+
+        Returns: list of [run_flavor_measure, benchmark], results directory
+        """
         assert config, "config is required"
         assert config.measurement_types_are_valid(), "You asked for %s, but only these types of measurements are supported: %s"%(config.measurements,CONFIG_VALID_MEASURMENTS)
         host_result_dirs = {}
         for arch in config.architectures:
             if arch == ARCH_AARCH64 or arch == ARCH_ARM:
                 if 'droid' not in host_result_dirs:
-                    host_result_dirs['droid'] = \
-                        SnapDnnCppDroidBenchmark.create_host_result_dir(config.host_resultspath)
+                    if host_result_dir is not None:
+                        if not os.path.isdir(host_result_dir):
+                            os.makedirs(host_result_dir)
+                        host_result_dirs['droid'] = host_result_dir
+                    else:
+                        host_result_dirs['droid'] = \
+                            SnapDnnCppDroidBenchmark.create_host_result_dir(config.host_resultspath)
 
         benchmarks = []
         for flavor in config.return_valid_run_flavors():
@@ -124,6 +227,7 @@ class BenchmarkFactory:
                     ).measurement(BenchmarkStat(parser, measurement))
                      .runtime(flavor)
                      .host_output_dir(host_result_dirs['droid'])
+                     .host_script_dir(host_script_dir)
                      .name(flavor)])
                 else:
                     # regular - no debug
@@ -141,6 +245,7 @@ class BenchmarkFactory:
                     ).measurement(ValidateModelBenchmarkStat(parser, measurement))
                      .runtime(flavor)
                      .host_output_dir(host_result_dirs['droid'])
+                     .host_script_dir(host_script_dir)
                      .name(flavor_str)
                      .debug(False)
                      .output_layer_name(config.dnn_model.output_layer_name)])
@@ -159,6 +264,7 @@ class BenchmarkFactory:
                     ).measurement(ValidateModelBenchmarkStat(parser, measurement))
                      .runtime(flavor)
                      .host_output_dir(host_result_dirs['droid'])
+                     .host_script_dir(host_script_dir)
                      .name(flavor_str)
                      .debug(True)
                      .output_layer_name(config.dnn_model.output_layer_name)])
@@ -220,11 +326,13 @@ class SnapDnnCppDroidBenchmark(AbstractBenchmark):
         self._output_dir = 'output'
         self._host_output_dir = None
         self._host_result_dir = None
+        self._host_script_dir = None
         self._debug = False
         self._runtime = RUNTIME_CPU
         self._rnn = False
         self._name = None
         self._run_number = 0
+        self._warmup = False
         self._measurement = None
         self.sh_path ='/system/bin/sh'
         self.userbuffer_mode = userbuffer_mode
@@ -240,6 +348,10 @@ class SnapDnnCppDroidBenchmark(AbstractBenchmark):
     def host_result_dir(self):
         return self._host_result_dir
 
+    def host_script_dir(self, host_script_dir):
+        self._host_script_dir = host_script_dir
+        return self
+
     def name(self, name):
         self._name = name
         return self
@@ -248,8 +360,9 @@ class SnapDnnCppDroidBenchmark(AbstractBenchmark):
         self._output_dir = output_dir
         return self
 
-    def run_number(self, n):
+    def run_number(self, n, warmup=False):
         self._run_number = n
+        self._warmup = warmup
 
     def debug(self, debug):
         self._debug = debug
@@ -299,7 +412,12 @@ class SnapDnnCppDroidBenchmark(AbstractBenchmark):
         if self.cpu_fallback:
             run_cmd += " --enable_cpu_fallback"
         cmds.append(run_cmd)
-        cmd_script_path = os.path.join(os.environ[SNPE_BENCH_ROOT], SNPE_BENCH_SCRIPT)
+        script_dir = self._host_script_dir
+        if script_dir is None:
+            script_dir = os.environ[SNPE_BENCH_ROOT]
+        if not os.path.isdir(script_dir):
+            os.makedirs(script_dir)
+        cmd_script_path = os.path.join(script_dir, SNPE_BENCH_SCRIPT)
         if os.path.isfile(cmd_script_path):
             os.remove(cmd_script_path)
         cmd_script = open(cmd_script_path, 'w')
@@ -313,7 +431,8 @@ class SnapDnnCppDroidBenchmark(AbstractBenchmark):
     @property
     def pre_commands(self):
         self._host_result_dir = os.path.join(
-            self._host_output_dir, self._measurement.type, self._name, "Run" + str(self._run_number))
+            self._host_output_dir, self._measurement.type, self._name,
+            ("Warmup" if self._warmup else "Run") + str(self._run_number))
         os.makedirs(self._host_result_dir)
         cmd_script = self.__create_script()
         diag_rm_files = os.path.join(self._model_dir, SNPE_BENCH_DIAG_REMOVE)
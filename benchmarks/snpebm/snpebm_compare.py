@@ -0,0 +1,215 @@
+import argparse
+import glob
+import json
+import math
+import os
+from collections import OrderedDict
+from snpebm_constants import *
+from snpebm_parser import DroidTimingLogParser
+
+
+class CompareError(Exception):
+    def __str__(self):
+        return '\nCompare Error: ' + self.message + '\n'
+
+
+def mann_whitney_u(baseline, candidate):
+    """
+    One sided Mann-Whitney U test that candidate samples tend to be larger
+    than baseline samples, with the normal approximation (tie and continuity
+    corrected)
+
+    Returns: (U statistic of candidate, p-value)
+    """
+    n1 = len(baseline)
+    n2 = len(candidate)
+    assert n1 and n2, "both sample sets must be non empty"
+    combined = sorted([(value, 0) for value in baseline] + [(value, 1) for value in candidate])
+    n = n1 + n2
+    ranks = [0.0] * n
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        # tied values share the average of their ranks (1 based)
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2.0 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 1)
+    u = rank_sum - n2 * (n2 + 1) / 2.0
+    mu = n1 * n2 / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return u, 1.0
+    z = (u - mu - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+class ResultSet:
+    """
+    Samples of a results directory, from the json written by JsonResultsWriter
+
+    Keyed by (device, flavor, measurement, channel)
+    """
+    def __init__(self, results_dir):
+        self._results_dir = os.path.realpath(results_dir)
+        self._samples = OrderedDict()
+        json_files = sorted(glob.glob(os.path.join(self._results_dir, "benchmark_stats_*.json")))
+        if not json_files:
+            raise CompareError("No benchmark_stats_*.json found in {0}".format(results_dir))
+        for json_file in json_files:
+            with open(json_file, 'r') as results_file:
+                results = json.load(results_file)
+            device = results["device"]
+            for flavor, measurements in results["results"].iteritems():
+                for measure_type, measurement in measurements.iteritems():
+                    if measure_type == MEASURE_ACCURACY:
+                        continue
+                    for channel, channel_results in measurement["channels"].iteritems():
+                        if channel_results["runs"] is not None:
+                            samples = [sample for run in channel_results["runs"] if run for sample in run]
+                        else:
+                            # too many samples were taken to keep them, compare the run averages
+                            samples = [avg for avg in channel_results.get("run_averages", []) if avg is not None]
+                        if samples:
+                            self._samples[(device, flavor, measure_type, channel)] = samples
+
+    @property
+    def results_dir(self):
+        return self._results_dir
+
+    @property
+    def devices(self):
+        return set(key[0] for key in self._samples)
+
+    def samples(self, match_devices=True):
+        if match_devices:
+            return self._samples
+        # a single device on each side, compare across serial numbers
+        return OrderedDict((key[1:], samples) for key, samples in self._samples.iteritems())
+
+
+class Comparison:
+    def __init__(self, key, baseline, candidate, threshold, alpha, min_samples):
+        self.key = key
+        self.baseline = _median(baseline)
+        self.candidate = _median(candidate)
+        if self.baseline:
+            self.change = (self.candidate - self.baseline) / abs(self.baseline) * 100
+        else:
+            self.change = 0.0 if not self.candidate else float('inf')
+        self.tested = len(baseline) >= min_samples and len(candidate) >= min_samples
+        self.p_value = mann_whitney_u(baseline, candidate)[1] if self.tested else None
+        self.regression = self.change > threshold and (not self.tested or self.p_value < alpha)
+
+    @property
+    def channel(self):
+        return self.key[-1]
+
+
+class BenchmarkComparator:
+    """
+    Compares two result sets channel by channel.  A channel regressed when its
+    median grew by more than the threshold (in percent) and, given enough
+    samples, the Mann-Whitney test says the growth is significant.  Major
+    statistics and memory use threshold, layers use layer_threshold.
+    """
+    def __init__(self, threshold=5.0, layer_threshold=10.0, alpha=0.05, min_samples=3, include_layers=True):
+        self._threshold = threshold
+        self._layer_threshold = layer_threshold
+        self._alpha = alpha
+        self._min_samples = min_samples
+        self._include_layers = include_layers
+
+    @staticmethod
+    def is_layer(channel):
+        return channel not in DroidTimingLogParser.MAJOR_STATISTICS.values() and channel.startswith("layer_")
+
+    def compare(self, baseline, candidate, logger):
+        match_devices = True
+        if baseline.devices != candidate.devices:
+            if len(baseline.devices) == 1 and len(candidate.devices) == 1:
+                logger.info("Comparing device {0} against {1}".format(list(baseline.devices)[0], list(candidate.devices)[0]))
+                match_devices = False
+            else:
+                logger.warning("Only comparing the devices in both result sets: {0}".format(
+                    sorted(baseline.devices & candidate.devices)))
+        baseline_samples = baseline.samples(match_devices)
+        candidate_samples = candidate.samples(match_devices)
+        comparisons = []
+        for key, samples in candidate_samples.iteritems():
+            if key not in baseline_samples:
+                continue
+            layer = self.is_layer(key[-1])
+            if layer and not self._include_layers:
+                continue
+            threshold = self._layer_threshold if layer else self._threshold
+            comparisons.append(Comparison(key, baseline_samples[key], samples, threshold, self._alpha, self._min_samples))
+        missing = [key for key in baseline_samples if key not in candidate_samples]
+        for key in missing:
+            logger.warning("{0} is missing from the candidate results".format('/'.join(key)))
+        return comparisons
+
+
+def _format_comparison(comparison):
+    p_value = "n/a" if comparison.p_value is None else "%.4f" % comparison.p_value
+    return "{0:<60} {1:>14.1f} {2:>14.1f} {3:>+9.1f}% {4:>8} {5}".format(
+        '/'.join(comparison.key), comparison.baseline, comparison.candidate, comparison.change, p_value,
+        "REGRESSION" if comparison.regression else "")
+
+
+def snpe_bench_compare(program_name, args_list, logger):
+    """
+    Entry point of "snpe_bench.py compare <baseline> <candidate>"
+
+    Returns: 0, or ERRNUM_REGRESSION_DETECTED when a regression is found
+    """
+    parser = argparse.ArgumentParser(prog=program_name,
+                                     description="Compare the results of two {0} runs".format(SNPE_BENCH_NAME))
+    parser.add_argument('baseline', help='Baseline results directory (e.g. a timestamped dir or latest_results)')
+    parser.add_argument('candidate', help='Candidate results directory')
+    parser.add_argument('--threshold', type=float, default=5.0,
+                        help='Percentage growth of a major statistic or memory channel considered a regression, default 5')
+    parser.add_argument('--layer_threshold', type=float, default=10.0,
+                        help='Percentage growth of a layer time considered a regression, default 10')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help='Significance level of the Mann-Whitney test, default 0.05')
+    parser.add_argument('--min_samples', type=int, default=3,
+                        help='Below this many samples on either side only the threshold applies, default 3')
+    parser.add_argument('--ignore_layers', action='store_true',
+                        help='Only compare major statistics and memory')
+    parser.add_argument('--all', action='store_true',
+                        help='Report every channel, not only regressions')
+    args = parser.parse_args(args_list)
+
+    baseline = ResultSet(args.baseline)
+    candidate = ResultSet(args.candidate)
+    logger.info("Baseline: {0}".format(baseline.results_dir))
+    logger.info("Candidate: {0}".format(candidate.results_dir))
+    comparator = BenchmarkComparator(args.threshold, args.layer_threshold, args.alpha, args.min_samples,
+                                     not args.ignore_layers)
+    comparisons = comparator.compare(baseline, candidate, logger)
+    regressions = [comparison for comparison in comparisons if comparison.regression]
+
+    print("{0:<60} {1:>14} {2:>14} {3:>10} {4:>8}".format("channel", "baseline p50", "candidate p50", "change", "p-value"))
+    for comparison in sorted(comparisons, key=lambda c: c.change, reverse=True):
+        if args.all or comparison.regression:
+            print(_format_comparison(comparison))
+    end_to_end = [c for c in regressions if not comparator.is_layer(c.channel)]
+    logger.info("{0} channels compared, {1} end-to-end and {2} per-layer regressions".format(
+        len(comparisons), len(end_to_end), len(regressions) - len(end_to_end)))
+    if regressions:
+        return ERRNUM_REGRESSION_DETECTED
+    return 0
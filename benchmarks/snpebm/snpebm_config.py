@@ -192,7 +192,7 @@ class Config:
             # NOTE: We do not validate the values provided for that key
             for _key in CONFIG_JSON_ROOTKEYS:
                 # check optional keys
-                if not _key is CONFIG_PERF_PROFILE_KEY and not _key is CONFIG_CPU_FALLBACK_KEY:
+                if _key not in CONFIG_JSON_OPTIONAL_ROOTKEYS:
                     if self._cfg_from_json[_key] is 'null':
                         raise ConfigError("Missing value for " + _key)
             # Check for no foreign top level keys
@@ -230,12 +230,29 @@ class Config:
                     elif not os.path.dirname(_artifact_path):
                         if not os.path.exists(self.__default_artifact_path(_compiler, _artifact_path)):
                             raise ConfigError("Could not find {0} for {1}, path used {2}".format(_artifact_path, _compiler, self.__default_artifact_path(_compiler, _artifact_path)))
-        # at the momemnt, despite devices takes in a list, benchmark does not work correctly when multiple devices are specified
+        # multiple devices are benchmarked concurrently, one worker per device
         device_list = self._cfg_from_json.get(CONFIG_DEVICES_KEY, None)
-        if len(device_list) == 0 or not device_list[0]:
+        if not device_list or not device_list[0]:
             raise ConfigError('Benchmark does not have any device specified')
-        elif len(device_list) != 1:
-            raise ConfigError('Benchmark does not yet support more than 1 device')
+        elif len(set(device_list)) != len(device_list):
+            raise ConfigError('Benchmark device list contains duplicates: %s' % device_list)
+
+        # Warm-up and adaptive runs are optional
+        for _key in [CONFIG_WARMUP_RUNS_KEY, CONFIG_MAX_RUNS_KEY]:
+            _value = self._cfg_from_json.get(_key, 0)
+            if isinstance(_value, bool) or not isinstance(_value, int) or _value < 0:
+                raise ConfigError('%s must be a non negative integer' % _key)
+        _value = self._cfg_from_json.get(CONFIG_CONVERGENCE_PERCENT_KEY, None)
+        if _value is not None and (isinstance(_value, bool) or not isinstance(_value, (int, float)) or _value <= 0):
+            raise ConfigError('%s must be a positive percentage' % CONFIG_CONVERGENCE_PERCENT_KEY)
+        if CONFIG_MAX_RUNS_KEY in self._cfg_from_json:
+            if self._cfg_from_json[CONFIG_MAX_RUNS_KEY] < self._cfg_from_json[CONFIG_RUNS_KEY]:
+                raise ConfigError('%s can not be less than %s' % (CONFIG_MAX_RUNS_KEY, CONFIG_RUNS_KEY))
+            if _value is None:
+                self._logger.warning('%s is ignored without %s' % (CONFIG_MAX_RUNS_KEY, CONFIG_CONVERGENCE_PERCENT_KEY))
+        _value = self._cfg_from_json.get(CONFIG_MEM_SAMPLE_INTERVAL_KEY, DEFAULT_MEM_SAMPLE_INTERVAL_MS)
+        if isinstance(_value, bool) or not isinstance(_value, (int, float)) or _value <= 0:
+            raise ConfigError('%s must be a positive number of milliseconds' % CONFIG_MEM_SAMPLE_INTERVAL_KEY)
 
         # Measurements allowed are "timing" and "mem"
         if  0 == len(self._cfg_from_json.get(CONFIG_MEASUREMENTS_KEY, None)):
@@ -282,6 +299,12 @@ class Config:
         _csvrows.append([CONFIG_DEVICE_PATH_KEY] + [self.device_path])
         _csvrows.append([CONFIG_DEVICES_KEY] + [','.join(self.devices)])
         _csvrows.append([CONFIG_RUNS_KEY] + [self.iterations])
+        _csvrows.append([CONFIG_WARMUP_RUNS_KEY] + [self.warmup_iterations])
+        if self.convergence_percent is not None:
+            _csvrows.append([CONFIG_CONVERGENCE_PERCENT_KEY] + [self.convergence_percent])
+            _csvrows.append([CONFIG_MAX_RUNS_KEY] + [self.max_iterations])
+        if MEASURE_MEM in self.measurements:
+            _csvrows.append([CONFIG_MEM_SAMPLE_INTERVAL_KEY] + [self.mem_sample_interval_ms])
         _csvrows.append([CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_NAME_SUBKEY] + [self.dnn_model.name])
         _csvrows.append([CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_DLC_SUBKEY] + [self.dnn_model.dlc])
         _csvrows.append([CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_INPUTLIST_SUBKEY] + [self.dnn_model.input_list_name])
@@ -323,6 +346,34 @@ class Config:
     def iterations(self):
         return self._cfg_from_json[CONFIG_RUNS_KEY]
 
+    @property
+    def warmup_iterations(self):
+        """
+        Runs executed before the measured ones and excluded from the stats
+        """
+        return self._cfg_from_json.get(CONFIG_WARMUP_RUNS_KEY, 0)
+
+    @property
+    def convergence_percent(self):
+        """
+        When set, runs continue past iterations until the confidence interval
+        of CONVERGENCE_CHANNEL is within this percentage of its mean
+        """
+        return self._cfg_from_json.get(CONFIG_CONVERGENCE_PERCENT_KEY, None)
+
+    @property
+    def max_iterations(self):
+        if self.convergence_percent is None:
+            return self.iterations
+        return self._cfg_from_json.get(CONFIG_MAX_RUNS_KEY, self.iterations * DEFAULT_MAX_RUNS_FACTOR)
+
+    @property
+    def mem_sample_interval_ms(self):
+        """
+        Interval between two samples of the on target memory sampler
+        """
+        return self._cfg_from_json.get(CONFIG_MEM_SAMPLE_INTERVAL_KEY, DEFAULT_MEM_SAMPLE_INTERVAL_MS)
+
     @property
     def dnn_model(self):
         return self._dnnmodel
@@ -485,6 +536,10 @@ class Config:
                 ('  %s:%s \n' % (CONFIG_DEVICES_KEY, self.devices)) +
                 ('  %s:%s\n' % (CONFIG_DEVICE_PATH_KEY, self.device_path)) +
                 ('  %s:%s\n' % (CONFIG_RUNS_KEY, self.iterations)) +
+                ('  %s:%s\n' % (CONFIG_WARMUP_RUNS_KEY, self.warmup_iterations)) +
+                ('  %s:%s\n' % (CONFIG_CONVERGENCE_PERCENT_KEY, self.convergence_percent)) +
+                ('  %s:%s\n' % (CONFIG_MAX_RUNS_KEY, self.max_iterations)) +
+                ('  %s:%s\n' % (CONFIG_MEM_SAMPLE_INTERVAL_KEY, self.mem_sample_interval_ms)) +
                 ('  %s:%s\n' % (CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_NAME_SUBKEY , self._dnnmodel.name)) +
                 ('  %s:%s\n' % (CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_DLC_SUBKEY , self._dnnmodel.dlc)) +
                 ('  %s:%s\n' % (CONFIG_MODEL_KEY + ":" + CONFIG_MODEL_DATA_SUBKEY, self._cfg_from_json[CONFIG_MODEL_KEY][CONFIG_MODEL_DATA_SUBKEY])) +
@@ -69,9 +69,24 @@ MEASURE_MEM = "mem"
 MEASURE_POWER = "power"
 MEASURE_ACCURACY = "accuracy"
 
+DIAG_RECORD_VERSION = 'version'
+DIAG_RECORD_STATISTIC = 'statistic'
+DIAG_RECORD_LAYER = 'layer'
+
+# adaptive runs stop once the confidence interval of this channel is narrow enough
+CONVERGENCE_CHANNEL = "Total Inference Time"
+DEFAULT_MAX_RUNS_FACTOR = 10
+
 LATEST_RESULTS_LINK_NAME = "latest_results"
+# one json record per channel of every run, appended to in HostResultsDir
+BENCHMARK_RESULTS_JSONL_NAME = "benchmark_results.jsonl"
 
 MEM_LOG_FILE_NAME = "MemLog.txt"
+# on target sampler writing MemLog.txt, and the per sample csv made from it
+MEM_SAMPLER_SCRIPT_NAME = "snpebm_mem_sampler.sh"
+MEM_SAMPLER_PID_FILE_NAME = "snpebm_mem_sampler.pid"
+MEM_TIMESERIES_FILE_NAME = "MemTimeSeries.csv"
+DEFAULT_MEM_SAMPLE_INTERVAL_MS = 50
 POWER_LOG_FILE_NAME = "power_output.json"
 POWER_LOG_PLOT_NAME = "power_plot.png"
 
@@ -84,3 +99,4 @@ ERRNUM_MD5CHECKSUM_FILE_NOT_FOUND_ON_DEVICE = 14
 ERRNUM_MD5CHECKSUM_CHECKSUM_MISMATCH = 15
 ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR = 16
 ERRNUM_NOBENCHMARKRAN_ERROR = 17
+ERRNUM_REGRESSION_DETECTED = 18
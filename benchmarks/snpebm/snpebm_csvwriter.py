@@ -34,6 +34,20 @@ class CsvWriter:
         writer.writerow([])
         return
 
+    @staticmethod
+    def __columns(measurement, unit):
+        """
+        Returns: list of (header, dict of channel to value) for a benchmark
+        """
+        columns = [("avg ({0})".format(unit), measurement.average),
+                   ("max ({0})".format(unit), measurement.max),
+                   ("min ({0})".format(unit), measurement.min)]
+        for p in measurement.PERCENTILES:
+            columns.append(("p{0} ({1})".format(p, unit), measurement.percentile(p)))
+        columns.append(("stddev ({0})".format(unit), measurement.stddev))
+        columns.append(("cv", measurement.cv))
+        return columns
+
     def write(self, csv_file_path, logger):
         csv_file = open(csv_file_path, 'wt')
         try:
@@ -43,41 +57,36 @@ class CsvWriter:
                 header_row = [self.SPACE]
                 header_row_2 = [self.SPACE]
                 data_rows = OrderedDict()
-                bmcount = 0
+                padding = 0
                 for bm in bms:
+                    unit = self.UNITS[measure_type]
+                    columns = self.__columns(bm._measurement, unit)
+                    # adaptive runs may stop anywhere past config.iterations
+                    runs = len(bm._measurement.stats)
                     if (self._sleeptime == 0):
-                        header_row += ["{0}_{1}({2} runs)".format(bm._name, measure_type, self._config.iterations), self.SPACE, self.SPACE]
+                        header_row += ["{0}_{1}({2} runs)".format(bm._name, measure_type, runs)]
                     else:
-                        header_row += ["{0}_{1}({2} runs, {3}s sleep)".format(bm._name, measure_type, self._config.iterations, self._sleeptime),
-                                       self.SPACE, self.SPACE]
-                    unit = self.UNITS[measure_type]
-                    header_row_2 += ["avg ({0})".format(unit), "max ({0})".format(unit), "min ({0})".format(unit)]
-                    avg_dict = bm._measurement.average
-                    max_dict = bm._measurement.max
-                    min_dict = bm._measurement.min
-                    for channel, raw_data in avg_dict.iteritems():
+                        header_row += ["{0}_{1}({2} runs, {3}s sleep)".format(bm._name, measure_type, runs, self._sleeptime)]
+                    header_row += [self.SPACE] * (len(columns) - 1)
+                    header_row_2 += [header for header, _ in columns]
+                    avg_dict = columns[0][1]
+                    for channel in avg_dict:
                         if channel not in data_rows:
                             data_rows[channel] = [channel]
-                            for i in range(0,bmcount):
-                                #Add padding as needed.  One pad for "avg", one for "max", one for "min"
-                                data_rows[channel] += [self.SPACE]
-                                data_rows[channel] += [self.SPACE]
-                                data_rows[channel] += [self.SPACE]
-                        data_rows[channel] += [raw_data]
+                            #Add padding as needed, one pad per column of the previous benchmarks
+                            data_rows[channel] += [self.SPACE] * padding
+                    for header, values in columns[1:3]:
+                        # max and min are known for every channel
+                        for channel in values:
+                            if channel not in data_rows:
+                                logger.error("Error: invalid data")
+                                return
+                    for channel in avg_dict:
+                        for header, values in columns:
+                            value = values.get(channel)
+                            data_rows[channel] += [self.NOT_AVAILABLE if value is None else value]
 
-                    for channel, raw_data in max_dict.iteritems():
-                        if channel not in data_rows:
-                            logger.error("Error: invalid data")
-                            return
-                        data_rows[channel] += [raw_data]
-
-                    for channel, raw_data in min_dict.iteritems():
-                        if channel not in data_rows:
-                            logger.error("Error: invalid data")
-                            return
-                        data_rows[channel] += [raw_data]
-
-                    bmcount = bmcount + 1
+                    padding += len(columns)
                 writer.writerow([""]+ [""] + header_row)
                 writer.writerow([""]+ [""] + header_row_2)
                 for channel in data_rows.keys():
@@ -90,6 +99,40 @@ class CsvWriter:
 class AccuracyCsvWriter(CsvWriter):
     UNITS = {MEASURE_TIMING: "us", MEASURE_MEM: "kB", MEASURE_POWER: "A", MEASURE_ACCURACY: ""}
 
+class SummaryCsvWriter:
+    """
+    Merges the results of the benchmarks ran on several devices into one
+    table with a row per device, benchmark and channel
+    """
+    HEADER = ["Device", "Benchmark", "Measurement", "Channel", "avg", "max", "min", "p50", "p90", "p95", "p99", "stddev", "cv", "unit"]
+    UNITS = AccuracyCsvWriter.UNITS
+
+    def __init__(self, device_benchmarks):
+        # device_benchmarks is a list of (device id, benchmarks_ran)
+        self._device_benchmarks = device_benchmarks
+
+    def write(self, csv_file_path, logger):
+        csv_file = open(csv_file_path, 'wt')
+        try:
+            writer = csv.writer(csv_file)
+            writer.writerow(self.HEADER)
+            for device_id, benchmarks in self._device_benchmarks:
+                for run_flavor_measure, bm in benchmarks:
+                    measure_type = bm._measurement.type
+                    max_dict = bm._measurement.max
+                    min_dict = bm._measurement.min
+                    distributions = bm._measurement.distributions
+                    for channel, avg in bm._measurement.average.iteritems():
+                        row = [device_id, bm._name, measure_type, channel, avg, max_dict[channel], min_dict[channel]]
+                        dist = distributions.get(channel)
+                        for value in ([dist.percentile(p) for p in bm._measurement.PERCENTILES] + [dist.stddev, dist.cv]
+                                      if dist is not None else [None] * (len(bm._measurement.PERCENTILES) + 2)):
+                            row.append(CsvWriter.NOT_AVAILABLE if value is None else value)
+                        writer.writerow(row + [self.UNITS[measure_type]])
+            logger.info("Summary of {0} devices written to {1}".format(len(self._device_benchmarks), csv_file_path))
+        finally:
+            csv_file.close()
+
 class CsvWriterFactory:
     def __init__(self):
         pass
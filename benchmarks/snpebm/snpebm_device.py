@@ -1,16 +1,13 @@
 from abc import ABCMeta, abstractproperty, abstractmethod
-from multiprocessing import Process
 from android_utils import *
 from fs_utils import *
 from monsoon_power_monitor import *
 from snpebm_constants import *
 import os
 import time
-import re
 
 
-REGX_SPACES = re.compile('[\s]+')
-ONE_HOUR_IN_SEC = 1 * 60 * 60.0
+BYTES_PER_MB = 1024 * 1024.0
 
 
 class DeviceFactory():
@@ -18,7 +15,8 @@ class DeviceFactory():
     def make_device(device_id, config):
         assert device_id, "device id is required"
         assert config, "config is required"
-        return BenchmarkDevice(device_id, device_id, config.device_path, config.platform, config.host_rootpath)
+        return BenchmarkDevice(device_id, device_id, config.device_path, config.platform, config.host_rootpath,
+                               mem_sample_interval_ms=config.mem_sample_interval_ms)
 
 class AbstractBenchmarkDevice(object):
     __metaclass__ = ABCMeta
@@ -128,16 +126,23 @@ class AbstractBenchmarkDevice(object):
 
 
 class BenchmarkDevice(AbstractBenchmarkDevice):
-    def __init__(self, device_name, serial_no, device_root_dir, platform, host_output_dir, host_name='localhost'):
+    def __init__(self, device_name, serial_no, device_root_dir, platform, host_output_dir, host_name='localhost',
+                 bulk_push=True, bulk_push_compression=None, mem_sample_interval_ms=DEFAULT_MEM_SAMPLE_INTERVAL_MS):
         assert device_root_dir, "device root directory is required"
         self._device_name = device_name
         self._comm_id = serial_no
         self._device_root_dir = device_root_dir
         self._host_output_dir = host_output_dir
         self.host_name = host_name
-        self._mem_proc = None
+        self._mem_sampling = False
+        self._mem_sampler_pushed = False
+        self._mem_sample_interval_ms = mem_sample_interval_ms
         self._power_proc = None
         self._platform = platform
+        self._has_tar = None
+        # copy data directories as a single tar stream, optionally 'gz' compressed
+        self.bulk_push = bulk_push
+        self.bulk_push_compression = bulk_push_compression
 
         if(self._platform == PLATFORM_OS_ANDROID):
             self._device_type = DEVICE_TYPE_ARM_ANDROID
@@ -190,90 +195,77 @@ class BenchmarkDevice(AbstractBenchmarkDevice):
         return
 
     def __copy_host_to_device(self, host_dir, device_dir, logger):
+        t0 = time.time()
         host_files, host_dirs = recursive_dir_scan(host_dir)
         dev_dirs = []
         for host_dir_path in host_dirs:
             dev_dir_path = host_dir_path.replace(host_dir, device_dir, 1)
             dev_dirs.append(dev_dir_path)
-        self.__create_dirs(dev_dirs, logger)
-        for host_file_path in host_files:
-            dev_file_path = os.path.dirname(host_file_path.replace(host_dir, device_dir, 1))
-            push_file(self, host_file_path, dev_file_path, logger)
+        mode = 'per-file push'
+        if self.bulk_push and len(host_files) > 1 and self.__tar_on_target(logger):
+            try:
+                self.__copy_host_to_device_tar(host_dir, device_dir, dev_dirs, len(host_files), logger)
+                mode = 'tar stream'
+            except AdbShellCmdFailedException as e:
+                logger.warning('Tar stream to %s failed, pushing one file at a time: %s' % (device_dir, e.message))
+        if mode == 'per-file push':
+            self.__create_dirs(dev_dirs, logger)
+            for host_file_path in host_files:
+                dev_file_path = os.path.dirname(host_file_path.replace(host_dir, device_dir, 1))
+                push_file(self, host_file_path, dev_file_path, logger)
+        elapsed = max(time.time() - t0, 1e-6)
+        num_bytes = sum(os.path.getsize(host_file_path) for host_file_path in host_files)
+        logger.info('Copied %d files (%.2f MB) to %s by %s in %.2fs: %.2f MB/s, %.1f files/s' %
+                    (len(host_files), num_bytes / BYTES_PER_MB, device_dir, mode, elapsed,
+                     num_bytes / BYTES_PER_MB / elapsed, len(host_files) / elapsed))
         return
 
+    def __tar_on_target(self, logger):
+        if self._has_tar is None:
+            self._has_tar = check_tar_on_target(self, logger)
+            if not self._has_tar:
+                logger.info('tar is not available on %s, bulk push disabled' % self._comm_id)
+        return self._has_tar
+
+    def __copy_host_to_device_tar(self, host_dir, device_dir, dev_dirs, num_files, logger):
+        # same clean slate as __create_dirs, in one remote command
+        if dev_dirs:
+            execute_adbcmd(self, 'rm -rf %s' % ' '.join(dev_dirs), logger, shell=True)
+        execute_adbcmd(self, 'mkdir -p %s' % device_dir, logger, shell=True)
+        push_dir_tar(self, host_dir, device_dir, logger, self.bulk_push_compression)
+        try:
+            count_output = execute_adbcmd(self, 'find %s -type f | wc -l' % device_dir, logger, shell=True,
+                                          suppress_warning=True)
+        except AdbShellCmdFailedException:
+            # no find on target, nothing more to verify
+            return
+        num_dev_files = int(count_output.split()[0])
+        if num_dev_files < num_files:
+            raise AdbShellCmdFailedException('only %d of %d files unpacked in %s' % (num_dev_files, num_files, device_dir))
+
     def __mem_log_file(self):
         return os.path.join(self._device_root_dir, MEM_LOG_FILE_NAME)
 
-    def __capture_mem_droid(self, exe_name, logger):
-        time_out = ONE_HOUR_IN_SEC
-        t0 = time.time()
-        ps_name = exe_name
-
-        # Find the Process ID
-        ps_pid = None
-        while time_out > (time.time() - t0):
-            version_output = execute_adbcmd(self, "getprop ro.build.version.release", logger, shell=True)
-            android_version = version_output.strip().split()[0]
-            if android_version >= "8.0.0":
-                ps_output = execute_adbcmd(self, "ps -A | grep {0}".format(ps_name), logger, shell=True)
-            else:
-                ps_output = execute_adbcmd(self, "ps | grep {0}".format(ps_name), logger, shell=True)
-            if ps_output:
-                ps_pid = REGX_SPACES.split(ps_output.strip())[1]
-                logger.debug(ps_output)
-                logger.debug("Found PID ({0}) of the Process".format(ps_pid))
-                break
-            if ps_pid is not None:
-                break
-
-        assert ps_pid, "ERROR: Could not find the Process ID of {0}".format(exe_name)
-
-        num_of_samples = 0
+    def __start_mem_sampler(self, exe_name, logger):
+        device_dir = self._device_root_dir
+        if not self._mem_sampler_pushed:
+            push_file(self, os.path.join(os.path.dirname(os.path.abspath(__file__)), MEM_SAMPLER_SCRIPT_NAME),
+                      device_dir, logger)
+            self._mem_sampler_pushed = True
         mem_log_file = self.__mem_log_file()
-        logger.debug("Capturing memory usage of {0} with PID {1}".format(exe_name, ps_pid))
-        logger.debug("Time required to determine the PID:{0}".format((time.time() - t0)))
-        while time_out > (time.time() - t0):
-            if num_of_samples == 0:
-                logger.debug("Memory Log Capture available at: {0}".format(mem_log_file))
-                create_or_append = ">"
-            else:
-                create_or_append = "| cat >>"
-            execute_adbcmd(self, "dumpsys meminfo {0} {2} {1}".format(ps_pid, mem_log_file, create_or_append), logger, shell=True)
-            num_of_samples += 1
-        return
-
-    def __capture_mem_le(self, exe_name, logger):
-        time_out = ONE_HOUR_IN_SEC
-        t0 = time.time()
-        ps_name = exe_name
-
-        # Find the Process ID
-        ps_pid = None
-        execute_adbcmd(self, "uname", logger, shell=True)
-        while time_out > (time.time() - t0):
-            output_pid = execute_adbcmd(self, "ps -A | grep {0}".format(ps_name), logger, shell=True)
-            if output_pid:
-                ps_pid = REGX_SPACES.split(output_pid.strip())[0]
-                logger.debug(output_pid)
-                logger.debug("Found PID ({0}) of the Process".format(ps_pid))
-                break
-
-        assert ps_pid, "Could not find the Process ID of {0}".format(exe_name)
-
-        num_of_samples = 0
-        mem_log_file = self.__mem_log_file()
-        logger.debug("Capturing memory usage of {0} with PID {1}".format(exe_name, ps_pid))
-        logger.debug("Time required to determine the PID:{0}".format((time.time() - t0)))
-        while time_out > (time.time() - t0):
-            if num_of_samples == 0:
-                logger.debug("Memory Log Capture available at: {0}".format(mem_log_file))
-                create_or_append = ">"
-            else:
-                create_or_append = "| cat >>"
-            execute_adbcmd(self, "cat /proc/{0}/smaps | cat >> {1}".format(ps_pid,mem_log_file),logger,shell=True)
-            execute_adbcmd(self, "echo ==== {2} {1}".format(ps_pid, mem_log_file, create_or_append), logger, shell=True)
-            num_of_samples += 1
-        return
+        # detached, the sampler waits for exe_name and samples it until it exits
+        sampler_cmd = "rm -f {1}; (sh {0} {2} {3} {1} {4} > /dev/null 2>&1 &)".format(
+            os.path.join(device_dir, MEM_SAMPLER_SCRIPT_NAME), mem_log_file, exe_name,
+            self._mem_sample_interval_ms / 1000.0, os.path.join(device_dir, MEM_SAMPLER_PID_FILE_NAME))
+        execute_adbcmd(self, sampler_cmd, logger, shell=True)
+        logger.debug("Sampling memory usage of {0} every {1}ms into {2}".format(
+            exe_name, self._mem_sample_interval_ms, mem_log_file))
+
+    def __stop_mem_sampler(self, logger):
+        # the sampler exits with the process, unless the process never started
+        pid_file = os.path.join(self._device_root_dir, MEM_SAMPLER_PID_FILE_NAME)
+        execute_adbcmd(self, "if [ -f {0} ]; then kill \$(cat {0}); rm -f {0}; fi; true".format(pid_file),
+                       logger, shell=True)
 
     def __set_usb_charging(self, new_status, logger):
         check_cmd = "cat /sys/class/power_supply/battery/charging_enabled"
@@ -309,18 +301,10 @@ class BenchmarkDevice(AbstractBenchmarkDevice):
 
     def start_measurement(self, benchmark, logger):
         if benchmark._measurement.type == MEASURE_MEM:
-            if self._mem_proc is None:
-                logger.info("starting memory capture in a parallel process")
-                if(self._platform == PLATFORM_OS_ANDROID):
-                    logger.info("Android platform")
-                    self._mem_proc = Process(target=self.__capture_mem_droid, args=(benchmark.exe_name, logger))
-                    self._mem_proc.start()
-                elif(self._platform == PLATFORM_OS_LINUX):
-                    logger.info("Linux Embedded")
-                    self._mem_proc = Process(target=self.__capture_mem_le, args=(benchmark.exe_name, logger))
-                    self._mem_proc.start()
-                else:
-                    raise Exception("start_measurement: Invalid platform !!!", self.platform)
+            if not self._mem_sampling:
+                logger.info("starting memory capture on the target")
+                self.__start_mem_sampler(benchmark.exe_name, logger)
+                self._mem_sampling = True
             else:
                 logger.info("memory capture is already started")
         elif benchmark._measurement.type == MEASURE_POWER:
@@ -335,9 +319,9 @@ class BenchmarkDevice(AbstractBenchmarkDevice):
 
     def stop_measurement(self, benchmark, logger):
         if benchmark._measurement.type == MEASURE_MEM:
-            if self._mem_proc is not None:
-                self._mem_proc.terminate()
-                self._mem_proc = None
+            if self._mem_sampling:
+                self.__stop_mem_sampler(logger)
+                self._mem_sampling = False
                 logger.info("memory capture is terminated")
                 execute_adbcmd(self, "pull {0} {1}".format(self.__mem_log_file(), benchmark.host_result_dir), logger)
         elif benchmark._measurement.type == MEASURE_POWER:
@@ -18,6 +18,10 @@ CONFIG_STL_LIBRARY_KEY = "C++ Standard Library"
 CONFIG_MEASUREMENTS_KEY = "Measurements"
 CONFIG_PERF_PROFILE_KEY = "PerfProfile"
 CONFIG_CPU_FALLBACK_KEY = "CpuFallback"
+CONFIG_WARMUP_RUNS_KEY = "WarmupRuns"
+CONFIG_CONVERGENCE_PERCENT_KEY = "ConvergencePercent"
+CONFIG_MAX_RUNS_KEY = "MaxRuns"
+CONFIG_MEM_SAMPLE_INTERVAL_KEY = "MemSampleIntervalMs"
 
 CONFIG_ARTIFACTS_KEY = "Artifacts"
 CONFIG_ARTIFACTS_COMPILER_KEY_HOST = "x86_64-linux-clang"
@@ -27,7 +31,12 @@ CONFIG_JSON_ROOTKEYS = [CONFIG_NAME_KEY, CONFIG_HOST_ROOTPATH_KEY,
                         CONFIG_HOST_RESULTSDIR_KEY, CONFIG_DEVICE_PATH_KEY,
                         CONFIG_DEVICES_KEY, CONFIG_RUNS_KEY,
                         CONFIG_MODEL_KEY, CONFIG_RUNTIMES_KEY,
-                        CONFIG_MEASUREMENTS_KEY, CONFIG_PERF_PROFILE_KEY, CONFIG_CPU_FALLBACK_KEY]
+                        CONFIG_MEASUREMENTS_KEY, CONFIG_PERF_PROFILE_KEY, CONFIG_CPU_FALLBACK_KEY,
+                        CONFIG_WARMUP_RUNS_KEY, CONFIG_CONVERGENCE_PERCENT_KEY, CONFIG_MAX_RUNS_KEY,
+                        CONFIG_MEM_SAMPLE_INTERVAL_KEY]
+CONFIG_JSON_OPTIONAL_ROOTKEYS = [CONFIG_PERF_PROFILE_KEY, CONFIG_CPU_FALLBACK_KEY,
+                                 CONFIG_WARMUP_RUNS_KEY, CONFIG_CONVERGENCE_PERCENT_KEY, CONFIG_MAX_RUNS_KEY,
+                                 CONFIG_MEM_SAMPLE_INTERVAL_KEY]
 CONFIG_JSON_MODEL_SUBKEYS = [CONFIG_MODEL_NAME_SUBKEY,
                              CONFIG_MODEL_DLC_SUBKEY,
                              CONFIG_MODEL_INPUTLIST_SUBKEY,
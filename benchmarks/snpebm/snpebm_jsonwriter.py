@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from snpebm_csvwriter import AccuracyCsvWriter
+
+
+class JsonResultsWriter:
+    """
+    Machine readable counterpart of CsvWriter
+
+    write() produces one json document per device, keyed by run flavor,
+    measurement and channel, with the statistics and the raw samples of
+    every run, or the average of every run once the samples of a channel
+    were too many to keep exactly.  append_jsonl() appends one flat record per channel to a
+    json-lines file shared by all runs, so a whole farm of results loads
+    with a single read.
+    """
+    UNITS = AccuracyCsvWriter.UNITS
+    _jsonl_lock = threading.Lock()
+
+    def __init__(self, snpe_sdk_version, benchmarks, config, device_id, device_info, sleeptime):
+        self._snpe_sdk_version = snpe_sdk_version
+        self._benchmarks = benchmarks
+        self._config = config
+        self._device_id = device_id
+        self._device_info = device_info
+        self._sleeptime = sleeptime
+
+    @staticmethod
+    def __channel_results(measurement, unit):
+        avg_dict = measurement.average
+        max_dict = measurement.max
+        min_dict = measurement.min
+        distributions = measurement.distributions
+        channels = OrderedDict()
+        for channel in avg_dict:
+            result = OrderedDict([("unit", unit),
+                                  ("avg", avg_dict[channel]),
+                                  ("max", max_dict.get(channel)),
+                                  ("min", min_dict.get(channel))])
+            dist = distributions.get(channel)
+            if dist is not None:
+                for p in measurement.PERCENTILES:
+                    result["p%d" % p] = dist.percentile(p)
+                result["stddev"] = dist.stddev
+                result["cv"] = dist.cv
+                result["count"] = dist.count
+            # raw samples of every run, in run order
+            result["runs"] = measurement.run_samples(channel)
+            if result["runs"] is None:
+                result["run_averages"] = measurement.run_averages(channel)
+            channels[channel] = result
+        return channels
+
+    def results(self):
+        """
+        Returns: the results document as nested dicts
+        """
+        flavors = OrderedDict()
+        for run_flavor_measure, bm in self._benchmarks:
+            measure_type = bm._measurement.type
+            measurements = flavors.setdefault(bm._name, OrderedDict())
+            measurements[measure_type] = OrderedDict([
+                ("runs", len(bm._measurement.stats)),
+                ("channels", self.__channel_results(bm._measurement, self.UNITS[measure_type]))])
+        return OrderedDict([
+            ("sdk_version", self._snpe_sdk_version),
+            ("device", self._device_id),
+            ("device_info", OrderedDict((item[0], item[1]) for item in self._device_info)),
+            ("config", OrderedDict((row[0], row[1] if len(row) > 1 else None) for row in self._config.csvrows)),
+            ("sleep", self._sleeptime),
+            ("results", flavors)])
+
+    def write(self, json_file_path, logger):
+        with open(json_file_path, 'w') as json_file:
+            json.dump(self.results(), json_file, indent=1, default=str)
+        logger.info("Results written to {0}".format(json_file_path))
+
+    def append_jsonl(self, jsonl_file_path, results_dir, logger):
+        """
+        Appends one record per device, flavor, measurement and channel
+        """
+        results = self.results()
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        lines = []
+        for flavor, measurements in results["results"].iteritems():
+            for measure_type, measurement in measurements.iteritems():
+                for channel, channel_results in measurement["channels"].iteritems():
+                    record = OrderedDict([("timestamp", timestamp),
+                                          ("name", self._config.name),
+                                          ("results_dir", results_dir),
+                                          ("sdk_version", self._snpe_sdk_version),
+                                          ("device", self._device_id),
+                                          ("flavor", flavor),
+                                          ("measurement", measure_type),
+                                          ("channel", channel)])
+                    record.update(channel_results)
+                    lines.append(json.dumps(record, default=str))
+        with self._jsonl_lock:
+            with open(jsonl_file_path, 'a') as jsonl_file:
+                jsonl_file.write(''.join(line + '\n' for line in lines))
+        logger.info("{0} records appended to {1}".format(len(lines), jsonl_file_path))
+
+
+class JsonWriterFactory:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def make_json_writer(benchmarks, config, device_id, device_info, sleeptime, logger):
+        snpe_sdk_version = benchmarks[0][1].get_snpe_version(config, logger)
+        return JsonResultsWriter(snpe_sdk_version, benchmarks, config, device_id, device_info, sleeptime)
@@ -1,56 +1,164 @@
+import hashlib
+import json
 import os
+import posixpath
+import re
 import sys
-from subprocess import check_output
-from subprocess import CalledProcessError
+import threading
+from collections import OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 from android_utils import execute_adbcmd
 from android_utils import check_file_exists
-from android_utils import push_file
+from android_utils import push_files
 
 from snpebm_constants import ERRNUM_MD5CHECKSUM_FILE_NOT_FOUND_ON_DEVICE
 from snpebm_constants import ERRNUM_MD5CHECKSUM_CHECKSUM_MISMATCH
 from snpebm_constants import ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR
+from snpebm_constants import SNPE_BENCH_ROOT
 
-MD5_HOST_BINARY = 'md5sum'
+MD5_INDEX_FILE_NAME = '.snpebm_md5_index.json'
+MD5_READ_CHUNK_SIZE = 1024 * 1024
+REGX_MD5_LINE = re.compile('^([0-9a-fA-F]{32})\s+(.+)$')
+DEVICE_LISTING_DIR_PREFIX = '==== '
 
-def _execute_cmd(cmd_str, logger, shell=False):
-    try:
-        logger.debug('Executing {%s}' % cmd_str)
-        cmd_handle = check_output(cmd_str, shell=True)
-        logger.debug('Command Output: \n"%s"' % cmd_handle)
-        return cmd_handle
-    except Exception as e:
-        logger.error('Could not execute the cmd {%s}' % (cmd_str),
-                     exc_info=True)
-        logger.error(e.message)
-        raise
 
+class HostMd5Index:
+    """
+    md5 of host files, computed in-process and cached by path, mtime and size
 
-def _gen_md5_for_one_file(path, logger):
-    return _execute_cmd(' '.join([MD5_HOST_BINARY, path]), logger).split()[0]
+    The cache is persisted as json so that re-runs only hash files that
+    changed.  It is shared by the devices benchmarked concurrently.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index_path = None
+        self._entries = {}
 
-def _exit_on_md5_mismatch(device, md5_binary_on_target, host_file, device_file, logger):
-    try:
-        host_md5 = _gen_md5_for_one_file(host_file, logger)
-        device_md5 = _get_md5_for_one_file_on_target(device, md5_binary_on_target, device_file, logger)
-        if  host_md5 != device_md5:
-            logger.error('Abort during checksum check:\n%s\n and its copy at \n%s\n have different checksums'%(host_file,device_file))
-            sys.exit(ERRNUM_MD5CHECKSUM_CHECKSUM_MISMATCH)
-    except Exception as e:
-        logger.error('Unknown error during checksum check between \n\n%s\n and \n%s\n' % (host_file, device_file))
-        sys.exit(ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR)
+    def load(self, index_path, logger):
+        with self._lock:
+            if index_path == self._index_path:
+                return
+            self._index_path = index_path
+            self._entries = {}
+            if index_path is None or not os.path.isfile(index_path):
+                return
+            try:
+                with open(index_path, 'r') as index_file:
+                    self._entries = json.load(index_file)
+            except ValueError:
+                logger.warning('Ignoring corrupt md5 index %s' % index_path)
 
-def _exit_on_md5_mismatch_after_attempt_copy_once(device, md5_binary_on_target, host_file, device_file, logger):
-    try:
-        host_md5 = _gen_md5_for_one_file(host_file, logger)
-        device_md5 = _get_md5_for_one_file_on_target(device, md5_binary_on_target, device_file, logger)
-        if  host_md5 != device_md5:
-            # do copy here, then call _exit_on_md5_mismatch
-            logger.info('md5 does not match for %s, copy from host again' % device_file)
-            push_file(device, host_file, os.path.dirname(device_file), logger)
-            _exit_on_md5_mismatch(device, md5_binary_on_target, host_file, device_file, logger)
-    except Exception as e:
-        logger.error('Unknown error during checksum check between \n\n%s\n and \n%s, error msg = %s\n' % (host_file, device_file, e.message))
-        sys.exit(ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR)
+    def save(self, logger):
+        with self._lock:
+            if self._index_path is None:
+                return
+            tmp_path = '%s.%d.tmp' % (self._index_path, os.getpid())
+            try:
+                with open(tmp_path, 'w') as index_file:
+                    json.dump(self._entries, index_file)
+                os.rename(tmp_path, self._index_path)
+            except (IOError, OSError) as e:
+                logger.warning('Could not save md5 index %s: %s' % (self._index_path, e))
+
+    @staticmethod
+    def _hash_file(path):
+        md5 = hashlib.md5()
+        with open(path, 'rb') as host_file:
+            for chunk in iter(lambda: host_file.read(MD5_READ_CHUNK_SIZE), ''):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def md5s(self, paths, logger):
+        """
+        Returns: dict of host path to md5 for all paths
+        """
+        result = {}
+        stale = []
+        with self._lock:
+            for path in paths:
+                stat = os.stat(path)
+                entry = self._entries.get(path)
+                if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+                    result[path] = entry[2]
+                else:
+                    stale.append((path, stat))
+        if stale:
+            logger.debug('Computing md5 of %d host files, %d cached' % (len(stale), len(result)))
+            # hashlib releases the GIL while hashing, threads are enough
+            pool = ThreadPool(min(len(stale), cpu_count()))
+            try:
+                md5s = pool.map(self._hash_file, [path for path, _ in stale])
+            finally:
+                pool.close()
+                pool.join()
+            with self._lock:
+                for (path, stat), md5 in zip(stale, md5s):
+                    self._entries[path] = [stat.st_mtime, stat.st_size, md5]
+                    result[path] = md5
+        return result
+
+_host_md5_index = HostMd5Index()
+
+
+def _build_manifest(artifacts):
+    """
+    Returns: OrderedDict of host file to device file for all artifacts
+    """
+    manifest = OrderedDict()
+    for _host_path, _dev_dir in artifacts:
+        if os.path.isfile(_host_path):
+            manifest[os.path.abspath(_host_path)] = posixpath.normpath('/'.join([_dev_dir, os.path.basename(_host_path)]))
+        elif os.path.isdir(_host_path):
+            for _root, _dirs, _files in os.walk(_host_path):
+                _rel_dir = os.path.relpath(_root, _host_path)
+                for _file in _files:
+                    if _rel_dir == os.curdir:
+                        dev_file = '/'.join([_dev_dir, _file])
+                    else:
+                        dev_file = '/'.join([_dev_dir, _rel_dir.replace(os.sep, '/'), _file])
+                    manifest[os.path.abspath(os.path.join(_root, _file))] = posixpath.normpath(dev_file)
+        else:
+            # if neither a dir or file, ignore
+            pass
+    return manifest
+
+
+def _device_dirs(dev_files):
+    return sorted(set(posixpath.dirname(dev_file) for dev_file in dev_files))
+
+
+def _device_md5s(device, md5_binary_on_target, dev_dirs, logger):
+    """
+    Hashes every file of dev_dirs with a single remote command
+
+    Returns: dict of device file to md5, missing files are absent
+    """
+    md5_cmd = 'for d in %s; do %s \\$d/* 2>/dev/null; done; true' % (' '.join(dev_dirs), md5_binary_on_target)
+    device_md5s = {}
+    for line in execute_adbcmd(device, md5_cmd, logger, shell=True).splitlines():
+        m = REGX_MD5_LINE.match(line.strip())
+        if m:
+            device_md5s[posixpath.normpath(m.group(2).strip())] = m.group(1).lower()
+    return device_md5s
+
+
+def _device_files(device, dev_dirs, logger):
+    """
+    Lists every file of dev_dirs with a single remote command
+
+    Returns: set of device files
+    """
+    ls_cmd = 'for d in %s; do echo %s\\$d; ls -1 \\$d 2>/dev/null; done; true' % (' '.join(dev_dirs), DEVICE_LISTING_DIR_PREFIX)
+    device_files = set()
+    current_dir = None
+    for line in execute_adbcmd(device, ls_cmd, logger, shell=True).splitlines():
+        line = line.strip()
+        if line.startswith(DEVICE_LISTING_DIR_PREFIX):
+            current_dir = line[len(DEVICE_LISTING_DIR_PREFIX):]
+        elif line and current_dir is not None:
+            device_files.add(posixpath.normpath('/'.join([current_dir, line])))
+    return device_files
 
 
 def _find_md5_binary_on_target(device, logger):
@@ -89,37 +197,80 @@ def _find_md5_binary_on_target(device, logger):
 
     return md5_path.rstrip()
 
-def _get_md5_for_one_file_on_target(device, md5_binary_on_target, path, logger):
-    return execute_adbcmd(device, ' '.join([md5_binary_on_target,path]), logger, shell=True).split()[0]
-
 def perform_md5_check(device, artifacts, logger):
-    # for snpebm and dnn_mode artifacts,  loop through and compare their md5 chechsums
+    """
+    Makes the artifacts on device identical to the ones on the host
+
+    Host and device md5 manifests are built with one pass each (the device
+    one with a single remote command), only missing or mismatched files are
+    pushed, then their checksums are verified again in one remote command.
+    """
     md5_binary_on_target = _find_md5_binary_on_target(device, logger)
     logger.info('Perform MD5 check on files on device')
-    for _host_path, _dev_dir in artifacts:
-        if os.path.isfile(_host_path):
-            
-            dev_file = '/'.join([_dev_dir,os.path.basename(_host_path)])
-            if md5_binary_on_target == '':
-                push_file(device, _host_path, os.path.dirname(dev_file), logger)                
-            elif check_file_exists(device, dev_file, logger, suppress_warning=True):
-                _exit_on_md5_mismatch_after_attempt_copy_once(device, md5_binary_on_target, _host_path, dev_file, logger)
-            else:
-                logger.info(
-                    '%s not present on device at \n\t%s, copying' % (os.path.basename(_host_path), _dev_dir))
-                push_file(device, _host_path, os.path.dirname(dev_file), logger)
-                _exit_on_md5_mismatch(device, md5_binary_on_target, _host_path, dev_file, logger)
-        elif os.path.isdir(_host_path):
-            for _root, _dirs, _files in os.walk(_host_path):
-                for _file in _files:
-                    dev_file = '/'.join([_dev_dir, _file])
-                    if not check_file_exists(device, dev_file, logger, suppress_warning=True):
-                        logger.info(
-                            '%s not present on device at \n\t%s, copying' % (_file, _dev_dir))
-                        push_file(device, os.path.join(_root, _file), os.path.dirname(dev_file), logger)
-                    if md5_binary_on_target != '':
-                        _exit_on_md5_mismatch_after_attempt_copy_once(device, md5_binary_on_target, os.path.join(_root, _file), dev_file, logger)
-        else:
-            # if neither a dir or file, ignore
-            pass
+    manifest = _build_manifest(artifacts)
+    if not manifest:
+        return
+    dev_dirs = _device_dirs(manifest.values())
+
+    if md5_binary_on_target == '':
+        # without checksums only the presence of the files can be verified,
+        # single files are always pushed again as they used to be
+        device_files = _device_files(device, dev_dirs, logger)
+        single_files = set(os.path.abspath(_host_path) for _host_path, _dev_dir in artifacts
+                           if os.path.isfile(_host_path))
+        to_push = OrderedDict((host_file, dev_file) for host_file, dev_file in manifest.iteritems()
+                              if host_file in single_files or dev_file not in device_files)
+        _push_manifest(device, to_push, logger)
+        return
+
+    index_path = None
+    if SNPE_BENCH_ROOT in os.environ:
+        index_path = os.path.join(os.environ[SNPE_BENCH_ROOT], MD5_INDEX_FILE_NAME)
+    _host_md5_index.load(index_path, logger)
+    try:
+        host_md5s = _host_md5_index.md5s(manifest.keys(), logger)
+    except (IOError, OSError) as e:
+        logger.error('Could not compute md5 of host artifacts: %s' % e)
+        sys.exit(ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR)
+    _host_md5_index.save(logger)
+
+    try:
+        device_md5s = _device_md5s(device, md5_binary_on_target, dev_dirs, logger)
+    except Exception as e:
+        logger.error('Unknown error during checksum check of files on device, error msg = %s\n' % e.message)
+        sys.exit(ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR)
+
+    to_push = OrderedDict()
+    for host_file, dev_file in manifest.iteritems():
+        if dev_file not in device_md5s:
+            logger.debug('%s not present on device at \n\t%s, copying' % (os.path.basename(host_file), posixpath.dirname(dev_file)))
+            to_push[host_file] = dev_file
+        elif device_md5s[dev_file] != host_md5s[host_file]:
+            logger.debug('md5 does not match for %s, copy from host again' % dev_file)
+            to_push[host_file] = dev_file
+    logger.info('%d of %d files on device are up to date' % (len(manifest) - len(to_push), len(manifest)))
+    if not to_push:
+        return
+
+    _push_manifest(device, to_push, logger)
+    try:
+        device_md5s = _device_md5s(device, md5_binary_on_target, _device_dirs(to_push.values()), logger)
+    except Exception as e:
+        logger.error('Unknown error during checksum check of files on device, error msg = %s\n' % e.message)
+        sys.exit(ERRNUM_MD5CHECKSUM_UNKNOWN_ERROR)
+    for host_file, dev_file in to_push.iteritems():
+        if dev_file not in device_md5s:
+            logger.error('Abort during checksum check:\n%s\n is not present on device after copy' % dev_file)
+            sys.exit(ERRNUM_MD5CHECKSUM_FILE_NOT_FOUND_ON_DEVICE)
+        if device_md5s[dev_file] != host_md5s[host_file]:
+            logger.error('Abort during checksum check:\n%s\n and its copy at \n%s\n have different checksums' % (host_file, dev_file))
+            sys.exit(ERRNUM_MD5CHECKSUM_CHECKSUM_MISMATCH)
+
 
+def _push_manifest(device, to_push, logger):
+    by_dev_dir = OrderedDict()
+    for host_file, dev_file in to_push.iteritems():
+        by_dev_dir.setdefault(posixpath.dirname(dev_file), []).append(host_file)
+    execute_adbcmd(device, 'mkdir -p %s' % ' '.join(by_dev_dir.keys()), logger, shell=True)
+    for dev_dir, host_files in by_dev_dir.iteritems():
+        push_files(device, host_files, dev_dir, logger)
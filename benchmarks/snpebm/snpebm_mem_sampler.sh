@@ -0,0 +1,59 @@
+# Memory sampler pushed to the target by snpe_bench, run with sh
+#
+# Waits for the process to start, then appends one sample every interval
+# until it exits: a "==== <uptime>" line followed by the VmRSS/VmHWM lines
+# of /proc/<pid>/status and the Pss/Private lines of smaps_rollup (or of
+# smaps on kernels without it, one set of lines per mapping).
+#
+# usage: snpebm_mem_sampler.sh <process name> <interval in seconds> <log file> <pid file>
+
+name=$1
+interval=$2
+log_file=$3
+pid_file=$4
+
+# keep sampling when started from a shell that goes away
+trap '' HUP
+echo $$ > $pid_file
+: > $log_file
+
+nap() {
+    # fractional sleep is not supported by every busybox
+    sleep $interval 2>/dev/null || sleep 1
+}
+
+find_pid() {
+    pid=$(pidof $name 2>/dev/null)
+    if [ -z "$pid" ]; then
+        # no pidof, comm holds the (at most 15 character) executable name
+        for proc in /proc/[0-9]*; do
+            comm=
+            read comm 2>/dev/null < $proc/comm
+            if [ "$comm" = "$name" ]; then
+                pid=${proc#/proc/}
+                break
+            fi
+        done
+    fi
+    set -- $pid
+    pid=$1
+}
+
+pid=
+while [ -z "$pid" ]; do
+    find_pid
+    [ -z "$pid" ] && nap
+done
+
+mem_file=/proc/$pid/smaps_rollup
+[ -r $mem_file ] || mem_file=/proc/$pid/smaps
+while [ -d /proc/$pid ]; do
+    read uptime idle < /proc/uptime
+    {
+        echo "==== $uptime"
+        grep -e '^VmRSS:' -e '^VmHWM:' /proc/$pid/status
+        grep -e '^Pss:' -e '^Private_Clean:' -e '^Private_Dirty:' $mem_file
+    } >> $log_file 2>/dev/null
+    nap
+done
+rm -f $pid_file
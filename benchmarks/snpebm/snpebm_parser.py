@@ -1,10 +1,16 @@
 from abc import ABCMeta, abstractmethod
+from array import array
+from collections import namedtuple, OrderedDict
 from pylab import *
 import argparse
+import csv
 import json
 import os
+import re
+import tempfile
+import threading
 
-from subprocess import check_output
+from subprocess import check_output, CalledProcessError, Popen, PIPE
 
 from snpebm_config_restrictions import *
 
@@ -22,7 +28,9 @@ class ArgsParser():
         optional.add_argument('-v', '--device_id_override',
                             help='Use this device ID instead of the one supplied in config file.  Cannot be used with -a', required=False)
         optional.add_argument('-a', '--run_on_all_connected_devices_override', action='store_true',
-                              help='Runs on all connected devices, currently only support 1.  Cannot be used with -v', required=False)
+                              help='Runs on all connected devices concurrently.  Cannot be used with -v', required=False)
+        optional.add_argument('-j', '--max_parallel_devices', type=int, default=0,
+                              help='Maximum number of devices benchmarked concurrently, 0 (default) runs all devices at once', required=False)
         optional.add_argument('-t', '--device_os_type_override',
                             help='Specify the target OS type, valid options are %s'%CONFIG_VALID_DEVICEOSTYPES, required=False, default='android')
         optional.add_argument('-d', '--debug', action='store_true',
@@ -77,6 +85,10 @@ class ArgsParser():
         else:
             return self._args['device_id_override'].split(',')
 
+    @property
+    def max_parallel_devices(self):
+        return self._args['max_parallel_devices']
+
     @property
     def device_os_type_override(self):
         return self._args['device_os_type_override']
@@ -89,16 +101,39 @@ class ArgsParser():
 class DataFrame:
     def __init__(self):
         self._raw_data = []
+        self._samples = OrderedDict()
 
     def __iter__(self):
         return self._raw_data.__iter__()
 
+    @property
+    def samples(self):
+        """
+        Individual samples per channel, when the parser provided them
+        """
+        return self._samples
+
+    def drop_samples(self):
+        """
+        Frees the samples once they were folded into the channel statistics
+        """
+        self._samples = OrderedDict()
+
+    def __add_samples(self, channel, values):
+        if channel not in self._samples:
+            self._samples[channel] = array('d')
+        self._samples[channel].extend(values)
+
     def add_sum(self, channel, summation, length):
         # TODO: Figure out how to avoid putting in summation as max/min just to satisfy unpacking
         self._raw_data.append([channel, summation, length, summation, summation])
+        if length == 1:
+            self.__add_samples(channel, [summation])
 
-    def add_sum_max_min(self, channel, summation, length, maximum, minimum):
+    def add_sum_max_min(self, channel, summation, length, maximum, minimum, samples=None):
         self._raw_data.append([channel, summation, length, maximum, minimum])
+        if samples is not None:
+            self.__add_samples(channel, samples)
 
 class AbstractLogParser(object):
     __metaclass__ = ABCMeta
@@ -108,58 +143,96 @@ class AbstractLogParser(object):
         return "Derived class must implement this"
 
 
-class SnpeVersionParser(AbstractLogParser):
-    def __init__(self, diagview_exe):
-        self._diagview = diagview_exe
+DiagLogRecord = namedtuple('DiagLogRecord', ['kind', 'key', 'value'])
 
-    def __parse_diaglog(self, diag_log_file, logger):
-        try:
-            diag_cmd = [self._diagview, '--input_log', diag_log_file]
-            return check_output(diag_cmd).split('\n')
-        except Exception as de:
-            logger.warning("Failed to parse {0}".format(diag_log_file))
-            logger.warning(de.message)
-        return []
 
-    def parse(self, input_dir, logger):
-        assert input_dir, 'ERROR: log_file is required'
-        diag_log_file = os.path.join(input_dir, SNPE_BENCH_DIAG_OUTPUT_FILE)
-        diag_log_output = self.__parse_diaglog(diag_log_file, logger)
-        version_str = 'unparsed'
-        for data in diag_log_output:
-            if 'Software library version:' in data:
-                version_str = data.split(": ")[1].strip()
-                break
-        return version_str
+class DiagLogReader:
+    """
+    Decodes a diagnostic log into DiagLogRecord, in log order:
+        (DIAG_RECORD_VERSION, None, version string)
+        (DIAG_RECORD_STATISTIC, statistic name, time in us)
+        (DIAG_RECORD_LAYER, layer number, time in us)
 
+    The binary log is decoded by snpe-diagview, whose output is consumed
+    as it is produced.  Records are cached per log file (path, mtime and
+    size), so every parser of the same run shares a single decode.
+    """
+    REGX_LAYER_TIME = re.compile('^\s*(\d+): (\d+)')
+    VERSION_PREFIX = 'Software library version:'
+    LAYER_TIMES_HEADER = 'Layer Times'
+    _cache = {}
+    _cache_lock = threading.Lock()
 
-class DroidTimingLogParser(AbstractLogParser):
-    MAJOR_STATISTICS = {
-        "Load": "Load",
-        "Deserialize": "Deserialize",
-        "Create": "Create",
-        "Total Inference Time": "Total Inference Time",
-        "Forward Propagate Time": "Forward Propagate"
-    }
-
-    def __init__(self, dnn_model, diagview_exe, dlc_info_exe):
-        self._model = dnn_model
+    def __init__(self, diagview_exe, statistics):
         self._diagview = diagview_exe
-        self._dlc_info = dlc_info_exe
-
-    def __parse_diaglog(self, diag_log_file, logger):
+        self._statistics = statistics
+
+    def __decode(self, diag_log_file):
+        # stderr goes to a file, a full stderr pipe would block diagview
+        # while stdout is read
+        err_file = tempfile.TemporaryFile()
+        p = Popen([self._diagview, '--input_log', diag_log_file], stdout=PIPE, stderr=err_file)
+        in_layer_times = False
+        for line in iter(p.stdout.readline, ''):
+            if self.VERSION_PREFIX in line:
+                yield DiagLogRecord(DIAG_RECORD_VERSION, None, line.split(": ")[1].strip())
+                continue
+            if self.LAYER_TIMES_HEADER in line:
+                in_layer_times = True
+                continue
+            for statistic_key in self._statistics:
+                if statistic_key + ":" in line:
+                    yield DiagLogRecord(DIAG_RECORD_STATISTIC, statistic_key,
+                                        int(line.split(": ")[1].strip().split()[0]))
+                    break
+            else:
+                if in_layer_times:
+                    m = self.REGX_LAYER_TIME.match(line)
+                    if m:
+                        yield DiagLogRecord(DIAG_RECORD_LAYER, int(m.group(1)), int(m.group(2)))
+        p.wait()
+        err_file.seek(0)
+        err = err_file.read()
+        err_file.close()
+        if p.returncode != 0:
+            raise CalledProcessError(p.returncode, self._diagview, err)
+
+    def records(self, diag_log_file, logger):
         try:
-            diag_cmd = [self._diagview, '--input_log', diag_log_file]
-            return check_output(diag_cmd).split('\n')
+            stat = os.stat(diag_log_file)
+            key = (diag_log_file, stat.st_mtime, stat.st_size)
+            with self._cache_lock:
+                if key in self._cache:
+                    return self._cache[key]
+            records = list(self.__decode(diag_log_file))
+            with self._cache_lock:
+                self._cache[key] = records
+            return records
         except Exception as de:
             logger.warning("Failed to parse {0}".format(diag_log_file))
-            logger.warning(de.message)
+            logger.warning(str(de))
         return []
 
-    def __parse_dlc(self, dlc_file, logger):
+
+class DlcLayerMetadata:
+    """
+    Layer names and types of a dlc, from snpe-dlc-info
+
+    The dlc does not change between runs, so it is parsed once per file
+    (keyed by path and mtime)
+    """
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, dlc_info_exe, dlc_file, logger):
         try:
+            key = (dlc_file, os.path.getmtime(dlc_file))
+            with cls._cache_lock:
+                if key in cls._cache:
+                    return cls._cache[key]
             layer_metadata = []
-            dlc_cmd = [self._dlc_info, '-i', dlc_file]
+            dlc_cmd = [dlc_info_exe, '-i', dlc_file]
             dlc_info_output = check_output(dlc_cmd)
             for line in dlc_info_output.split('\n'):
                 if ("------------------" in line) or ("Id" in line) or ("Training" in line) or ("Concepts" in line):
@@ -169,12 +242,44 @@ class DroidTimingLogParser(AbstractLogParser):
                     if len(split_line) > 4:
                         if split_line[1].isdigit():
                             layer_metadata.append("Name:" + split_line[2] + " Type:" + split_line[3])
+            with cls._cache_lock:
+                cls._cache[key] = layer_metadata
             return layer_metadata
         except Exception as de:
             logger.warning("Failed to parse {0}".format(dlc_file))
             logger.warning(de.message)
         return []
 
+
+class SnpeVersionParser(AbstractLogParser):
+    def __init__(self, diagview_exe):
+        self._reader = DiagLogReader(diagview_exe, DroidTimingLogParser.MAJOR_STATISTICS)
+
+    def parse(self, input_dir, logger):
+        assert input_dir, 'ERROR: log_file is required'
+        diag_log_file = os.path.join(input_dir, SNPE_BENCH_DIAG_OUTPUT_FILE)
+        version_str = 'unparsed'
+        for record in self._reader.records(diag_log_file, logger):
+            if record.kind == DIAG_RECORD_VERSION:
+                version_str = record.value
+                break
+        return version_str
+
+
+class DroidTimingLogParser(AbstractLogParser):
+    MAJOR_STATISTICS = OrderedDict([
+        ("Load", "Load"),
+        ("Deserialize", "Deserialize"),
+        ("Create", "Create"),
+        ("Total Inference Time", "Total Inference Time"),
+        ("Forward Propagate Time", "Forward Propagate")
+    ])
+
+    def __init__(self, dnn_model, diagview_exe, dlc_info_exe):
+        self._model = dnn_model
+        self._reader = DiagLogReader(diagview_exe, self.MAJOR_STATISTICS)
+        self._dlc_info = dlc_info_exe
+
     def parse(self, input_dir, logger):
         def _get_layer_name(_layer_metadata, _layer_num):
             _layer_name = "layer_%03d" % _layer_num
@@ -185,45 +290,48 @@ class DroidTimingLogParser(AbstractLogParser):
             return _layer_name
         assert input_dir, 'ERROR: log_file is required'
         diag_log_file = os.path.join(input_dir, SNPE_BENCH_DIAG_OUTPUT_FILE)
-        dlc_file = self._model.dlc
-        diag_log_output = self.__parse_diaglog(diag_log_file, logger)
-        layer_metadata = self.__parse_dlc(dlc_file, logger)
+        records = self._reader.records(diag_log_file, logger)
+        layer_metadata = DlcLayerMetadata.get(self._dlc_info, self._model.dlc, logger)
 
         data_frame = DataFrame()
         # get forward propagate time
-        for data in diag_log_output:
-            for statistic_key in self.MAJOR_STATISTICS:
-                if statistic_key + ":" in data:
-                    statistic_time = int(data.split(": ")[1].strip().split()[0])
-                    data_frame.add_sum(self.MAJOR_STATISTICS[statistic_key], statistic_time, 1)
-                    break
+        for record in records:
+            if record.kind == DIAG_RECORD_STATISTIC:
+                data_frame.add_sum(self.MAJOR_STATISTICS[record.key], record.value, 1)
 
         # get layer time
-        start_collecting = False
         expected_layer_num = 0
-        for data in diag_log_output:
-            if "Layer Times" in data:
-                start_collecting = True
-            elif start_collecting is True:
-                if len(data.split(": ")) >= 2:
-                    layer_num = int(data.split(": ")[0])
-                    layer_time = int(data.split(": ")[1].split(" ")[0])
-                    # exit if over 100 "layers" between consecutive lines, from cpu_fallback
-                    if layer_num > expected_layer_num + 100:
-                        break
-                    # insert n/a layers if there are missing ones
-                    while expected_layer_num < layer_num:
-                        blank_layer_time = 0
-                        data_frame.add_sum(_get_layer_name(layer_metadata, expected_layer_num), blank_layer_time, 1)
-                        expected_layer_num += 1
-                    data_frame.add_sum(_get_layer_name(layer_metadata, layer_num), layer_time, 1)
-                    expected_layer_num += 1
+        for record in records:
+            if record.kind != DIAG_RECORD_LAYER:
+                continue
+            layer_num = record.key
+            # exit if over 100 "layers" between consecutive lines, from cpu_fallback
+            if layer_num > expected_layer_num + 100:
+                break
+            # insert n/a layers if there are missing ones
+            while expected_layer_num < layer_num:
+                blank_layer_time = 0
+                data_frame.add_sum(_get_layer_name(layer_metadata, expected_layer_num), blank_layer_time, 1)
+                expected_layer_num += 1
+            data_frame.add_sum(_get_layer_name(layer_metadata, layer_num), record.value, 1)
+            expected_layer_num += 1
         return data_frame
 
-class DroidDumpSysMemLogParser(AbstractLogParser):
+class ProcMemLogParser(AbstractLogParser):
+    """
+    Parses the log of snpebm_mem_sampler.sh, "==== <uptime>" lines each
+    followed by the /proc/<pid>/status and smaps(_rollup) lines of a sample,
+    and writes the samples as a time series next to the log
+    """
     PSS = 'pss'
     PRV_DIRTY = 'prv_dirty'
     PRV_CLEAN = 'prv_clean'
+    RSS = 'rss'
+    RSS_PEAK = 'rss_peak'
+    # log key word to channel, values are summed over the mappings of smaps
+    KEY_WORDS = OrderedDict([('VmRSS:', RSS), ('VmHWM:', RSS_PEAK), ('Pss:', PSS),
+                             ('Private_Dirty:', PRV_DIRTY), ('Private_Clean:', PRV_CLEAN)])
+    SEPARATE_KEY_WORD = '===='
 
     def __init__(self):
         pass
@@ -231,92 +339,45 @@ class DroidDumpSysMemLogParser(AbstractLogParser):
     def parse(self, input_dir, logger):
         assert input_dir, 'ERROR: log_file is required'
         log_file = os.path.join(input_dir, MEM_LOG_FILE_NAME)
-        fid = open(log_file, 'r')
-        key_word = 'TOTAL'
-
-        # to get around addn information being dumped in Android M
-        skip_key_word = 'TOTAL:'
-        pss = []
-        prv_dirty = []
-        prv_clean = []
 
+        # (uptime, {channel: kB}) per sample
+        samples = []
         logger.debug('Parsing Memory Log: %s' % log_file)
-        for line in fid.readlines():
-            tmp = line.strip().split()
-            if (key_word in tmp) and not (skip_key_word in tmp):
-                _pss = int(tmp[1])
-                _prv_dirty = int(tmp[2])
-                _prv_clean = int(tmp[3])
-                if _pss == 0 and _prv_dirty == 0 and _prv_clean == 0:
+        with open(log_file, 'r') as fid:
+            for line in fid:
+                tmp = line.strip().split()
+                if not tmp:
                     continue
-                pss.append(int(tmp[1]))
-                prv_dirty.append(int(tmp[2]))
-                prv_clean.append(int(tmp[3]))
+                if tmp[0] == self.SEPARATE_KEY_WORD and len(tmp) > 1:
+                    samples.append((float(tmp[1]), {}))
+                elif tmp[0] in self.KEY_WORDS and len(tmp) > 1 and samples:
+                    channel = self.KEY_WORDS[tmp[0]]
+                    samples[-1][1][channel] = samples[-1][1].get(channel, 0) + int(tmp[1])
+        # drop the samples cut short by the process exiting
+        samples = [sample for sample in samples if self.PSS in sample[1]]
 
         data_frame = DataFrame()
-        if len(pss) == 0 and len(prv_dirty) == 0 and len(prv_clean) == 0:
+        if not samples:
             logger.warning('No memory info found in %s' % log_file)
-        else:
-	    data_frame.add_sum_max_min(self.PSS, sum(pss), len(pss), max(pss), min(pss))
-	    data_frame.add_sum_max_min(self.PRV_DIRTY, sum(prv_dirty), len(prv_dirty), max(prv_dirty), min(prv_dirty))
-	    data_frame.add_sum_max_min(self.PRV_CLEAN, sum(prv_clean), len(prv_clean), max(prv_clean), min(prv_clean))
+            return data_frame
+        for channel in [self.PSS, self.PRV_DIRTY, self.PRV_CLEAN, self.RSS, self.RSS_PEAK]:
+            values = [sample[1][channel] for sample in samples if channel in sample[1]]
+            if values:
+                data_frame.add_sum_max_min(channel, sum(values), len(values), max(values), min(values), values)
+        duration = samples[-1][0] - samples[0][0]
+        logger.debug('%d memory samples over %.2fs%s' % (len(samples), duration,
+                     ', %.1f samples/s' % ((len(samples) - 1) / duration) if duration > 0 else ''))
+        self.__write_time_series(os.path.join(input_dir, MEM_TIMESERIES_FILE_NAME), samples)
         return data_frame
 
-class LeDumpSysMemLogParser(AbstractLogParser):
-    PSS = 'pss'
-    PRV_DIRTY = 'prv_dirty'
-    PRV_CLEAN = 'prv_clean'
-
-    def __init__(self):
-        pass
-
-    def parse(self, input_dir, logger):
-        assert input_dir, 'log_file is required'
-        log_file = os.path.join(input_dir, MEM_LOG_FILE_NAME)
-        fid = open(log_file, 'r')
-
-        pss = []
-        prv_dirty = []
-        prv_clean = []
-
-        seperate_key_word = '===='
-        pss_keyword = "Pss:"
-        pd_keyword = "Private_Dirty:"
-        pc_keyword = "Private_Clean:"
-
-        _pss = 0
-        _pd = 0
-        _pc = 0
-
-        logger.debug('Parsing Memory Log: %s' % log_file)
-        for line in fid.readlines():
-            tmp = line.strip().split()
-            if(seperate_key_word in tmp):
-                if(_pss <> 0):
-                    pss.append(_pss)
-                    _pss = 0
-                if(_pd <> 0):
-                    prv_dirty.append(_pd)
-                    _pd = 0
-                if(_pc <> 0):
-                    prv_clean.append(_pc)
-                    _pc = 0
-            if (pss_keyword in tmp):
-                _pss += int(tmp[1])
-            if (pd_keyword in tmp):
-                _pd += int(tmp[1])
-            if (pc_keyword in tmp):
-                _pc += int(tmp[1])
-
-        fid.close()
-        data_frame = DataFrame()
-        if len(pss) == 0 and len(prv_dirty) == 0 and len(prv_clean) == 0:
-            logger.warning('No memory info found in %s' % log_file)
-        else:
-            data_frame.add_sum_max_min(self.PSS, sum(pss), len(pss), max(pss), min(pss))
-            data_frame.add_sum_max_min(self.PRV_DIRTY, sum(prv_dirty), len(prv_dirty), max(prv_dirty), min(prv_dirty))
-            data_frame.add_sum_max_min(self.PRV_CLEAN, sum(prv_clean), len(prv_clean), max(prv_clean), min(prv_clean))
-        return data_frame
+    def __write_time_series(self, csv_file_path, samples):
+        channels = self.KEY_WORDS.values()
+        t0 = samples[0][0]
+        with open(csv_file_path, 'wb') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['time_s'] + ['%s_kB' % channel for channel in channels])
+            for uptime, values in samples:
+                writer.writerow(['%.2f' % (uptime - t0)] + [values.get(channel, '') for channel in channels])
 
 class MonsoonPowerLogParser(AbstractLogParser):
     CURRENT_A = 'currentA'
@@ -343,7 +404,8 @@ class MonsoonPowerLogParser(AbstractLogParser):
             current_sum += currentA
             current_max = max(current_max, currentA)
             current_min = min(current_min, currentA)
-        data_frame.add_sum_max_min(self.CURRENT_A, current_sum, len(self._samples), current_max, current_min)
+        data_frame.add_sum_max_min(self.CURRENT_A, current_sum, len(self._samples), current_max, current_min,
+                                   [currentA for (currentA, voltageV) in self._samples])
         return data_frame
 
     def plot(self, input_dir, logger):
@@ -372,12 +434,9 @@ class LogParserFactory:
     @staticmethod
     def make_parser(measure, config):
         if measure == MEASURE_MEM:
-            if (config.platform == PLATFORM_OS_ANDROID):
-                return DroidDumpSysMemLogParser()
-            elif(config.platform == PLATFORM_OS_LINUX):
-                return LeDumpSysMemLogParser()
-            else:
+            if config.platform not in [PLATFORM_OS_ANDROID, PLATFORM_OS_LINUX]:
                 raise Exception("make_parser: Invalid platform !!!", config.platform)
+            return ProcMemLogParser()
         elif measure == MEASURE_POWER:
             return MonsoonPowerLogParser()
         elif measure == MEASURE_ACCURACY:
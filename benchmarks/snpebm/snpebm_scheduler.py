@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from Queue import Queue, Empty
+
+
+class DeviceScheduler:
+    """
+    Runs one job per device concurrently on a pool of worker threads.
+
+    Every device is an independent adb target, so the work for a device
+    (artifact sync, benchmark iterations, result pulls) can proceed while
+    the other devices are busy.  Threads are sufficient since the work is
+    dominated by waiting on adb subprocesses.
+    """
+    def __init__(self, device_ids, max_workers=0):
+        assert device_ids, "device ids are required"
+        self._device_ids = list(device_ids)
+        if max_workers <= 0 or max_workers > len(self._device_ids):
+            max_workers = len(self._device_ids)
+        self._max_workers = max_workers
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    def run(self, job, *args):
+        """
+        Calls job(device_id, *args) for every device
+
+        Args:
+            job: callable executed once per device
+            args: additional arguments passed to job
+
+        Returns: OrderedDict of device id to (result, exception), in the
+                 order the devices were given
+        """
+        results = OrderedDict((device_id, (None, None)) for device_id in self._device_ids)
+        pending = Queue()
+        for device_id in self._device_ids:
+            pending.put(device_id)
+
+        def _worker():
+            while True:
+                try:
+                    device_id = pending.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[device_id] = (job(device_id, *args), None)
+                except BaseException as e:
+                    # SystemExit included: the per-device code paths still
+                    # call sys.exit on fatal errors
+                    results[device_id] = (None, e)
+
+        if self._max_workers == 1:
+            _worker()
+            return results
+
+        workers = [threading.Thread(target=_worker, name="snpe_bench_worker_%d" % i)
+                   for i in range(self._max_workers)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
@@ -0,0 +1,157 @@
+import math
+from array import array
+
+# two sided 95% Student's t critical values by degrees of freedom,
+# the normal approximation is used past the end of the table
+T_CRITICAL_95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_CRITICAL_95 = 1.960
+
+
+class QuantileSketch:
+    """
+    Logarithmically bucketed histogram (DDSketch) of non negative values
+
+    Quantiles are returned with a relative error of at most relative_accuracy,
+    and memory grows with the logarithm of the value range rather than with
+    the number of samples.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        assert 0 < relative_accuracy < 1, "relative accuracy must be in (0, 1)"
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = {}
+        self._zeros = 0
+        self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+    def add(self, value):
+        if value <= 0:
+            # negative values (e.g. a bogus power reading) are clamped to 0
+            self._zeros += 1
+        else:
+            index = int(math.ceil(math.log(value) / self._log_gamma))
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+        self._count += 1
+
+    def quantile(self, q):
+        assert 0 <= q <= 1, "quantile must be in [0, 1]"
+        if self._count == 0:
+            return None
+        rank = q * (self._count - 1)
+        if rank < self._zeros:
+            return 0.0
+        seen = self._zeros
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+
+class SampleStats:
+    """
+    Distribution of the samples of one channel
+
+    Count, mean and standard deviation are maintained exactly with Welford's
+    algorithm.  Quantiles are exact while at most max_exact_samples were
+    added, the samples are then folded into a QuantileSketch so memory stays
+    bounded on long runs.
+    """
+    def __init__(self, max_exact_samples=10000, relative_accuracy=0.01):
+        self._max_exact_samples = max_exact_samples
+        self._relative_accuracy = relative_accuracy
+        self._samples = array('d')
+        self._sketch = None
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        value = float(value)
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+        if self._sketch is not None:
+            self._sketch.add(value)
+            return
+        self._samples.append(value)
+        if len(self._samples) > self._max_exact_samples:
+            self._sketch = QuantileSketch(self._relative_accuracy)
+            for sample in self._samples:
+                self._sketch.add(sample)
+            self._samples = array('d')
+
+    def extend(self, values):
+        for value in values:
+            self.add(value)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def is_exact(self):
+        return self._sketch is None
+
+    @property
+    def samples(self):
+        """
+        The samples while they are kept exactly, empty once sketched
+        """
+        return self._samples
+
+    @property
+    def mean(self):
+        return self._mean if self._count else None
+
+    @property
+    def stddev(self):
+        """
+        Sample standard deviation, 0 for a single sample
+        """
+        if self._count == 0:
+            return None
+        if self._count == 1:
+            return 0.0
+        return math.sqrt(self._m2 / (self._count - 1))
+
+    @property
+    def cv(self):
+        """
+        Coefficient of variation, stddev relative to the mean
+        """
+        if self._count == 0 or self._mean == 0:
+            return None
+        return self.stddev / self._mean
+
+    def confidence_interval(self):
+        """
+        Half width of the 95% confidence interval of the mean, None for less
+        than 2 samples
+        """
+        if self._count < 2:
+            return None
+        df = self._count - 1
+        t = T_CRITICAL_95[df] if df < len(T_CRITICAL_95) else Z_CRITICAL_95
+        return t * self.stddev / math.sqrt(self._count)
+
+    def percentile(self, p):
+        """
+        p-th percentile, linearly interpolated between the closest samples
+        """
+        if self._count == 0:
+            return None
+        q = p / 100.0
+        if self._sketch is not None:
+            return self._sketch.quantile(q)
+        ordered = sorted(self._samples)
+        rank = q * (len(ordered) - 1)
+        lower = int(math.floor(rank))
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
@@ -1,6 +1,11 @@
+import atexit
 import os
 import re
 import subprocess
+import tarfile
+import tempfile
+import threading
+import uuid
 from subprocess import check_output
 from subprocess import CalledProcessError
 from subprocess import STDOUT
@@ -20,11 +25,178 @@ getprop_list = ['ro.product.name',
                 'ro.build.description',
                 'ro.build.version.sdk']
 ADB_SHELL_CMD_SUCCESS = 'ADB_SHELL_CMD_SUCCESS'
+ADB_SHELL_CMD_DONE = 'ADB_SHELL_CMD_DONE_'
+# set to 0 to run every remote command in its own adb process
+ADB_SHELL_SESSION_POOL_ENV = 'SNPE_BENCH_ADB_SHELL_POOL'
+# '\$' and friends are escaped for the host shell wrapping "adb shell \"...\"",
+# any other '$' or '`' would be expanded on the host
+REGX_HOST_SHELL_ESCAPE = re.compile(r'\\([$`"\\])')
+REGX_HOST_SHELL_EXPANSION = re.compile(r'(?<!\\)[$`]')
 
 class AdbShellCmdFailedException(Exception):
     def __str__(self):
         return '\nadb shell command Error: ' + self.message + '\n'
 
+
+class ShellSession(object):
+    """
+    A long-lived shell reading commands from a pipe
+
+    Each command runs in a subshell with stderr merged into stdout, followed
+    by an echo of a per-session marker and the exit status, which delimits
+    the response.  This saves the process spawn (and adb handshake) per
+    command.  Any shell launched by launch_cmd works, e.g. ['sh'] to run
+    the commands locally.
+    """
+    def __init__(self, launch_cmd):
+        self._launch_cmd = launch_cmd
+        self._token = uuid.uuid4().hex
+        self._marker = ADB_SHELL_CMD_DONE + self._token
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(launch_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.STDOUT, close_fds=True)
+        # a pty backed shell (older adb) would echo our input back
+        self.execute('stty -echo 2>/dev/null; true')
+
+    @property
+    def alive(self):
+        return self._proc.poll() is None
+
+    def execute(self, cmd):
+        """
+        Runs cmd and waits for it to complete
+
+        Returns: (exit status, output)
+
+        Raises:
+            EOFError if the shell exited before the command completed
+        """
+        with self._lock:
+            # the marker is split by an empty quoted string so that an echo of
+            # this line never looks like the command completing
+            self._proc.stdin.write('( %s ) </dev/null 2>&1; echo %s""%s $?\n' %
+                                   (cmd, ADB_SHELL_CMD_DONE, self._token))
+            self._proc.stdin.flush()
+            output = []
+            while True:
+                line = self._proc.stdout.readline()
+                if not line:
+                    raise EOFError('shell session %s exited' % ' '.join(self._launch_cmd))
+                line = line.replace('\r', '')
+                index = line.find(self._marker)
+                if index < 0:
+                    output.append(line)
+                    continue
+                output.append(line[:index])
+                status = line[index + len(self._marker):].split()
+                return (int(status[0]) if status else -1), ''.join(output)
+
+    def close(self):
+        if self.alive:
+            try:
+                self._proc.stdin.write('exit\n')
+                self._proc.stdin.close()
+                self._proc.wait()
+            except (IOError, OSError):
+                self._proc.kill()
+
+
+class AdbShellSessionPool(object):
+    """
+    One ShellSession per device, shared by all callers of execute_adbcmd
+
+    Sessions are keyed by process id as well, so that a forked child (e.g.
+    the memory capture process) never writes into its parent's pipe.
+    """
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.enabled = os.environ.get(ADB_SHELL_SESSION_POOL_ENV, '1') != '0'
+
+    @staticmethod
+    def launch_cmd(device):
+        return ['adb', '-H', device.host_name, '-s', device.comm_id, 'shell']
+
+    def _session(self, device, logger):
+        key = (os.getpid(), device.host_name, device.comm_id)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or not session.alive:
+                launch_cmd = self.launch_cmd(device)
+                logger.debug('Opening shell session {%s}' % ' '.join(launch_cmd))
+                session = ShellSession(launch_cmd)
+                self._sessions[key] = session
+            return session
+
+    def _discard(self, device):
+        key = (os.getpid(), device.host_name, device.comm_id)
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is not None:
+            session.close()
+
+    def execute(self, device, cmd, adb_shell_cmd, logger, suppress_warning=False):
+        """
+        Same contract as _execute_adbcmd_raw for shell commands: returns the
+        output, raises AdbShellCmdFailedException when cmd fails on target
+
+        cmd is the command as the target shell receives it, adb_shell_cmd
+        the same command escaped for "adb shell \"adb_shell_cmd\"", which
+        runs it when the session is lost
+        """
+        cmd_str = 'shell session %s: %s' % (device.comm_id, cmd)
+        try:
+            logger.debug('Executing {%s}' % cmd_str)
+            try:
+                returncode, cmd_out = self._session(device, logger).execute(cmd)
+            except (EOFError, IOError, OSError) as e:
+                # the session is gone, retry once with a one-shot adb process
+                logger.debug('Shell session on %s lost (%s), falling back to adb shell' % (device.comm_id, e))
+                self._discard(device)
+                return _execute_adbcmd_raw(generate_adbcmd(device, adb_shell_cmd, shell=True), logger,
+                                           shell=True, suppress_warning=suppress_warning)
+            if returncode != 0:
+                if not suppress_warning:
+                    logger.error('%s failed with stderr of: %s' % (cmd_str, cmd_out))
+                raise AdbShellCmdFailedException(cmd_out)
+            # keep the output identical to "adb shell \"cmd && echo ...\""
+            cmd_out += ADB_SHELL_CMD_SUCCESS + '\n'
+            logger.debug('Command Output: \n"%s"' % cmd_out)
+            return cmd_out
+        except AdbShellCmdFailedException as e:
+            if not suppress_warning:
+                logger.warning('adb shell command failed to execute:\n\t%s' % e.message)
+            raise
+
+    def close(self):
+        with self._lock:
+            sessions = self._sessions.values()
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+
+_shell_session_pool = AdbShellSessionPool()
+atexit.register(_shell_session_pool.close)
+
+
+def close_shell_sessions():
+    """
+    Closes all the persistent shell sessions of this process
+    """
+    _shell_session_pool.close()
+
+
+def _session_cmd(cmd):
+    """
+    Returns cmd as the target shell would have received it from
+    "adb shell \"cmd\"", or None when the host shell would have expanded
+    part of it, in which case it cannot go through a session
+    """
+    if REGX_HOST_SHELL_EXPANSION.search(cmd):
+        return None
+    return REGX_HOST_SHELL_ESCAPE.sub(r'\1', cmd)
+
 def get_device_list(logger):
     adb_cmd = 'adb devices'
 
@@ -107,7 +279,14 @@ def execute_adbcmd(device, cmd, logger, shell=False, suppress_warning=False):
     """
     Runs a BLOCKING adb command on target and raises exception
     when an error is encountered
+
+    Shell commands go through the device's persistent shell session
+    unless ADB_SHELL_SESSION_POOL_ENV is set to 0
     """
+    if shell and _shell_session_pool.enabled:
+        session_cmd = _session_cmd(cmd)
+        if session_cmd is not None:
+            return _shell_session_pool.execute(device, session_cmd, cmd, logger, suppress_warning)
     cmd_str = generate_adbcmd(device, cmd, shell)
     return _execute_adbcmd_raw(cmd_str, logger, shell, suppress_warning)
 
@@ -175,6 +354,143 @@ def push_file(device, host_src_path, device_dest_dir, logger, silent=False):
         return cmd_handle
 
 
+def push_files(device, host_src_paths, device_dest_dir, logger, max_cmd_len=65536):
+    """
+    Pushes several files into one existing folder on device with as few
+    adb push commands as possible
+
+    Args:
+        device: DriodDevice object
+        host_src_paths: files to be pushed
+        device_dest_dir: destination folder on device
+        logger: logger object
+        max_cmd_len: files are pushed in chunks to keep the host command
+                     line below this length
+
+    Returns:
+        None
+
+    Raises:
+        RuntimeError when one of the source paths does not exist
+    """
+    for host_src_path in host_src_paths:
+        if not os.path.exists(host_src_path):
+            logger.error('Path %s does not exist' % host_src_path)
+            raise RuntimeError('%s is not a file or directory' % host_src_path)
+    chunks = []
+    chunk, chunk_len = [], 0
+    for host_src_path in host_src_paths:
+        if chunk and chunk_len + len(host_src_path) + 1 > max_cmd_len:
+            chunks.append(chunk)
+            chunk, chunk_len = [], 0
+        chunk.append(host_src_path)
+        chunk_len += len(host_src_path) + 1
+    if chunk:
+        chunks.append(chunk)
+
+    for chunk in chunks:
+        if len(chunk) == 1:
+            push_file(device, chunk[0], device_dest_dir, logger)
+            continue
+        # adb older than 1.0.36 only accepts a single source
+        cmd_str = generate_adbcmd(device, 'push %s %s/' % (' '.join(chunk), device_dest_dir))
+        logger.debug('Executing {%s}' % cmd_str[:256])
+        p = subprocess.Popen(cmd_str, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
+        cmd_out, _ = p.communicate()
+        if p.returncode != 0:
+            logger.debug('Multiple file push failed, pushing one at a time: %s' % cmd_out)
+            for host_src_path in chunk:
+                push_file(device, host_src_path, device_dest_dir, logger)
+        else:
+            logger.debug('Pushed %d files to %s on %s' % (len(chunk), device_dest_dir, device))
+
+
+def check_tar_on_target(device, logger):
+    """
+    Returns 'True' if the target can unpack a tar stream
+    """
+    try:
+        execute_adbcmd(device, 'tar --help >/dev/null 2>&1 || which tar', logger, shell=True, suppress_warning=True)
+    except AdbShellCmdFailedException:
+        return False
+    return True
+
+
+def push_dir_tar(device, host_src_dir, device_dest_dir, logger, compression=None):
+    """
+    Streams the content of a host folder as a tar archive through a single
+    adb exec-in pipe and unpacks it on device
+
+    Args:
+        device: DriodDevice object
+        host_src_dir: folder whose content is pushed
+        device_dest_dir: existing destination folder on device
+        logger: logger object
+        compression: None or 'gz', the target tar must support the latter
+
+    Returns:
+        number of bytes streamed
+
+    Raises:
+        AdbShellCmdFailedException when the archive could not be unpacked
+    """
+    assert compression in [None, 'gz'], "unsupported compression %s" % compression
+    if compression:
+        tar_cmd = 'tar -xzf - -C %s' % device_dest_dir
+    else:
+        tar_cmd = 'tar -xf - -C %s' % device_dest_dir
+    cmd_str = generate_adbcmd(device, 'exec-in %s' % tar_cmd)
+    logger.debug('Executing {%s}' % cmd_str)
+
+    def _writable_dirs(tar_info):
+        # same permissions the per-file copy gives to the folders it creates
+        if tar_info.isdir():
+            tar_info.mode = 0777
+        tar_info.uid = tar_info.gid = 0
+        tar_info.uname = tar_info.gname = ''
+        return tar_info
+
+    # the output goes to a file, a full output pipe would block the remote
+    # tar while the archive is written
+    out_file = tempfile.TemporaryFile()
+    p = subprocess.Popen(cmd_str, stdin=subprocess.PIPE, stdout=out_file, stderr=subprocess.STDOUT, shell=True)
+    counting_stdin = _CountingWriter(p.stdin)
+    try:
+        archive = tarfile.open(fileobj=counting_stdin, mode='w|%s' % (compression or ''))
+        for entry in sorted(os.listdir(host_src_dir)):
+            archive.add(os.path.join(host_src_dir, entry), arcname=entry, filter=_writable_dirs)
+        archive.close()
+    except IOError as e:
+        # the remote tar went away, its output explains why
+        logger.debug('Tar stream to %s interrupted: %s' % (device, e))
+    finally:
+        try:
+            p.stdin.close()
+        except IOError:
+            pass
+    p.wait()
+    out_file.seek(0)
+    cmd_out = out_file.read()
+    out_file.close()
+    if p.returncode != 0 or 'tar:' in cmd_out:
+        raise AdbShellCmdFailedException('%s failed: %s' % (tar_cmd, cmd_out))
+    logger.debug('Streamed %d bytes to %s on %s' % (counting_stdin.count, device_dest_dir, device))
+    return counting_stdin.count
+
+
+class _CountingWriter(object):
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.count = 0
+
+    def write(self, data):
+        self._fileobj.write(data)
+        self.count += len(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+
 def pull_file(device, device_src_path, host_dest_dir, logger, silent=False):
     """
     A summary of the function
@@ -0,0 +1,187 @@
+#==============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#==============================================================================
+from collections import namedtuple
+
+# activations which are not constant tensors are float32 in the DLC
+DEFAULT_DTYPE = 'float32'
+DEFAULT_ITEMSIZE = 4
+
+# first and last are positions in the execution order. A buffer is
+# allocated when its first writer runs and released after its last reader
+# ran. Network outputs are never released.
+LiveRange = namedtuple('LiveRange', ['name', 'dtype', 'num_bytes', 'first', 'last'])
+
+def buffer_dtype(buf):
+    """dtype name and item size of the buffer's elements"""
+    if hasattr(buf.producer.op, 'tensor'):
+        dtype = buf.producer.op.tensor.dtype
+        return dtype.name, dtype.itemsize
+    return DEFAULT_DTYPE, DEFAULT_ITEMSIZE
+
+def buffer_bytes(buf):
+    num_elements = reduce(lambda x, y: x*y, buf.shape, 1)
+    return num_elements * buffer_dtype(buf)[1]
+
+def get_dependencies(nodes):
+    """Map each node to the nodes which must run before it, given a valid
+    execution order. Derived from the order rather than from buffer
+    producers, so that nodes writing their input buffer in place depend on
+    the previous writer of that buffer."""
+    writers = {}
+    dependencies = {}
+    for node in nodes:
+        dependencies[node] = set(writers[name] for name in node.input_names if name in writers)
+        for name in node.output_names:
+            writers[name] = node
+    return dependencies
+
+class LivenessAnalysis(object):
+    """Live ranges of the buffers of a graph for an execution order, by
+    default the graph's own, and the live bytes while each node runs: the
+    buffers allocated before it and not yet released, plus its outputs."""
+    def __init__(self, graph, nodes=None):
+        self.graph = graph
+        self.nodes = graph.list_nodes() if nodes is None else list(nodes)
+        self.live_ranges = self.__compute_live_ranges()
+        self.live_bytes = self.__compute_live_bytes()
+
+    def __compute_live_ranges(self):
+        first = {}
+        last = {}
+        for i, node in enumerate(self.nodes):
+            for name in node.input_names:
+                last[name] = i
+            for name in node.output_names:
+                first.setdefault(name, i)
+                last[name] = max(last.get(name, i), i)
+
+        end = len(self.nodes) - 1
+        live_ranges = []
+        for name in first:
+            buf = self.graph.get_buffer(name)
+            dtype = buffer_dtype(buf)[0]
+            if not buf.consumers:
+                last[name] = end
+            live_ranges.append(LiveRange(name, dtype, buffer_bytes(buf), first[name], last[name]))
+        return sorted(live_ranges, key=lambda r: (r.first, r.name))
+
+    def __compute_live_bytes(self):
+        # sweep the allocations and releases over the execution order
+        delta = [0] * (len(self.nodes) + 1)
+        for live_range in self.live_ranges:
+            delta[live_range.first] += live_range.num_bytes
+            delta[live_range.last + 1] -= live_range.num_bytes
+        live_bytes = []
+        total = 0
+        for i in xrange(len(self.nodes)):
+            total += delta[i]
+            live_bytes.append(total)
+        return live_bytes
+
+    @property
+    def peak_bytes(self):
+        return max(self.live_bytes) if self.live_bytes else 0
+
+    @property
+    def peak_node(self):
+        """The first node during which the peak is reached"""
+        if not self.live_bytes:
+            return None
+        return self.nodes[self.live_bytes.index(self.peak_bytes)]
+
+    def live_at(self, position):
+        return [r for r in self.live_ranges if r.first <= position <= r.last]
+
+    def peak_buffers(self):
+        """Buffers live at the peak, largest first"""
+        if not self.live_bytes:
+            return []
+        position = self.live_bytes.index(self.peak_bytes)
+        return sorted(self.live_at(position), key=lambda r: (-r.num_bytes, r.name))
+
+    def peak_bytes_by_dtype(self):
+        """Peak live bytes of the buffers of each dtype, taken separately"""
+        peaks = {}
+        for dtype in set(r.dtype for r in self.live_ranges):
+            delta = [0] * (len(self.nodes) + 1)
+            for live_range in self.live_ranges:
+                if live_range.dtype == dtype:
+                    delta[live_range.first] += live_range.num_bytes
+                    delta[live_range.last + 1] -= live_range.num_bytes
+            total = 0
+            peak = 0
+            for i in xrange(len(self.nodes)):
+                total += delta[i]
+                peak = max(peak, total)
+            peaks[dtype] = peak
+        return peaks
+
+    def total_bytes(self):
+        """Bytes needed without any buffer reuse"""
+        return sum(r.num_bytes for r in self.live_ranges)
+
+def schedule_for_memory(graph):
+    """Greedy list scheduling which reorders independent branches to keep
+    few bytes live. Among the nodes whose dependencies ran, runs the one
+    which allocates the fewest bytes net of the inputs it releases, ties
+    going to the earliest in the current order.
+
+    Returns: the new execution order"""
+    nodes = graph.list_nodes()
+    position = dict((node, i) for i, node in enumerate(nodes))
+    dependencies = get_dependencies(nodes)
+    dependents = dict((node, []) for node in nodes)
+    for node, deps in dependencies.iteritems():
+        for dep in deps:
+            dependents[dep].append(node)
+    num_pending = dict((node, len(deps)) for node, deps in dependencies.iteritems())
+
+    # readers of each buffer which did not run yet
+    remaining_readers = {}
+    for node in nodes:
+        for name in set(node.input_names):
+            remaining_readers[name] = remaining_readers.get(name, 0) + 1
+    allocated = set()
+
+    def net_bytes(node):
+        allocated_bytes = sum(buffer_bytes(graph.get_buffer(name))
+                              for name in set(node.output_names) if not name in allocated)
+        released_bytes = sum(buffer_bytes(graph.get_buffer(name))
+                             for name in set(node.input_names)
+                             if remaining_readers[name] == 1 and graph.get_buffer(name).consumers
+                             and not name in node.output_names)
+        return allocated_bytes - released_bytes
+
+    ready = [node for node in nodes if num_pending[node] == 0]
+    order = []
+    while ready:
+        node = min(ready, key=lambda n: (net_bytes(n), position[n]))
+        ready.remove(node)
+        order.append(node)
+        allocated.update(node.output_names)
+        for name in set(node.input_names):
+            remaining_readers[name] -= 1
+        for dependent in dependents[node]:
+            num_pending[dependent] -= 1
+            if num_pending[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(nodes):
+        raise RuntimeError("Cannot schedule graph: %d nodes are part of a cycle" % (len(nodes) - len(order)))
+    return order
+
+def minimize_peak_memory(graph):
+    """Reorder the graph's nodes with schedule_for_memory when that lowers
+    the peak live bytes.
+
+    Returns: (LivenessAnalysis before, LivenessAnalysis after)"""
+    before = LivenessAnalysis(graph)
+    after = LivenessAnalysis(graph, schedule_for_memory(graph))
+    if after.peak_bytes < before.peak_bytes:
+        graph.reorder_nodes(after.nodes)
+        return before, after
+    return before, before
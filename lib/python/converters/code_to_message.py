@@ -82,6 +82,7 @@ error_codes_to_messages = {
     'ERROR_TF_INPUT_DOES_NOT_MATCH_TYPES': "Operation ({}) inputs do not match expected types: {} vs {}",
     'ERROR_TF_LAYER_INPUT_COUNT_ERROR': "Layer {} expects {} input(s), actual {}",
     'ERROR_TF_LAYER_NO_INPUT_FOUND': "{} layer {} requires at least one input layer.",
+    'ERROR_TF_LAYERS_CYCLE': "Unable to order layers in execution order, layers in a cycle: {}",
     'ERROR_TF_FALLBACK_TO_ONDEMAND_EVALUATION': "Unable to resolve operation output shapes in single pass. "
                                                 "Using on-demand evaluation!",
     'ERROR_TF_SSD_ANCHOR_INPUT_MISSING': 'Unable to resolve box encoding anchor input later.',
@@ -202,6 +203,7 @@ warning_codes_to_messages = {
 
     # start of the converter warning messages
     'WARNING_TF_SCOPE_OP_NOT_CONSUMED': "Operation ({}) not consumed by converter: {}.",
+    'WARNING_TF_CONSTANTS_CACHE_UNUSABLE': "Unable to use constants cache {}: {}",
 
     # //=============================================================================
     # //                 CAFFE CONVERTER WARNING CODES
@@ -414,6 +416,8 @@ Building Network
     'INFO_TF_BUILDING_INPUT_LAYER': "Building layer (INPUT) with node: {}, shape {}",
     'INFO_TF_CONVERTING_SCOPES': "Converting scope ({}): {}",
     'INFO_ALL_BUILDING_LAYER_W_NODES': "Building layer ({}) with nodes: {}",
+    'INFO_TF_CONSTANTS_CACHE_LOADED': "Loaded {} of {} constant tensors from cache {}",
+    'INFO_TF_STATIC_SHAPES': "Inferred {} of {} tensor shapes statically, evaluating the {} others",
 
     # //=============================================================================
     # //                 CAFFE CONVERTER INFO CODES
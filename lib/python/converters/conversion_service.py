@@ -0,0 +1,252 @@
+#==============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#==============================================================================
+"""Runs many conversions in long lived worker processes.
+
+Each job runs one of the snpe-*-to-dlc scripts in a worker, with its own
+command line. The frameworks, the converter modules and their translation
+banks are imported once per worker rather than once per conversion.
+
+A job is a json object:
+    {"id": "<optional job id>",
+     "converter": "onnx" | "tensorflow" | "caffe" | "caffe2",
+     "args": [<command line arguments of the converter script>],
+     "log": "<optional file receiving the output of the job>"}
+and its result a json object with the job id, "status" ("ok" or
+"failed"), "exit_code", "seconds" and, on failure, "error".
+"""
+import json
+import logging
+import multiprocessing
+import os
+import runpy
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+CONVERTER_SCRIPTS = {'onnx': 'snpe-onnx-to-dlc',
+                     'tensorflow': 'snpe-tensorflow-to-dlc',
+                     'caffe': 'snpe-caffe-to-dlc',
+                     'caffe2': 'snpe-caffe2-to-dlc'}
+
+# modules each converter script imports, loaded by the workers up front
+CONVERTER_MODULES = {'onnx': ['onnx', 'converters.onnx'],
+                     'tensorflow': ['tensorflow', 'converters.tensorflow.converter', 'converters.tensorflow.loader'],
+                     'caffe': ['caffe', 'snpe.snpe_caffe_to_dlc'],
+                     'caffe2': ['caffe2.python.workspace', 'snpe.snpe_caffe2_to_dlc']}
+
+SHUTDOWN_REQUEST = 'shutdown'
+
+class ConversionServiceError(Exception):
+    pass
+
+#------------------------------------------------------------------------------
+#   Worker side
+#------------------------------------------------------------------------------
+_scripts_dir = None
+
+def _init_worker(scripts_dir, preload):
+    global _scripts_dir
+    _scripts_dir = scripts_dir
+    # as when caffe is imported by a non verbose snpe-caffe-to-dlc
+    os.environ.setdefault('GLOG_minloglevel', '2')
+    for converter in preload:
+        for module_name in CONVERTER_MODULES[converter]:
+            try:
+                __import__(module_name)
+            except ImportError:
+                # the job will report it
+                pass
+
+def _reset_state(converter):
+    """Undo what a previous conversion left in the process"""
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    if converter == 'tensorflow' and 'tensorflow' in sys.modules:
+        # the script loads the model into the default graph
+        sys.modules['tensorflow'].reset_default_graph()
+
+def run_job(job):
+    """Run a conversion job in this process.
+
+    Returns: the job result"""
+    result = OrderedDict([('id', job.get('id')), ('converter', job.get('converter'))])
+    start = time.time()
+    saved_argv = sys.argv
+    saved_stdout = sys.stdout
+    saved_stderr = sys.stderr
+    log_file = None
+    exit_code = 0
+    error = None
+    try:
+        converter = job.get('converter')
+        if not converter in CONVERTER_SCRIPTS:
+            raise ConversionServiceError("Unknown converter %s, expected one of %s" % (converter, sorted(CONVERTER_SCRIPTS)))
+        script = os.path.join(_scripts_dir or '', CONVERTER_SCRIPTS[converter])
+        if job.get('log'):
+            log_file = open(job['log'], 'w')
+            sys.stdout = sys.stderr = log_file
+        _reset_state(converter)
+        sys.argv = [script] + [str(arg) for arg in job.get('args', [])]
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            exit_code = 1
+            error = str(e.code)
+    except Exception as e:
+        traceback.print_exc()
+        exit_code = 1
+        error = str(e)
+    finally:
+        sys.argv = saved_argv
+        sys.stdout = saved_stdout
+        sys.stderr = saved_stderr
+        if log_file is not None:
+            log_file.close()
+    if exit_code != 0 and error is None:
+        error = "Converter exited with code %d" % exit_code
+    result['status'] = 'ok' if exit_code == 0 else 'failed'
+    result['exit_code'] = exit_code
+    result['seconds'] = time.time() - start
+    if error is not None:
+        result['error'] = error
+    return result
+
+#------------------------------------------------------------------------------
+#   Service side
+#------------------------------------------------------------------------------
+def read_manifest(manifest_path):
+    """Jobs of a manifest, either a json list of jobs or one job per line"""
+    with open(manifest_path, 'r') as manifest_file:
+        content = manifest_file.read()
+    if content.lstrip().startswith('['):
+        jobs = json.loads(content)
+    else:
+        jobs = [json.loads(line) for line in content.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    for i, job in enumerate(jobs):
+        job.setdefault('id', str(i))
+    return jobs
+
+class ConversionService(object):
+    """A pool of worker processes running conversion jobs.
+
+    With a single job at a time, jobs run in the service process itself,
+    which then also keeps its frameworks loaded between jobs."""
+    def __init__(self, scripts_dir, num_workers=1, preload=(), max_jobs_per_worker=None):
+        self._scripts_dir = scripts_dir
+        self._num_workers = max(num_workers, 1)
+        self._preload = list(preload)
+        self._pool = None
+        # in process jobs swap sys.argv and sys.stdout, one at a time
+        self._lock = threading.Lock()
+        if self._num_workers > 1:
+            self._pool = multiprocessing.Pool(self._num_workers,
+                                              _init_worker,
+                                              (scripts_dir, self._preload),
+                                              max_jobs_per_worker)
+        else:
+            _init_worker(scripts_dir, self._preload)
+
+    def submit(self, job, callback):
+        """Run job, calling callback with its result once done"""
+        if self._pool is None:
+            with self._lock:
+                result = run_job(job)
+            callback(result)
+        else:
+            self._pool.apply_async(run_job, (job,), callback=callback)
+
+    def run(self, jobs):
+        """Run jobs, in parallel on a pool.
+
+        Returns: the job results, in the order of the jobs"""
+        if self._pool is None:
+            with self._lock:
+                return [run_job(job) for job in jobs]
+        return self._pool.map(run_job, jobs, chunksize=1)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def serve(self, socket_path):
+        """Accept jobs on a unix socket until a shutdown request.
+
+        Clients send one json job per line and get one json result per
+        line as the jobs complete, which may be out of order on a pool. The
+        line "shutdown" stops the service once the running jobs are done."""
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen(5)
+        shutdown = threading.Event()
+        clients = []
+        try:
+            while not shutdown.is_set():
+                connection = server.accept()[0]
+                client = threading.Thread(target=self.__serve_client, args=(connection, socket_path, shutdown))
+                client.daemon = True
+                client.start()
+                clients.append(client)
+        finally:
+            server.close()
+            os.remove(socket_path)
+        for client in clients:
+            client.join()
+
+    def __serve_client(self, connection, socket_path, shutdown):
+        lock = threading.Lock()
+        pending = [0]
+        done = threading.Condition(lock)
+
+        def reply(result):
+            with lock:
+                connection.sendall(json.dumps(result) + '\n')
+                pending[0] -= 1
+                done.notify_all()
+
+        stream = connection.makefile('r')
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                if line == SHUTDOWN_REQUEST:
+                    shutdown.set()
+                    # wake up the accept loop
+                    waker = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    waker.connect(socket_path)
+                    waker.close()
+                    break
+                try:
+                    job = json.loads(line)
+                except ValueError as e:
+                    job = None
+                    error = OrderedDict([('id', None), ('status', 'failed'), ('exit_code', 1), ('error', str(e))])
+                with lock:
+                    pending[0] += 1
+                if job is None:
+                    reply(error)
+                else:
+                    self.submit(job, reply)
+            with lock:
+                while pending[0] > 0:
+                    done.wait()
+        finally:
+            stream.close()
+            connection.close()
@@ -0,0 +1,236 @@
+#==============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#==============================================================================
+import json
+from collections import namedtuple, OrderedDict
+import numpy
+
+import translation
+import op_adapter
+from buffer_liveness import buffer_bytes
+from op_graph import AxisFormat
+
+#------------------------------------------------------------------------------
+#   Module Level Functions
+#------------------------------------------------------------------------------
+# id is the index of the layer in the DLC, which lowers one layer per node
+# in execution order. A multiply-accumulate counts as two flops; flops
+# also include the elementwise work. Bytes read include the parameters.
+LayerCost = namedtuple('LayerCost', ['id', 'name', 'type', 'macs', 'flops',
+                                     'param_bytes', 'read_bytes', 'write_bytes'])
+
+def estimate(graph):
+    """Returns: a LayerCost per node, in execution order"""
+    costs = []
+    for i, node in enumerate(graph.list_nodes()):
+        macs, flops = CostTranslations.apply_specific(node.op.type, ESTIMATE_COST, node, graph)
+        param_bytes = parameter_bytes(vars(node.op))
+        read_bytes = sum(buffer_bytes(buf) for buf in graph.get_input_buffers(node)) + param_bytes
+        write_bytes = sum(buffer_bytes(buf) for buf in graph.get_output_buffers(node))
+        costs.append(LayerCost(i, node.op.name, node.op.type, int(macs), int(flops),
+                               param_bytes, read_bytes, write_bytes))
+    return costs
+
+def format_table(costs):
+    """Returns: the costs as lines of a text table, with a total"""
+    header = "%-5s %-40s %-20s %14s %14s %12s %12s %12s %8s" % \
+             ('id', 'name', 'type', 'MACs', 'flops', 'param bytes', 'read bytes', 'write bytes', 'flops/B')
+    lines = [header, '-' * len(header)]
+    for cost in costs + [total(costs)]:
+        lines.append("%-5s %-40s %-20s %14d %14d %12d %12d %12d %8.2f" %
+                     (cost.id, cost.name[:40], cost.type[:20], cost.macs, cost.flops,
+                      cost.param_bytes, cost.read_bytes, cost.write_bytes, arithmetic_intensity(cost)))
+    return lines
+
+def total(costs):
+    return LayerCost('', 'total', '',
+                     *[sum(getattr(cost, field) for cost in costs) for field in LayerCost._fields[3:]])
+
+def arithmetic_intensity(cost):
+    """flops per byte moved. Low values point at layers bound by memory
+    bandwidth rather than by compute."""
+    moved_bytes = cost.read_bytes + cost.write_bytes
+    return float(cost.flops) / moved_bytes if moved_bytes else 0.0
+
+def save_json(costs, json_path):
+    layers = []
+    for cost in costs:
+        layer = OrderedDict(zip(LayerCost._fields, cost))
+        layer['flops_per_byte'] = arithmetic_intensity(cost)
+        layers.append(layer)
+    total_cost = OrderedDict(zip(LayerCost._fields[3:], total(costs)[3:]))
+    with open(json_path, 'w') as json_file:
+        json.dump(OrderedDict([('total', total_cost), ('layers', layers)]), json_file, indent=1)
+
+def parameter_bytes(value):
+    """Bytes of the numpy arrays in value, looking into lists,
+    tuples and dicts"""
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(parameter_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(parameter_bytes(v) for v in value)
+    return 0
+
+def weight_matrix_elements(value):
+    """Elements of the arrays of rank 2 or more in value, looking
+    into lists, tuples and dicts. Biases and other vectors are left out."""
+    if isinstance(value, numpy.ndarray):
+        return value.size if value.ndim >= 2 else 0
+    if isinstance(value, dict):
+        return sum(weight_matrix_elements(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(weight_matrix_elements(v) for v in value)
+    return 0
+
+def num_elements(buf):
+    return reduce(lambda x, y: x*y, buf.shape, 1)
+
+def num_channels(buf):
+    if buf.axis_format == AxisFormat.NSC:
+        return buf.shape[-1]
+    # NCS, or not yet tracked and then in source (channel first) order
+    return buf.shape[1]
+
+#------------------------------------------------------------------------------
+#   Translations
+#------------------------------------------------------------------------------
+CostTranslations = translation.TranslationBank()
+ESTIMATE_COST = 'estimate_cost'
+
+def register(cost_translation):
+    CostTranslations.register(cost_translation(), *cost_translation.TARGETS)
+    return cost_translation
+
+class CostTranslationBase(translation.Translation):
+    def __init__(self):
+        translation.Translation.__init__(self)
+        self.index_method(ESTIMATE_COST, self.estimate)
+
+    def estimate(self, node, graph):
+        """Returns: (MACs, flops) of the node"""
+        return 0, 0
+
+    @staticmethod
+    def output_elements(node, graph):
+        return sum(num_elements(buf) for buf in graph.get_output_buffers(node))
+
+@register
+class CostDataMovementTranslation(CostTranslationBase):
+    # layers which only copy, reorder or select data
+    TARGETS = [op_adapter.InputOp.TRANSLATION_KEY,
+               op_adapter.ConstantOp.TRANSLATION_KEY,
+               op_adapter.ConcatOp.TRANSLATION_KEY,
+               op_adapter.CropOp.TRANSLATION_KEY,
+               op_adapter.DropoutOp.TRANSLATION_KEY,
+               op_adapter.PermuteOp.TRANSLATION_KEY,
+               op_adapter.ReshapeOp.TRANSLATION_KEY,
+               op_adapter.SliceOp.TRANSLATION_KEY,
+               op_adapter.UpsampleIndexBasedOp.TRANSLATION_KEY,
+               op_adapter.UpsampleSparseOp.TRANSLATION_KEY]
+
+@register
+class CostConvolutionTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.ConvolutionOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # every output element takes kernel height * kernel width * input
+        # channels / groups MACs, the size of the weights per output
+        # channel. Dilation spreads the taps without adding any.
+        output_channels = len(node.op.bias)
+        macs = self.output_elements(node, graph) * node.op.weights.size / output_channels
+        return macs, 2 * macs + self.output_elements(node, graph)
+
+@register
+class CostDeconvolutionTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.DeconvolutionOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # every input element is scattered over kernel height * kernel
+        # width * output channels / groups outputs
+        input_buffer = graph.get_input_buffers(node)[0]
+        macs = num_elements(input_buffer) * node.op.weights.size / num_channels(input_buffer)
+        return macs, 2 * macs + self.output_elements(node, graph)
+
+@register
+class CostFullyConnectedTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.FullyConnectedOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        batch = self.output_elements(node, graph) / len(node.op.bias)
+        macs = batch * sum(weights.size for weights in node.op.weights_list)
+        return macs, 2 * macs + self.output_elements(node, graph)
+
+@register
+class CostBatchnormTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.BatchnormOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        macs = self.output_elements(node, graph)
+        return macs, 2 * macs
+
+@register
+class CostElementwiseTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.ElementwiseMaxOp.TRANSLATION_KEY,
+               op_adapter.ElementwiseProductOp.TRANSLATION_KEY,
+               op_adapter.ElementwiseSumOp.TRANSLATION_KEY,
+               op_adapter.CrossCorrelationOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # one flop per output element for each input after the first
+        return 0, self.output_elements(node, graph) * max(len(node.input_names) - 1, 1)
+
+@register
+class CostPointwiseTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.NeuronOp.TRANSLATION_KEY,
+               op_adapter.PreluOp.TRANSLATION_KEY,
+               op_adapter.SubtractMeanOp.TRANSLATION_KEY,
+               op_adapter.MaxYOp.TRANSLATION_KEY,
+               op_adapter.ResizeOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        return 0, self.output_elements(node, graph)
+
+@register
+class CostPoolTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.PoolOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        return 0, self.output_elements(node, graph) * node.op.size_x * node.op.size_y
+
+@register
+class CostRNormTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.RNormOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # a square and an add per element of the window, then the scale,
+        # power and division
+        window = node.op.size if node.op.across_channels else node.op.size * node.op.size
+        return 0, self.output_elements(node, graph) * (2 * window + 3)
+
+@register
+class CostSoftmaxTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.SoftmaxOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # exponential, sum and division
+        return 0, 3 * self.output_elements(node, graph)
+
+@register
+class CostRecurrentTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.LstmOp.TRANSLATION_KEY,
+               op_adapter.GruOp.TRANSLATION_KEY,
+               op_adapter.RnnTransformationOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # every time step of every batch multiplies the input and the state
+        # by each weight matrix once
+        output_buffer = graph.get_output_buffers(node)[0]
+        steps = num_elements(output_buffer) / output_buffer.shape[-1]
+        macs = steps * weight_matrix_elements(vars(node.op))
+        return macs, 2 * macs + self.output_elements(node, graph)
+
+@register
+class CostRoiTranslation(CostTranslationBase):
+    TARGETS = [op_adapter.RoiAlignOp.TRANSLATION_KEY,
+               op_adapter.RoiPoolingOp.TRANSLATION_KEY,
+               op_adapter.ProposalOp.TRANSLATION_KEY,
+               op_adapter.GenerateProposalsOp.TRANSLATION_KEY]
+    def estimate(self, node, graph):
+        # data dependent, counted as one flop per output element
+        return 0, self.output_elements(node, graph)
@@ -20,11 +20,53 @@ def lower(graph):
         model.set_buffer_axis_order(buf.name, buf.get_axis_order())
     return model
 
+def fuse_activations(graph):
+    """Lower the activations which directly follow a convolution or fully
+    connected layer in place on its output, as SNPE runtimes execute an
+    in-place activation as part of the producing layer. Modifies the graph,
+    so it must run right before lower().
+
+    Returns: an ActivationFusionReport"""
+    report = ActivationFusionReport()
+    DlcTranslations.apply_partial(FUSE_ACTIVATION, graph, report)
+    return report
+
+class ActivationFusionReport(object):
+    # activations are float32 in the DLC
+    BYTES_PER_ELEMENT = 4
+
+    def __init__(self):
+        # (producer name, activation name, eliminated buffer name, bytes)
+        self.fusions = []
+
+    def add(self, producer, activation, buf):
+        num_elements = reduce(lambda x, y: x*y, buf.shape, 1)
+        self.fusions.append((producer.op.name,
+                             activation.op.name,
+                             buf.name,
+                             num_elements * self.BYTES_PER_ELEMENT))
+
+    @property
+    def num_fused(self):
+        return len(self.fusions)
+
+    @property
+    def bytes_eliminated(self):
+        return sum(fusion[3] for fusion in self.fusions)
+
 #------------------------------------------------------------------------------
 #   Translations
 #------------------------------------------------------------------------------
 DlcTranslations = translation.TranslationBank()
 LOWER_TO_DLC = 'lower_to_dlc'
+FUSE_ACTIVATION = 'fuse_activation'
+
+# neuron types which are fused into the preceding convolution or fully
+# connected layer
+FUSABLE_NEURON_TYPES = [modeltools.NEURON_RELU,
+                        modeltools.NEURON_RELU_MIN_MAX,
+                        modeltools.NEURON_LOGISTIC,
+                        modeltools.NEURON_TANH]
 
 def register(dlc_translation):
     DlcTranslations.register(dlc_translation(), dlc_translation.TARGET)
@@ -35,6 +77,27 @@ class DlcTranslationBase(translation.Translation):
         translation.Translation.__init__(self)
         self.index_method(LOWER_TO_DLC, self.lower)
 
+class DlcFusableTranslationBase(DlcTranslationBase):
+    def __init__(self):
+        DlcTranslationBase.__init__(self)
+        self.index_method(FUSE_ACTIVATION, self.fuse_activation)
+
+    def fuse_activation(self, node, graph, report):
+        if len(node.output_names) != 1:
+            return
+        output_buffer = graph.get_buffer(node.output_names[0])
+        if len(output_buffer.consumers) != 1:
+            return
+        activation = list(output_buffer.consumers)[0]
+        if activation.op.type != op_adapter.NeuronOp.TRANSLATION_KEY or \
+           activation.op.neuron_type not in FUSABLE_NEURON_TYPES or \
+           activation.input_names != [output_buffer.name]:
+            return
+        if graph.get_buffer(activation.output_names[0]).axis_format != output_buffer.axis_format:
+            return
+        report.add(node, activation, output_buffer)
+        graph.make_in_place(activation)
+
 @register
 class DlcInputTranslation(DlcTranslationBase):
     TARGET = op_adapter.InputOp.TRANSLATION_KEY
@@ -58,7 +121,7 @@ class DlcBatchnormTranslation(DlcTranslationBase):
                                   node.input_names[0],
                                   node.output_names[0])
 @register
-class DlcConvolutionTranslation(DlcTranslationBase):
+class DlcConvolutionTranslation(DlcFusableTranslationBase):
     TARGET = op_adapter.ConvolutionOp.TRANSLATION_KEY
     def lower(self, node, graph, model):
         model.add_conv_layer(node.op.name,
@@ -159,7 +222,7 @@ class DlcElementwiseSumTranslation(DlcTranslationBase):
                                         node.input_names,
                                         node.output_names[0])
 @register
-class DlcFullyConnectedTranslation(DlcTranslationBase):
+class DlcFullyConnectedTranslation(DlcFusableTranslationBase):
     TARGET = op_adapter.FullyConnectedOp.TRANSLATION_KEY
     def lower(self, node, graph, model):
         model.add_fc_layer(node.op.name,
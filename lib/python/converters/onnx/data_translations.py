@@ -30,6 +30,10 @@ OnnxTranslations.register(OnnxClipTranslation(), onnx_type('Clip'))
 #   Concat
 #------------------------------------------------------------------------------
 class OnnxConcatTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         params = extract_attributes(src_op,
                                     ('axis','i'))
@@ -49,6 +53,9 @@ class OnnxConcatTranslation(OnnxTranslationBase):
             axis_map = [0,3,1,2]
             node.op.axis = axis_map[node.op.axis]
 
+    def evaluate(self, op, inputs):
+        return [numpy.concatenate(inputs, axis=op.axis)]
+
 OnnxTranslations.register(OnnxConcatTranslation(),
                           onnx_type('Concat'),
                           op_adapter.ConcatOp.TRANSLATION_KEY)
@@ -75,9 +82,9 @@ class OnnxConstantTranslation(OnnxTranslationBase):
         output_buf = graph.get_buffer(node.output_names[0])
         # Permute the constant data if necessary
         if output_buf.axis_format == AxisFormat.NSC:
-            node.op.tensor = numpy.ascontiguousarray(numpy.transpose(weights, NCS_TO_NSC))
+            node.op.tensor = numpy.ascontiguousarray(numpy.transpose(node.op.tensor, NCS_TO_NSC))
         elif output_buf.axis_format == AxisFormat.BTF:
-            node.op.tensor = numpy.ascontiguousarray(numpy.transpose(weights, TBF_TO_BTF))
+            node.op.tensor = numpy.ascontiguousarray(numpy.transpose(node.op.tensor, TBF_TO_BTF))
         eltwise_to_snpe_order(node, graph)
 
     def remove_noop(self, node, graph):
@@ -146,6 +153,10 @@ OnnxTranslations.register(OnnxFlattenTranslation(), onnx_type('Flatten'))
 #   Reshape
 #------------------------------------------------------------------------------
 class OnnxReshapeTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         params = extract_attributes(src_op, ('shape','li'))
         input_name = str(src_op.input[0])
@@ -220,6 +231,9 @@ class OnnxReshapeTranslation(OnnxTranslationBase):
             output_buf.shape = output_buf.shape[-4:]
         output_buf.axis_format = AxisFormat.NONTRIVIAL
 
+    def evaluate(self, op, inputs):
+        return [numpy.reshape(inputs[0], op.output_shape)]
+
 OnnxTranslations.register(OnnxReshapeTranslation(),
                           onnx_type('Reshape'),
                           op_adapter.ReshapeOp.TRANSLATION_KEY)
@@ -228,6 +242,10 @@ OnnxTranslations.register(OnnxReshapeTranslation(),
 #   Slice, Crop
 #------------------------------------------------------------------------------
 class OnnxSliceTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         input_buf = graph.get_buffer(str(src_op.input[0]))
         rank = len(input_buf.shape)
@@ -270,6 +288,9 @@ class OnnxSliceTranslation(OnnxTranslationBase):
     def axes_to_snpe_order(self, node, graph):
         eltwise_to_snpe_order(node, graph)
 
+    def evaluate(self, op, inputs):
+        return [inputs[0][tuple(slice(offset, offset+size) for offset, size in zip(op.offsets, op.output_shape))]]
+
 # Onnx Crop should go here as well, but the documentation is really
 # ambiguous so we won't add it until we see an example.
 OnnxTranslations.register(OnnxSliceTranslation(),
@@ -280,26 +301,39 @@ OnnxTranslations.register(OnnxSliceTranslation(),
 #   Split
 #------------------------------------------------------------------------------
 class OnnxSplitTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         params = extract_attributes(src_op,
                                     ('axis','i'),
                                     ('split','li',[]))
         input_buf = graph.get_buffer(str(src_op.input[0]))
+        # sizes of the outputs, equal when split is not given
+        split_sizes = params.split
         if not params.split:
-            params.split = [input_buf.shape[axis]/len(src_op.output)]
+            params.split = [input_buf.shape[params.axis]/len(src_op.output)]
+            split_sizes = params.split * len(src_op.output)
 
         slice_points = []
         next_slice_point = 0
         for split in params.split[1:]:
             next_slice_point += split
             slice_points.append(next_slice_point)
-        return op_adapter.SliceOp(src_op.name,
-                                  axis=params.axis,
-                                  slice_points=slice_points)
+        op = op_adapter.SliceOp(src_op.name,
+                                axis=params.axis,
+                                slice_points=slice_points)
+        op.split_sizes = list(split_sizes)
+        return op
 
     def axes_to_snpe_order(self, node, graph):
         eltwise_to_snpe_order(node, graph)
 
+    def evaluate(self, op, inputs):
+        # offsets where each output but the first starts
+        return numpy.split(inputs[0], numpy.cumsum(op.split_sizes)[:-1], axis=op.axis)
+
 OnnxTranslations.register(OnnxSplitTranslation(),
                           onnx_type('Split'),
                           op_adapter.SliceOp.TRANSLATION_KEY)
@@ -307,10 +341,29 @@ OnnxTranslations.register(OnnxSplitTranslation(),
 #------------------------------------------------------------------------------
 #   Transpose
 #------------------------------------------------------------------------------
+def is_layout_agnostic(node):
+    """Ops computing each output element from the input elements at the same
+    position, which give the same result on permuted inputs"""
+    if node.op.type == op_adapter.NeuronOp.TRANSLATION_KEY or \
+       node.op.type == OnnxNoop.TRANSLATION_KEY:
+        return len(node.input_names) == 1
+    if node.op.type in [op_adapter.ElementwiseSumOp.TRANSLATION_KEY,
+                        op_adapter.ElementwiseProductOp.TRANSLATION_KEY,
+                        op_adapter.ElementwiseMaxOp.TRANSLATION_KEY]:
+        # broadcast weights have a layout of their own
+        return not hasattr(node.op, 'bias') and not hasattr(node.op, 'weights')
+    return False
+
+def compose_permute_orders(first_order, second_order):
+    """Order of the single permute equivalent to first_order, then second_order"""
+    return [first_order[i] for i in second_order]
+
 class OnnxTransposeTranslation(OnnxTranslationBase):
     def __init__(self):
         OnnxTranslationBase.__init__(self)
         self.index_method(REMOVE_NOOP, self.remove_noop)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+        self.index_method(OPTIMIZE_PERMUTES, self.optimize_permute)
 
     def extract_parameters(self, src_op, graph):
         params = extract_attributes(src_op, ('perm','li'))
@@ -381,6 +434,116 @@ class OnnxTransposeTranslation(OnnxTranslationBase):
             # this permute is trivial, remove it
             graph.squash(node, input_buffer.name)
 
+    def optimize_permute(self, node, graph):
+        """Removes the permute if it is a duplicate or, once composed with
+        a preceding permute, an identity. Otherwise moves it below the
+        layout agnostic ops it feeds when that gets it next to another
+        permute, or merges it with the permutes of the other inputs."""
+        if self.dedup_permute(node, graph):
+            return
+        self.compose_permute(node, graph)
+        if self.cancel_permute(node, graph):
+            return
+        self.sink_permute(node, graph)
+
+    def dedup_permute(self, node, graph):
+        # keeps the first of the identical permutes of a buffer, so the
+        # consumers of later ones can be moved onto it
+        # without consumers an output is a network output, whose name stays
+        input_buffer = graph.get_input_buffers(node)[0]
+        output_buffer = graph.get_output_buffers(node)[0]
+        if not output_buffer.consumers:
+            return False
+        for other in list(input_buffer.consumers):
+            if other is node or other.op.type != node.op.type or other.op.order != node.op.order:
+                continue
+            other_buffer = graph.get_output_buffers(other)[0]
+            if other_buffer.axis_format != output_buffer.axis_format or not other_buffer.consumers:
+                continue
+            first, last = (node, other) if graph.nodes_in_order.precedes(node, other) else (other, node)
+            first_name = first.output_names[0]
+            for consumer in list(graph.get_output_buffers(last)[0].consumers):
+                graph.replace_input(consumer, last.output_names[0], first_name)
+            LOG_DEBUG(DEBUG_PERMUTE_DEDUPLICATED, last.op.name, first.op.name)
+            graph.prune(last)
+            if last is node:
+                return True
+        return False
+
+    def compose_permute(self, node, graph):
+        input_buffer = graph.get_input_buffers(node)[0]
+        prev = input_buffer.producer
+        if prev.op.type != node.op.type:
+            return
+        LOG_DEBUG(DEBUG_PERMUTES_COMPOSED, prev.op.name, node.op.name)
+        node.op.order = compose_permute_orders(prev.op.order, node.op.order)
+        graph.replace_input(node, input_buffer.name, prev.input_names[0])
+        if not input_buffer.consumers:
+            graph.prune(prev)
+
+    def cancel_permute(self, node, graph):
+        input_buffer = graph.get_input_buffers(node)[0]
+        output_buffer = graph.get_output_buffers(node)[0]
+        # without consumers the output is a network output, whose name stays
+        if node.op.order != range(len(node.op.order)) or \
+           input_buffer.axis_format != output_buffer.axis_format or \
+           not output_buffer.consumers:
+            return False
+        LOG_DEBUG(DEBUG_PERMUTE_CANCELLED, node.op.name)
+        for consumer in list(output_buffer.consumers):
+            graph.replace_input(consumer, output_buffer.name, input_buffer.name)
+        graph.prune(node)
+        return True
+
+    def sink_permute(self, node, graph):
+        output_buffer = graph.get_output_buffers(node)[0]
+        if len(output_buffer.consumers) != 1:
+            return
+        consumer = list(output_buffer.consumers)[0]
+        if not is_layout_agnostic(consumer) or len(consumer.output_names) != 1:
+            return
+        # all inputs of the consumer must be the same permute of equally
+        # laid out buffers, each only feeding the consumer
+        permutes = [buf.producer for buf in graph.get_input_buffers(consumer)]
+        for permute in permutes:
+            permute_buffer = graph.get_output_buffers(permute)[0]
+            if permute.op.type != node.op.type or permute.op.order != node.op.order or \
+               permute_buffer.consumers != set([consumer]) or \
+               graph.get_input_buffers(permute)[0].axis_format != graph.get_input_buffers(node)[0].axis_format:
+                return
+        # a single permute only moves, which pays off once it reaches another
+        if len(set(permutes)) == 1 and not self.__reaches_permute(consumer, graph):
+            return
+
+        consumer_buffer = graph.get_output_buffers(consumer)[0]
+        permute_name = consumer_buffer.name + '.' + node.op.type
+        if not consumer_buffer.consumers or permute_name in graph.buffers or permute_name in graph.nodes_by_name:
+            return
+        LOG_DEBUG(DEBUG_PERMUTE_SUNK, node.op.name, consumer.op.name)
+        input_buffer = graph.get_input_buffers(node)[0]
+        output_format = consumer_buffer.axis_format
+        for permute in set(permutes):
+            graph.replace_input(consumer, permute.output_names[0], permute.input_names[0])
+            graph.prune(permute)
+        consumer_buffer.shape = input_buffer.shape[:]
+        consumer_buffer.axis_format = input_buffer.axis_format
+        graph.inject(op_adapter.PermuteOp(permute_name, node.op.order), consumer_buffer.name, permute_name)
+        graph.get_buffer(permute_name).axis_format = output_format
+
+    def __reaches_permute(self, node, graph):
+        while True:
+            consumers = graph.get_output_buffers(node)[0].consumers
+            if len(consumers) != 1:
+                return False
+            node = list(consumers)[0]
+            if node.op.type == op_adapter.PermuteOp.TRANSLATION_KEY:
+                return True
+            if not is_layout_agnostic(node) or len(node.input_names) != 1:
+                return False
+
+    def evaluate(self, op, inputs):
+        return [numpy.transpose(inputs[0], op.order)]
+
 OnnxTranslations.register(OnnxTransposeTranslation(),
                           onnx_type('Transpose'),
                           op_adapter.PermuteOp.TRANSLATION_KEY)
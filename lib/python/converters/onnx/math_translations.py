@@ -15,6 +15,7 @@ class OnnxAddTranslation(OnnxTranslationBase):
     def __init__(self):
         OnnxTranslationBase.__init__(self)
         self.index_method(SQUASH_SCALE, self.squash_scale)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
 
     def extract_parameters(self, src_op, graph):
         op = op_adapter.ElementwiseSumOp(str(src_op.name))
@@ -43,9 +44,17 @@ class OnnxAddTranslation(OnnxTranslationBase):
                    node.op.name,
                    prev.op.name,
                    prev.op.type)
-            prev.op.bias += node.op.bias
+            # weights are read only, add into a new array
+            prev.op.bias = prev.op.bias + node.op.bias
             graph.squash(node, input_buffer.name)
 
+    def evaluate(self, op, inputs):
+        # bias-adds are squashed instead
+        if hasattr(op, 'bias'):
+            return None
+        coeffs = op.coeffs or [1.0]*len(inputs)
+        return [sum(coeff*tensor for coeff, tensor in zip(coeffs, inputs))]
+
 OnnxTranslations.register(OnnxAddTranslation(),
                           onnx_type('Add'),
                           op_adapter.ElementwiseSumOp.TRANSLATION_KEY)
@@ -66,13 +75,15 @@ class OnnxGemmTranslation(OnnxTranslationBase):
                ERROR_GEMM_TRANSPOSE_NOT_SUPPORTED)
         input_names = map(str, src_op.input)
         weights, bias = graph.weights.fetch(*input_names[1:])
-        weights *= params.alpha
+        if params.alpha != 1.0:
+            weights = weights * params.alpha
         # for GEMM, weights are supposed to be B and thus KxN.
         # for FC, weights are supposed to be NxK and get transposed
         # implicitly. Transpose explicitly here so that they wind up as NxK
         # for axes_to_snpe_order
         weights = numpy.ascontiguousarray(numpy.transpose(weights, (1,0)))
-        bias *= params.beta
+        if params.beta != 1.0:
+            bias = bias * params.beta
         return op_adapter.FullyConnectedOp(src_op.name, [weights], bias)
 
     def extract_input_names(self, src_op, graph):
@@ -110,6 +121,10 @@ OnnxTranslations.register(OnnxMatMulTranslation(), onnx_type('MatMul'))
 #   Max
 #------------------------------------------------------------------------------
 class OnnxMaxTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         assert_no_broadcast(src_op)
         return op_adapter.ElementwiseMaxOp(str(src_op.name))
@@ -117,6 +132,9 @@ class OnnxMaxTranslation(OnnxTranslationBase):
     def axes_to_snpe_order(self, node, graph):
         eltwise_to_snpe_order(node, graph)
 
+    def evaluate(self, op, inputs):
+        return [reduce(numpy.maximum, inputs)]
+
 OnnxTranslations.register(OnnxMaxTranslation(),
                           onnx_type('Max'),
                           op_adapter.ElementwiseMaxOp.TRANSLATION_KEY)
@@ -128,6 +146,7 @@ class OnnxMulTranslation(OnnxTranslationBase):
     def __init__(self):
         OnnxTranslationBase.__init__(self)
         self.index_method(SQUASH_SCALE, self.squash_scale)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
 
     def extract_parameters(self, src_op, graph):
         op = op_adapter.ElementwiseProductOp(src_op.name)
@@ -155,10 +174,16 @@ class OnnxMulTranslation(OnnxTranslationBase):
                    prev.op.name,
                    prev.op.type)
             weights = node.op.weights
-            prev.op.weights *= weights
-            prev.op.bias *= weights
+            prev.op.weights = prev.op.weights * weights
+            prev.op.bias = prev.op.bias * weights
             graph.squash(node, input_buffer.name)
 
+    def evaluate(self, op, inputs):
+        # scales are squashed instead
+        if hasattr(op, 'weights'):
+            return None
+        return [reduce(numpy.multiply, inputs)]
+
 OnnxTranslations.register(OnnxMulTranslation(),
                           onnx_type('Mul'),
                           op_adapter.ElementwiseProductOp.TRANSLATION_KEY)
@@ -167,12 +192,29 @@ OnnxTranslations.register(OnnxMulTranslation(),
 #   Relu
 #------------------------------------------------------------------------------
 class OnnxReluTranslation(OnnxTranslationBase):
+    def __init__(self):
+        OnnxTranslationBase.__init__(self)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
+
     def extract_parameters(self, src_op, graph):
         return op_adapter.NeuronOp(src_op.name, modeltools.NEURON_RELU)
 
     def axes_to_snpe_order(self, node, graph):
         eltwise_to_snpe_order(node, graph)
 
+    # evaluates every neuron op, like axes_to_snpe_order
+    def evaluate(self, op, inputs):
+        x = inputs[0]
+        if op.neuron_type == modeltools.NEURON_RELU:
+            return [numpy.maximum(x, 0)]
+        elif op.neuron_type == modeltools.NEURON_RELU_MIN_MAX:
+            return [numpy.clip(x, op.min_clamp, op.max_clamp)]
+        elif op.neuron_type == modeltools.NEURON_LOGISTIC:
+            return [1.0/(1.0 + numpy.exp(-x))]
+        elif op.neuron_type == modeltools.NEURON_TANH:
+            return [op.a*numpy.tanh(op.b*x)]
+        return None
+
 OnnxTranslations.register(OnnxReluTranslation(),
                           onnx_type('Relu'),
                           op_adapter.NeuronOp.TRANSLATION_KEY)
@@ -11,6 +11,7 @@
 #------------------------------------------------------------------------------
 ERROR_ASYMMETRIC_PADS_VALUES = "SNPE does not support asymmetric pads values"
 ERROR_ACTIVATION_FUNCTION_UNSUPPORTED="SNPE does not support activation function {}"
+ERROR_ACTIVATION_MEMORY_LIMIT="Network needs {} bytes of activation memory at its peak, more than the limit of {} bytes"
 ERROR_ADD_BIAS_PREV_NO_BIAS="Cannot squash bias-add op {} onto predecessor {} with type {}"
 ERROR_ATTRIBUTE_MISSING="Node {} is missing required attribute {}"
 ERROR_ATTRIBUTE_WRONG_TYPE="Node {}: requested to extract parameter {} with type {}, but stored as type {}"
@@ -31,6 +32,7 @@ ERROR_PADDING_TYPE_UNSUPPORTED="Node {}: SNPE does not support padding type {}"
 ERROR_PERMUTE_TOO_MANY_DIMENSIOSN="SNPE does not support permute with >3 dimensions"
 ERROR_PERMUTE_UNEXPECTED_INPUT_ORDER="Permute op got unexpected input data order {}"
 ERROR_WEIGHTS_MISSING_KEY="Expected a static initializer for value {}"
+ERROR_WEIGHTS_RELEASED="Weights {} were already fetched by all of their consumers and released"
 ERROR_ONNX_NOT_FOUND="No onnx installation found on PYTHONPATH: {}"
 ERROR_RESHAPE_BATCH_UNSUPPORTED="SNPE does not support a batch dimension greater than 1 for reshape ops"
 ERROR_RESHAPE_UNEXPECTED_INPUT_ORDER="Reshape op got unexpected input data order {}"
@@ -48,7 +50,13 @@ WARNING_MATMUL="SNPE does not support MatMul in the general case, attempting to
 #   Info
 #------------------------------------------------------------------------------
 INFO_DLC_SAVE_LOCATION = "Saving model at {}"
+INFO_CONVERSION_PROFILE = "Added {} nodes in {:.1f}ms, {} of {} shape inferences memoized"
+INFO_COST_SAVE_LOCATION = "Saving layer cost estimates at {}"
+INFO_NETWORK_COST = "Estimated cost: {} MACs, {} bytes of parameters, {} bytes of activations moved"
 INFO_STATIC_RESHAPE = "Applying static reshape to {}: new name {} new shape {}"
+INFO_NODES_REORDERED = "Reordered nodes for activation memory: peak of {} bytes before, {} bytes after"
+INFO_PEAK_ACTIVATION_MEMORY = "Peak activation memory of {} bytes while running {}, {} bytes without buffer reuse"
+INFO_ACTIVATIONS_FUSED = "Fused {} activations, eliminating {} bytes of intermediate buffers"
 
 #------------------------------------------------------------------------------
 #   Debug
@@ -57,5 +65,16 @@ DEBUG_AXES_TO_SNPE_ORDER_ENTRY="Node {}: axes_to_snpe_order"
 DEBUG_AXES_TO_SNPE_ORDER_INPUT_SIZE = "Input buffer {}: shape {}"
 DEBUG_INFERRED_SHAPE = "Node {}: inferred output shape {}"
 DEBUG_CONVERTING_NODE="Attempting to convert node {} with type {}"
+DEBUG_PEAK_BUFFER="Buffer {} of {} bytes is live at the peak, from {} to {}"
+DEBUG_PEAK_DTYPE_MEMORY="Peak activation memory of the {} buffers: {} bytes"
+DEBUG_OP_TYPE_PROFILE="Op type {}: {} nodes added in {:.1f}ms"
+DEBUG_SHAPE_INFERENCE_PROFILE="Op type {}: {} shapes inferred in {:.1f}ms"
+DEBUG_PASS_STATS="Pass {}: {:.1f}ms, {} rounds, {} nodes visited, {} nodes changed"
+DEBUG_ACTIVATION_FUSED="Fusing activation {} into {}, in place on its output instead of buffer {} ({} bytes)"
+DEBUG_CONSTANT_FOLDED="Node {} with type {}: all inputs are constant, folding into a constant op"
 DEBUG_CONSTANT_PRUNED="Constant op {} consumed by weight layer, pruning from network"
+DEBUG_PERMUTE_CANCELLED="Permute {} is an identity once composed, removing it"
+DEBUG_PERMUTE_DEDUPLICATED="Permute {} duplicates permute {}, removing it"
+DEBUG_PERMUTE_SUNK="Moving permute {} below layout agnostic op {}"
+DEBUG_PERMUTES_COMPOSED="Composing permute {} into permute {}"
 DEBUG_RETRIEVE_WEIGHTS="Retrieving weights {}"
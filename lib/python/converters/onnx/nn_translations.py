@@ -186,6 +186,9 @@ OnnxTranslations.register(OnnxConvTranslation(),
 #   ConvTranspose
 #------------------------------------------------------------------------------
 class OnnxConvTransposeTranslation(OnnxTranslationBase):
+    # infer_output_shapes stores the output size in the op
+    MEMOIZE_SHAPES = False
+
     def extract_parameters(self, src_op, graph):
         input_names = map(str, src_op.input)
         weights = graph.weights.fetch(input_names[1])
@@ -6,13 +6,21 @@
 #
 #==============================================================================
 import argparse
+import os
 import sys
+import time
 import traceback
-from .. import translation, op_adapter, op_graph, lower_to_dlc
+from .. import translation, op_adapter, op_graph, lower_to_dlc, buffer_liveness, cost_model
 from util import *
 try:
     import onnx
-    parse_model = onnx.load
+    def parse_model(model_path):
+        # initializers stored as external data are mapped by the
+        # WeightProvider rather than read into the model
+        try:
+            return onnx.load(model_path, load_external_data=False)
+        except TypeError:
+            return onnx.load(model_path)
 except ImportError:
     def parse_model(model_path):
         raise Exception(ERROR_ONNX_NOT_FOUND.format(str(sys.path)))
@@ -31,6 +39,10 @@ def parse_args():
     parser.add_argument('--encoding',
                         help='Set the image encoding for an input buffer. This should be specifed in the format "--encoding <input name> <encoding>", where encoding is one of: "argb32", "rgba", "nv21", "opaque", or "bgr". The defautl encoding for all inputs not so described is "bgr". "opaque" inputs will be interpreted as-is by SNPE, and not subject to order transformations.',
                         nargs=2, action='append')
+    parser.add_argument("--disable_activation_fusion",help="Do not fuse activations into the preceding convolution or fully connected layer", action="store_true")
+    parser.add_argument("--minimize_activation_memory",help="Reorder independent branches of the network to lower its peak activation memory", action="store_true")
+    parser.add_argument("--max_activation_memory",help="Fail the conversion if the network needs more bytes of activation memory at its peak", type=int, default=0)
+    parser.add_argument("--print_layer_costs",help="Print the estimated MACs, flops and bytes moved of every layer. They are always saved next to the DLC, as <dlc name>.cost.json", action="store_true")
     parser.add_argument("--debug",help="Run the converter in debug mode", action="store_true")
     args = parser.parse_args()
     return args
@@ -49,12 +61,19 @@ def sanitize_args(args):
 class OnnxConverter(object):
     def __init__(self):
         self.translations = onnx_translations.OnnxTranslations
+        self.shape_inference_policy = OnnxShapeInferencePolicy()
         self.graph = op_graph.OpGraph(naming_policy=OnnxNamePolicy(),
-                                      shape_inference_policy=OnnxShapeInferencePolicy())
+                                      shape_inference_policy=self.shape_inference_policy)
+        # time spent adding the nodes of each onnx op type
+        self.profile = translation.OpTypeProfile()
 
         self.input_model_path = ''
         self.output_model_path = ''
         self.debug = False
+        self.fuse_activations = True
+        self.minimize_activation_memory = False
+        self.max_activation_memory = 0
+        self.print_layer_costs = False
 
     def __call__(self, args):
         self.set_options(args)
@@ -65,11 +84,15 @@ class OnnxConverter(object):
         self.input_model_path = args.model_path
         self.output_model_path = args.dlc_path
         self.debug = args.debug
+        self.fuse_activations = not args.disable_activation_fusion
+        self.minimize_activation_memory = args.minimize_activation_memory
+        self.max_activation_memory = args.max_activation_memory
+        self.print_layer_costs = args.print_layer_costs
         self.converter_command = sanitize_args(args)
         setup_logging(args)
 
     def convert(self, model):
-        self.graph.weights = WeightProvider(model)
+        self.graph.weights = WeightProvider(model, os.path.dirname(self.input_model_path))
         # extract inputs
         parameter_names = set()
         for tensor in model.graph.initializer:
@@ -89,26 +112,31 @@ class OnnxConverter(object):
             LOG_DEBUG(DEBUG_CONVERTING_NODE, i, src_op.op_type)
             src_type = onnx_type(src_op.op_type)
             try:
-                self.translations.apply_specific(src_type,
-                                                 onnx_translations.ADD_OP,
-                                                 src_op,
-                                                 self.graph)
+                self.profile.timed(src_type,
+                                   self.translations.get_method(src_type, onnx_translations.ADD_OP),
+                                   src_op,
+                                   self.graph)
             except Exception, e:
                 if self.debug:
                     traceback.print_exc()
                 LOG_ERROR("Node %s: %s" % (src_op.name, e))
                 sys.exit(-1)
+        clear_attribute_cache()
+        self.log_profile()
 
         try:
-            # apply graph transformations
-            self.translations.apply_partial(onnx_translations.SQUASH_SCALE, self.graph)
-            self.translations.apply_partial(onnx_translations.SQUASH_BATCHNORM, self.graph)
-
-            # transition to HWC
-            self.translations.apply_total(onnx_translations.AXES_TO_SNPE_ORDER, self.graph)
-
+            # apply graph transformations, then transition to HWC and
             # remove NOOPs, which may include trivial permutes at this point
-            self.translations.apply_partial(onnx_translations.REMOVE_NOOP, self.graph)
+            passes = translation.PassManager(self.translations)
+            passes.add_partial(onnx_translations.FOLD_CONSTANTS)
+            passes.add_partial(onnx_translations.SQUASH_SCALE)
+            passes.add_partial(onnx_translations.SQUASH_BATCHNORM)
+            passes.add_total(onnx_translations.AXES_TO_SNPE_ORDER)
+            passes.add_partial(onnx_translations.OPTIMIZE_PERMUTES)
+            passes.add_partial(onnx_translations.REMOVE_NOOP)
+            for stats in passes.run(self.graph):
+                LOG_DEBUG(DEBUG_PASS_STATS, stats.method_name, stats.seconds * 1000, stats.rounds,
+                          stats.visited, stats.changed)
         except Exception, e:
             if self.debug:
                 traceback.print_exc()
@@ -121,10 +149,58 @@ class OnnxConverter(object):
         else:
             output_path = self.output_model_path
         LOG_INFO(INFO_DLC_SAVE_LOCATION, output_path)
+        if self.fuse_activations:
+            report = lower_to_dlc.fuse_activations(self.graph)
+            for producer_name, activation_name, buffer_name, num_bytes in report.fusions:
+                LOG_DEBUG(DEBUG_ACTIVATION_FUSED, activation_name, producer_name, buffer_name, num_bytes)
+            LOG_INFO(INFO_ACTIVATIONS_FUSED, report.num_fused, report.bytes_eliminated)
+        self.analyze_memory()
+        self.estimate_costs(os.path.splitext(output_path)[0] + '.cost.json')
         model = lower_to_dlc.lower(self.graph)
         model.set_converter_command(self.converter_command)
         model.save(output_path)
 
+    def analyze_memory(self):
+        if self.minimize_activation_memory:
+            before, analysis = buffer_liveness.minimize_peak_memory(self.graph)
+            LOG_INFO(INFO_NODES_REORDERED, before.peak_bytes, analysis.peak_bytes)
+        else:
+            analysis = buffer_liveness.LivenessAnalysis(self.graph)
+        if not analysis.nodes:
+            return
+
+        LOG_INFO(INFO_PEAK_ACTIVATION_MEMORY, analysis.peak_bytes, analysis.peak_node.op.name, analysis.total_bytes())
+        for dtype, peak_bytes in sorted(analysis.peak_bytes_by_dtype().items()):
+            LOG_DEBUG(DEBUG_PEAK_DTYPE_MEMORY, dtype, peak_bytes)
+        for live_range in analysis.peak_buffers():
+            LOG_DEBUG(DEBUG_PEAK_BUFFER, live_range.name, live_range.num_bytes,
+                      analysis.nodes[live_range.first].op.name, analysis.nodes[live_range.last].op.name)
+        if self.max_activation_memory and analysis.peak_bytes > self.max_activation_memory:
+            LOG_ERROR(ERROR_ACTIVATION_MEMORY_LIMIT, analysis.peak_bytes, self.max_activation_memory)
+            sys.exit(-1)
+
+    def log_profile(self):
+        for op_type, count, seconds in self.profile.rows():
+            LOG_DEBUG(DEBUG_OP_TYPE_PROFILE, op_type, count, seconds * 1000)
+        for op_type, count, seconds in self.shape_inference_policy.profile.rows():
+            LOG_DEBUG(DEBUG_SHAPE_INFERENCE_PROFILE, op_type, count, seconds * 1000)
+        LOG_INFO(INFO_CONVERSION_PROFILE,
+                 sum(self.profile.counts.values()),
+                 self.profile.total_seconds() * 1000,
+                 self.shape_inference_policy.memo_hits,
+                 sum(self.shape_inference_policy.profile.counts.values()))
+
+    def estimate_costs(self, json_path):
+        costs = cost_model.estimate(self.graph)
+        if self.print_layer_costs:
+            for line in cost_model.format_table(costs):
+                LOG_INFO("{}", line)
+        total_cost = cost_model.total(costs)
+        LOG_INFO(INFO_NETWORK_COST, total_cost.macs, total_cost.param_bytes,
+                 total_cost.read_bytes + total_cost.write_bytes - total_cost.param_bytes)
+        cost_model.save_json(costs, json_path)
+        LOG_INFO(INFO_COST_SAVE_LOCATION, json_path)
+
 #------------------------------------------------------------------------------
 #   Policies
 #------------------------------------------------------------------------------
@@ -147,9 +223,27 @@ class OnnxNamePolicy(object):
         return map(str, output_names)
 
 class OnnxShapeInferencePolicy(object):
+    """Infers shapes with the INFER_SHAPE method of the op's translation.
+    Results are memoized by op parameters and input shapes, as networks
+    repeat the same layers many times."""
+    def __init__(self):
+        self.memo = {}
+        self.memo_hits = 0
+        self.profile = translation.OpTypeProfile()
 
     def infer_shape(self, op, input_shapes):
-        return onnx_translations.OnnxTranslations.apply_specific(op.type,
-                                                                 onnx_translations.INFER_SHAPE,
-                                                                 op,
-                                                                 input_shapes)
+        start = time.time()
+        translations = onnx_translations.OnnxTranslations
+        key = None
+        if translations.get_translation(op.type).MEMOIZE_SHAPES:
+            key = onnx_translations.shape_inference_key(op, input_shapes)
+        if key is not None and key in self.memo:
+            self.memo_hits += 1
+            output_shapes = self.memo[key]
+        else:
+            output_shapes = translations.get_method(op.type, onnx_translations.INFER_SHAPE)(op, input_shapes)
+            if key is not None:
+                self.memo[key] = [type(shape)(shape) for shape in output_shapes]
+        self.profile.add(op.type, time.time() - start)
+        # copies, as buffers take ownership of their shape
+        return [type(shape)(shape) for shape in output_shapes]
@@ -18,6 +18,8 @@ REMOVE_NOOP = "REMOVE_NOOP"
 SQUASH_BATCHNORM = "SQUASH_BATCHNORM"
 SQUASH_SCALE = "SQUASH_SCALE"
 AXES_TO_SNPE_ORDER = "AXES_TO_SNPE_ORDER"
+FOLD_CONSTANTS = "FOLD_CONSTANTS"
+OPTIMIZE_PERMUTES = "OPTIMIZE_PERMUTES"
 
 
 def inject_implicit_permute(graph, input_name, target_format, permute_order, consumers=None):
@@ -96,7 +98,33 @@ def log_axes_to_snpe_order(node, graph):
                   input_name,
                   str(graph.get_buffer(input_name).shape))
 
+def freeze(value):
+    """Hashable equivalent of an op parameter for shape inference, which
+    only depends on the shape and type of arrays"""
+    if isinstance(value, numpy.ndarray):
+        return ('ndarray', value.shape, value.dtype.str)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(v)) for key, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def shape_inference_key(op, input_shapes):
+    """Key under which the output shapes of op can be memoized, or None"""
+    key = (op.type,
+           freeze([(name, value) for name, value in sorted(vars(op).items()) if name != 'name']),
+           freeze(input_shapes))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
 class OnnxTranslationBase(translation.Translation):
+    # whether infer_output_shapes only depends on the op parameters and the
+    # input shapes, and has no side effect on the op
+    MEMOIZE_SHAPES = True
+
     def __init__(self):
         translation.Translation.__init__(self)
         self.index_method(ADD_OP, self.add_op)
@@ -118,6 +146,29 @@ class OnnxTranslationBase(translation.Translation):
     def infer_output_shapes(self, node, input_shapes):
         return [input_shapes[0]]
 
+    def fold_constants(self, node, graph):
+        """Replace the node by constants when all of its inputs are constants
+        and evaluate() can compute its outputs. Translations opt in by
+        indexing this method as FOLD_CONSTANTS."""
+        producers = [buf.producer for buf in graph.get_input_buffers(node)]
+        if not producers or \
+           any(producer.op.type != op_adapter.ConstantOp.TRANSLATION_KEY for producer in producers):
+            return
+        outputs = self.evaluate(node.op, [producer.op.tensor for producer in producers])
+        if outputs is None:
+            return
+        LOG_DEBUG(DEBUG_CONSTANT_FOLDED, node.op.name, node.op.type)
+        graph.fold(node, [numpy.ascontiguousarray(output, dtype=numpy.float32) for output in outputs])
+        # constants which only fed the folded node are dead now
+        for producer in set(producers):
+            if not any(buf.consumers for buf in graph.get_output_buffers(producer)):
+                graph.prune(producer)
+
+    def evaluate(self, op, inputs):
+        """Outputs of op computed with numpy from constant inputs, or None
+        if it can't be evaluated at conversion time"""
+        return None
+
 #------------------------------------------------------------------------------
 #   StaticOp
 #------------------------------------------------------------------------------
@@ -180,6 +231,7 @@ class OnnxNoopTranslation(OnnxTranslationBase):
     def __init__(self):
         OnnxTranslationBase.__init__(self)
         self.index_method(REMOVE_NOOP, self.remove_noop)
+        self.index_method(FOLD_CONSTANTS, self.fold_constants)
 
     def extract_parameters(self, src_op, graph):
         return OnnxNoop(src_op.name)
@@ -190,6 +242,9 @@ class OnnxNoopTranslation(OnnxTranslationBase):
     def remove_noop(self, node, graph):
         graph.squash(node, node.input_names[0])
 
+    def evaluate(self, op, inputs):
+        return [inputs[0]]
+
     def axes_to_snpe_order(self, node, graph):
         output_buf = graph.get_output_buffers(node)[0]
         input_buf = graph.get_input_buffers(node)[0]
@@ -7,6 +7,7 @@
 #==============================================================================
 import logging
 import numpy
+import os
 from snpe import modeltools
 from messages import *
 try:
@@ -28,6 +29,36 @@ class NamedDict(dict):
     def __getattr__(self, key):
         return self[key]
 
+ATTRIBUTE_TYPE_CODES = {}
+def get_attribute_type_codes():
+    if not ATTRIBUTE_TYPE_CODES:
+        ATTRIBUTE_TYPE_CODES.update({ 'i':onnx.AttributeProto.INT,
+                                      'f':onnx.AttributeProto.FLOAT,
+                                      's':onnx.AttributeProto.STRING,
+                                      't':onnx.AttributeProto.TENSOR,
+                                      'g':onnx.AttributeProto.GRAPH,
+                                      'li':onnx.AttributeProto.INTS,
+                                      'lf':onnx.AttributeProto.FLOATS,
+                                      'ls':onnx.AttributeProto.STRINGS,
+                                      'lt':onnx.AttributeProto.TENSORS,
+                                      'lg':onnx.AttributeProto.GRAPHS })
+    return ATTRIBUTE_TYPE_CODES
+
+# id of a NodeProto -> (NodeProto, attribute name -> AttributeProto). The
+# node is kept referenced so that its id can't be reused while cached.
+ATTRIBUTE_MAP_CACHE = {}
+def get_attribute_map(onnx_op):
+    """Attributes of an onnx NodeProto by name, built once per node as
+    translations extract attributes of the same node several times"""
+    cached = ATTRIBUTE_MAP_CACHE.get(id(onnx_op))
+    if cached is None or cached[0] is not onnx_op:
+        cached = (onnx_op, dict((attr.name, attr) for attr in onnx_op.attribute))
+        ATTRIBUTE_MAP_CACHE[id(onnx_op)] = cached
+    return cached[1]
+
+def clear_attribute_cache():
+    ATTRIBUTE_MAP_CACHE.clear()
+
 def extract_attributes(onnx_op, *attr_infos):
     """Ensure the existence and extract well typed attributes from an onnx
     NodeProto.
@@ -45,20 +76,8 @@ def extract_attributes(onnx_op, *attr_infos):
       If no default is specified, this function will thrown an error.
 
     The return object will have a named property for each attribute info."""
-    onnx_attrs = {}
-    for attr in onnx_op.attribute:
-        onnx_attrs[attr.name] = attr
-
-    code_to_enum = { 'i':onnx.AttributeProto.INT,
-                     'f':onnx.AttributeProto.FLOAT,
-                     's':onnx.AttributeProto.STRING,
-                     't':onnx.AttributeProto.TENSOR,
-                     'g':onnx.AttributeProto.GRAPH,
-                     'li':onnx.AttributeProto.INTS,
-                     'lf':onnx.AttributeProto.FLOATS,
-                     'ls':onnx.AttributeProto.STRINGS,
-                     'lt':onnx.AttributeProto.TENSORS,
-                     'lg':onnx.AttributeProto.GRAPHS }
+    onnx_attrs = get_attribute_map(onnx_op)
+    code_to_enum = get_attribute_type_codes()
 
     ret = NamedDict()
     for attr_info in attr_infos:
@@ -139,6 +158,9 @@ def pads_righthanded(pads):
     # don't call all zeros righthanded
     return not all(x == 0 for x in pads)
 
+# TensorProto.EXTERNAL, for onnx versions without external data
+ONNX_DATA_LOCATION_EXTERNAL = 1
+
 def product(nums):
     if len(nums) == 0:
         return 1
@@ -146,9 +168,15 @@ def product(nums):
         return reduce(int.__mul__, nums)
 
 class WeightData(object):
-    def __init__(self, weights):
-       # Weights from the network
+    def __init__(self, weights=None, tensor=None, uses=0):
+       # Weights from the network, decoded from tensor on first use when
+       # they come from an initializer. Read only, so that they can be views
+       # of the serialized data shared by every consumer.
        self.weights = weights
+       self.tensor = tensor
+       # Number of node inputs which still have to fetch the weights. Once
+       # it drops to 0 the provider lets go of the data.
+       self.uses = uses
        # Track if the weights have been retrieved for use in another layer
        # Weights can be provided in one of two ways: initializers or constant ops
        # Constant ops being used as weight providers are setup with the weights from 
@@ -159,20 +187,65 @@ class WeightData(object):
        # the network at the end
        self.consumed = False
 
+def decode_onnx_tensor(tensor, base_dir=''):
+    """Decode a TensorProto without copying its data where possible: raw
+    data becomes a view of the serialized bytes, external data (in a file
+    relative to base_dir) a read only memory map of the file."""
+    np_type = onnx.mapping.TENSOR_TYPE_TO_NP_TYPE.get(tensor.data_type) if hasattr(onnx, 'mapping') else None
+    if np_type is None or numpy.dtype(np_type).kind not in 'biuf':
+        return extract_onnx_tensor(tensor)
+    # serialized tensors are little endian
+    dtype = numpy.dtype(np_type).newbyteorder('<')
+    shape = tuple(int(dim) for dim in tensor.dims)
+    if getattr(tensor, 'data_location', 0) == ONNX_DATA_LOCATION_EXTERNAL:
+        info = dict((entry.key, entry.value) for entry in tensor.external_data)
+        return numpy.memmap(os.path.join(base_dir, info['location']),
+                            dtype=dtype,
+                            mode='r',
+                            offset=int(info.get('offset', 0)),
+                            shape=shape)
+    if tensor.raw_data:
+        return numpy.frombuffer(tensor.raw_data, dtype=dtype).reshape(shape)
+    return extract_onnx_tensor(tensor)
+
 #------------------------------------------------------------------------------
 #   WeightProvider
 #------------------------------------------------------------------------------
 class WeightProvider(object):
-    def __init__(self, model):
+    """Static tensors of the model, keyed by name.
+
+    Initializers are decoded on their first fetch. fetch() returns read only
+    float32 arrays which share their data with the serialized model wherever
+    the types allow it, so translations which modify weights must work on a
+    copy (e.g. weights = weights * alpha rather than weights *= alpha). The
+    provider drops its reference to the data once every node input naming
+    it fetched it."""
+    def __init__(self, model, base_dir=''):
+        self.base_dir = base_dir
+        self.uses = {}
+        for node in model.graph.node:
+            for name in node.input:
+                self.uses[str(name)] = self.uses.get(str(name), 0) + 1
         self.weight_map = {}
         for tensor in model.graph.initializer:
-            self.weight_map[str(tensor.name)] = WeightData(extract_onnx_tensor(tensor))
+            key = str(tensor.name)
+            self.weight_map[key] = WeightData(tensor=tensor, uses=self.uses.get(key, 0))
 
     def consumed(self, key):
         if not key in self.weight_map:
             return False
         return self.weight_map[key].consumed
 
+    def __load(self, key):
+        data = self.weight_map[key]
+        if data.weights is None:
+            if data.tensor is None:
+                raise KeyError(ERROR_WEIGHTS_RELEASED.format(key))
+            data.weights = decode_onnx_tensor(data.tensor, self.base_dir)
+            data.weights.setflags(write=False)
+            data.tensor = None
+        return data.weights
+
     def fetch(self, *keys):
         ret = []
         for key in keys:
@@ -180,9 +253,20 @@ class WeightProvider(object):
             LOG_DEBUG(DEBUG_RETRIEVE_WEIGHTS, key)
             if not key in self.weight_map:
                 raise KeyError(ERROR_WEIGHTS_MISSING_KEY.format(key))
-            self.weight_map[key].consumed = True
-            # Explicitly copy the data so if later ops modify it, the original data remains intact
-            ret.append(numpy.require(self.weight_map[key].weights.copy(), dtype=numpy.float32))
+            weights = self.__load(key)
+            data = self.weight_map[key]
+            data.consumed = True
+            data.uses -= 1
+            if data.uses == 0:
+                data.weights = None
+            if weights.dtype == numpy.float32:
+                # a new array object, so that consumers reshaping their
+                # weights in place do not affect each other
+                weights = weights.view(numpy.ndarray)
+            else:
+                weights = weights.astype(numpy.float32)
+                weights.setflags(write=False)
+            ret.append(weights)
         if len(ret) == 1:
             return ret[0]
         else:
@@ -193,7 +277,9 @@ class WeightProvider(object):
 
     def insert(self, key, weights):
         LOG_DEBUG("Inserting weights for {}", key)
-        self.weight_map[key] = WeightData(weights)
+        weights = numpy.asarray(weights).view()
+        weights.setflags(write=False)
+        self.weight_map[key] = WeightData(weights=weights, uses=self.uses.get(key, 0))
 
 #------------------------------------------------------------------------------
 #   Logging
@@ -78,22 +78,130 @@ class Buffer(object):
         else:
             raise ValueError("Encountered unexpected axis format for get_axis_order: %s" % self.axis_format)
 
+class _NodeLink(object):
+    __slots__ = ['node', 'prev', 'next', 'label']
+
+    def __init__(self, node, label):
+        self.node = node
+        self.prev = self
+        self.next = self
+        self.label = label
+
+class OrderedNodeList(object):
+    """Nodes in execution order.
+
+    A circular doubly linked list with a link per node indexed by the node,
+    so append, insert_after, remove and membership are O(1). Labels increase
+    along the list, making position comparisons O(1) too; they are spread out
+    again (O(n), amortized over many inserts) when an insert finds no gap."""
+    LABEL_GAP = 1 << 32
+
+    def __init__(self, nodes=()):
+        self.__head = _NodeLink(None, 0)
+        self.__links = {}
+        for node in nodes:
+            self.append(node)
+
+    def __len__(self):
+        return len(self.__links)
+
+    def __contains__(self, node):
+        return node in self.__links
+
+    def __iter__(self):
+        link = self.__head.next
+        while link is not self.__head:
+            yield link.node
+            link = link.next
+
+    def __link(self, node):
+        if not node in self.__links:
+            raise ValueError("Node %s is not in the graph" % node.op.name)
+        return self.__links[node]
+
+    def __relabel(self):
+        link = self.__head.next
+        label = self.LABEL_GAP
+        while link is not self.__head:
+            link.label = label
+            label += self.LABEL_GAP
+            link = link.next
+
+    def __insert_between(self, prev, node):
+        if node in self.__links:
+            raise ValueError("Node %s is already in the graph" % node.op.name)
+        next_ = prev.next
+        if next_ is self.__head:
+            label = prev.label + self.LABEL_GAP
+        else:
+            label = (prev.label + next_.label) // 2
+            if label == prev.label:
+                self.__relabel()
+                label = (prev.label + next_.label) // 2
+        link = _NodeLink(node, label)
+        link.prev = prev
+        link.next = next_
+        prev.next = link
+        next_.prev = link
+        self.__links[node] = link
+
+    def append(self, node):
+        self.__insert_between(self.__head.prev, node)
+
+    def insert_after(self, ref_node, node):
+        self.__insert_between(self.__link(ref_node), node)
+
+    def remove(self, node):
+        link = self.__link(node)
+        del self.__links[node]
+        link.prev.next = link.next
+        link.next.prev = link.prev
+
+    def position(self, node):
+        """Sort key of node: ordered like the nodes, but not contiguous"""
+        return self.__link(node).label
+
+    def precedes(self, node, other_node):
+        return self.position(node) < self.position(other_node)
+
 class OpGraph(object):
     def __init__(self, naming_policy, shape_inference_policy):
         self.naming_policy = naming_policy
         self.shape_inference_policy = shape_inference_policy
 
         self.nodes_by_name = {}
-        self.nodes_in_order = []
+        self.nodes_by_type = {}
+        self.nodes_in_order = OrderedNodeList()
         self.buffers = {}
+        # nodes whose op or neighbours changed, while tracking changes
+        self.changed_nodes = None
+
+    def __mark_changed(self, *nodes):
+        if self.changed_nodes is not None:
+            self.changed_nodes.update(nodes)
+
+    def __remove_node(self, node):
+        del self.nodes_by_name[node.op.name]
+        self.nodes_by_type[node.op.type].discard(node)
+        self.nodes_in_order.remove(node)
 
-    def __insert_node(self, node, output_shapes, idx=-1):
+    def track_changes(self, enable=True):
+        self.changed_nodes = set() if enable else None
+
+    def pop_changed_nodes(self):
+        """Nodes changed since the last call, including removed ones"""
+        changed_nodes = self.changed_nodes or set()
+        if self.changed_nodes is not None:
+            self.changed_nodes = set()
+        return changed_nodes
+
+    def __insert_node(self, node, output_shapes, after=None):
         """Insert a node into the graph's internal data structures.
 
         node: Node to be inserted
         output_shapes: shapes of the node's output buffers, which must be created.
-        idx: index in nodes_in_order at which to insert. By default, appends to
-             the list."""
+        after: node in nodes_in_order after which to insert. By default, appends
+               to the list."""
         for name, shape in zip(node.output_names, output_shapes):
             self.buffers[name] = Buffer(name, shape, node)
 
@@ -101,10 +209,12 @@ class OpGraph(object):
             self.buffers[name].consumers.add(node)
 
         self.nodes_by_name[node.op.name] = node
-        if idx == -1:
+        self.nodes_by_type.setdefault(node.op.type, set()).add(node)
+        self.__mark_changed(node, *[self.buffers[name].producer for name in node.input_names])
+        if after is None:
             self.nodes_in_order.append(node)
         else:
-            self.nodes_in_order.insert(idx, node)
+            self.nodes_in_order.insert_after(after, node)
 
 
     def add(self, op, input_names, output_names):
@@ -168,10 +278,9 @@ class OpGraph(object):
                 input_buffer.consumers.remove(consumer)
 
         output_name = self.naming_policy.get_output_names(op, [output_name])[0]
-        producer_idx = self.nodes_in_order.index(input_buffer.producer)
         output_shapes = self.shape_inference_policy.infer_shape(op, [input_buffer.shape])
         node = OpNode(op, [input_name], [output_name])
-        self.__insert_node(node, output_shapes, producer_idx+1)
+        self.__insert_node(node, output_shapes, input_buffer.producer)
 
         output_buffer = self.buffers[output_name]
         for consumer in old_consumers:
@@ -179,6 +288,7 @@ class OpGraph(object):
             for i, name in enumerate(consumer.input_names):
                 if name == input_name:
                     consumer.input_names[i] = output_name
+        self.__mark_changed(*old_consumers)
 
     def prune(self, node):
         """Remove a node and its output buffers from the graph completely.
@@ -196,8 +306,8 @@ class OpGraph(object):
             del self.buffers[buf.name]
         for buf in self.get_input_buffers(node):
             buf.consumers.remove(node)
-        del self.nodes_by_name[node.op.name]
-        self.nodes_in_order.remove(node)
+            self.__mark_changed(buf.producer)
+        self.__remove_node(node)
 
     def squash(self, node, input_name):
         # remove the input buffer, causing that buffer's
@@ -219,8 +329,73 @@ class OpGraph(object):
         output_buffer.producer = prev
 
         del self.buffers[input_name]
-        del self.nodes_by_name[node.op.name]
-        self.nodes_in_order.remove(node)
+        self.__remove_node(node)
+        self.__mark_changed(prev, *output_buffer.consumers)
+
+    def make_in_place(self, node):
+        """Make node overwrite its input buffer, as a Caffe in-place layer.
+        The input buffer is removed and its producer writes the node's
+        output buffer instead, which the node then both reads and writes.
+        Other passes do not expect in-place nodes, so this is only meant to
+        run right before lowering."""
+        if len(node.input_names) != 1 or len(node.output_names) != 1:
+            raise ValueError("Cannot make node %s in place, it has %d inputs and %d outputs" % (node.op.name, len(node.input_names), len(node.output_names)))
+        input_buffer = self.buffers[node.input_names[0]]
+        output_buffer = self.buffers[node.output_names[0]]
+        if len(input_buffer.consumers) > 1:
+            raise ValueError("Cannot make node %s in place on input buffer %s, which has more than one consumer" % (node.op.name, input_buffer.name))
+
+        prev = input_buffer.producer
+        output_idx = prev.output_names.index(input_buffer.name)
+        prev.output_names[output_idx] = output_buffer.name
+        node.input_names[0] = output_buffer.name
+
+        del self.buffers[input_buffer.name]
+        self.__mark_changed(prev, node)
+
+    def replace_input(self, node, old_name, new_name):
+        """Make node consume buffer new_name wherever it consumed old_name.
+        The producer of new_name must come before node."""
+        if not new_name in self.buffers:
+            raise KeyError("Cannot rewire node %s onto nonexistent buffer %s" % (node.op.name, new_name))
+        old_buffer = self.buffers[old_name]
+        new_buffer = self.buffers[new_name]
+        if not node in old_buffer.consumers:
+            raise ValueError("Cannot rewire node %s, which does not consume buffer %s" % (node.op.name, old_name))
+        for i, name in enumerate(node.input_names):
+            if name == old_name:
+                node.input_names[i] = new_name
+        old_buffer.consumers.remove(node)
+        new_buffer.consumers.add(node)
+        self.__mark_changed(node, old_buffer.producer, new_buffer.producer)
+
+    def fold(self, node, tensors):
+        """Replace a node by one ConstantOp per output buffer, holding the
+        precomputed tensors. As for any ConstantOp, each op is named after
+        its output buffer."""
+        if len(tensors) != len(node.output_names):
+            raise ValueError("Cannot fold node %s: got %d tensors for %d outputs" % (node.op.name, len(tensors), len(node.output_names)))
+        for name in node.output_names:
+            if name in self.nodes_by_name and self.nodes_by_name[name] is not node:
+                raise KeyError("Cannot fold node %s: output %s already names node %s" % (node.op.name, name, name))
+
+        for buf in self.get_input_buffers(node):
+            buf.consumers.discard(node)
+            self.__mark_changed(buf.producer)
+        after = node
+        for name, tensor in zip(node.output_names, tensors):
+            constant = OpNode(op_adapter.ConstantOp(name, tensor), [], [name])
+            output_buffer = self.buffers[name]
+            output_buffer.producer = constant
+            output_buffer.shape = list(tensor.shape)
+            self.nodes_in_order.insert_after(after, constant)
+            after = constant
+            self.__mark_changed(constant, *output_buffer.consumers)
+        self.__remove_node(node)
+        for name in node.output_names:
+            constant = self.buffers[name].producer
+            self.nodes_by_name[name] = constant
+            self.nodes_by_type.setdefault(constant.op.type, set()).add(constant)
 
     def get_input_buffers(self, node):
         return [self.buffers[name] for name in node.input_names]
@@ -231,8 +406,33 @@ class OpGraph(object):
     def get_buffer(self, buffer_name):
         return self.buffers[buffer_name]
 
+    def has_node(self, node):
+        return node in self.nodes_in_order
+
+    def get_neighbours(self, node):
+        """Producers of the node's inputs and consumers of its outputs"""
+        neighbours = set(buf.producer for buf in self.get_input_buffers(node))
+        for buf in self.get_output_buffers(node):
+            neighbours.update(buf.consumers)
+        return neighbours
+
     def list_nodes(self):
-        return self.nodes_in_order[:]
+        return list(self.nodes_in_order)
+
+    def reorder_nodes(self, nodes):
+        """Replace the execution order by nodes, which must be a
+        permutation of the graph's nodes respecting their dependencies."""
+        if len(nodes) != len(self.nodes_in_order) or set(nodes) != set(self.nodes_in_order):
+            raise ValueError("Cannot reorder nodes: the new order must hold every node of the graph exactly once")
+        self.nodes_in_order = OrderedNodeList(nodes)
+        self.__mark_changed(*nodes)
+
+    def list_nodes_of_types(self, op_types):
+        """Nodes with any of the op types, in execution order"""
+        nodes = []
+        for op_type in op_types:
+            nodes.extend(self.nodes_by_type.get(op_type, ()))
+        return sorted(nodes, key=self.nodes_in_order.position)
 
     def list_buffers(self):
         return list(self.buffers.values())
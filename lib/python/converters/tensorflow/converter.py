@@ -7,7 +7,7 @@
 #
 #=============================================================================
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import snpe
 
 import converters.code_to_message as code_to_message
@@ -81,32 +81,45 @@ class TopologyResolver(object):
         :type _input_descriptors: list(LayerDescriptor)
         :rtype: list(LayerDescriptor)
         """
-        sorted_descriptors = []
-        queue = list(_input_descriptors)
-        visited = set()
-        ready = set()
-        while len(queue) > 0:
-            head = queue.pop(0)
-            visited.add(head)
-            input_descriptors = self.get_input_layers_for(head)
-            if all(i in ready for i in input_descriptors):
-                if head in ready:
-                    continue
+        descriptors = set(_descriptors)
 
-                sorted_descriptors.append(head)
-                ready.add(head)
+        # the layers reached from the inputs, and the layers these read from
+        reached = set()
+        reached_descriptors = []
+        queue = deque(_input_descriptors)
+        while len(queue) > 0:
+            head = queue.popleft()
+            if head in reached:
+                continue
+            reached.add(head)
+            reached_descriptors.append(head)
+            queue.extend([o for o in self.get_output_layers_for(head) if o in descriptors])
+            queue.extend(self.get_input_layers_for(head))
+
+        # Kahn's algorithm, starting from the inputs then from the layers without inputs
+        pending_inputs_count = dict()
+        ready = deque()
+        for d in list(_input_descriptors) + list(_descriptors) + reached_descriptors:
+            if d not in reached or d in pending_inputs_count:
+                continue
+            pending_inputs_count[d] = len(self.get_input_layers_for(d))
+            if pending_inputs_count[d] == 0:
+                ready.append(d)
 
-                for o in self.get_output_layers_for(head):
-                    if o not in _descriptors or o in visited:
-                        continue
-                    queue.append(o)
-            else:
-                for i in input_descriptors:
-                    if i in ready or i in visited:
-                        continue
-                    queue.append(i)
-                queue.append(head)
+        sorted_descriptors = []
+        while len(ready) > 0:
+            head = ready.popleft()
+            sorted_descriptors.append(head)
+            for o in self.get_output_layers_for(head):
+                if o not in pending_inputs_count:
+                    continue
+                pending_inputs_count[o] -= 1
+                if pending_inputs_count[o] == 0:
+                    ready.append(o)
 
+        if len(sorted_descriptors) != len(pending_inputs_count):
+            cycle = [d.layer_name for d, count in pending_inputs_count.iteritems() if count > 0]
+            raise ConverterError(code_to_message.get_message('ERROR_TF_LAYERS_CYCLE')(cycle))
         return sorted_descriptors[len(_input_descriptors):]
 
     def _get_input_layers_for(self, descriptor):
@@ -117,10 +130,10 @@ class TopologyResolver(object):
         predecessors = []
         descriptor_input_ops = [op for op in descriptor.child_ops if descriptor.is_input_op(op)]
         for o in descriptor_input_ops:
-            q = [t.op for t in o.inputs]
+            q = deque([t.op for t in o.inputs])
             visited = set()
             while len(q) > 0:
-                next_op = q.pop(0)
+                next_op = q.popleft()
                 if next_op in visited:
                     continue
                 visited.add(next_op)
@@ -129,9 +142,9 @@ class TopologyResolver(object):
                 if d is None:
                     continue
 
-                if d == descriptor:
+                if d is descriptor or d == descriptor:
                     if descriptor.is_input_op(next_op):
-                        q = [t.op for t in next_op.inputs] + q
+                        q.extendleft(reversed([t.op for t in next_op.inputs]))
                     else:
                         continue
                 elif d.is_ignored:
@@ -230,19 +243,22 @@ class ConverterContext(object):
         output_tensors = []
 
         input_descriptors = self._topology_resolver.get_input_layers_for(descriptor)
-        input_descriptors_outputs = [o for d in input_descriptors for o in d.child_ops if d.is_output_op(o)]
+        input_descriptors_outputs = set([o for d in input_descriptors for o in d.child_ops if d.is_output_op(o)])
 
+        # depth first, the stack's top being its end
         visited = set()
-        op_queue = [operation]
-        while len(op_queue) > 0:
-            next_op = op_queue.pop(0)
+        op_stack = [operation]
+        while len(op_stack) > 0:
+            next_op = op_stack.pop()
+            if next_op in visited:
+                continue
             visited.add(next_op)
             for input_tensor in next_op.inputs:
                 input_op = input_tensor.op
                 if input_op in input_descriptors_outputs:
                     output_tensors.append(input_tensor)
                 elif input_op not in visited:
-                    op_queue.insert(0, input_op)
+                    op_stack.append(input_op)
 
         return uniques(output_tensors)
 
@@ -262,15 +278,17 @@ class ConverterContext(object):
 
 class DlcConverter(object):
 
-    def __init__(self, model, strict_node_resolution):
+    def __init__(self, model, strict_node_resolution, constants_cache_dir=None):
         """
         :type model: converters.tensorflow.loader.Model
         :type strict_node_resolution: bool
+        :type constants_cache_dir: str
         """
         self._logger = logging.getLogger()  # type: logging.Logger
         self._context = None  # type: ConverterContext
         self._model = model
         self._strict_node_resolution = strict_node_resolution
+        self._constants_cache_dir = constants_cache_dir
         self._ops = self._resolve_graph_operations_from_model(model)
         self._graph_helper = None
         self._input_descriptors = []
@@ -283,7 +301,7 @@ class DlcConverter(object):
         :type converter_command: str
         :rtype: None
         """
-        self._graph_helper = GraphHelper(self._model.session, self._model, self._ops)
+        self._graph_helper = GraphHelper(self._model.session, self._model, self._ops, self._constants_cache_dir)
         self._topology_resolver = TopologyResolver()
         self._context = ConverterContext(self._model, snpe.modeltools.Model(), self._graph_helper,
                                          self._topology_resolver, self._logger)
@@ -429,10 +447,8 @@ class DlcConverter(object):
             if len(resolved_descriptors) == 0:
                 continue
             if resolver.is_final_resolution():
-                ops_to_remove = [n for d in resolved_descriptors for n in d.child_ops]
-                constructor = TFGraphBuilder([o for o in ops if o not in ops_to_remove])
-                constructor.link_nodes()
-                graph_matcher = GraphMatcher(constructor.nodes)
+                ops_to_remove = set([n for d in resolved_descriptors for n in d.child_ops])
+                graph_matcher.remove_nodes(ops_to_remove)
             descriptors.extend(resolved_descriptors)
         return descriptors
 
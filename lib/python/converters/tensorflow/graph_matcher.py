@@ -195,37 +195,115 @@ class GraphMatcher(object):
         :type graph: list(IGraphNode)
         """
         self.graph = list(graph)
-        self.consumed_nodes = []
+        self.consumed_nodes = set()
+        self._positions = dict((node, index) for index, node in enumerate(self.graph))
+        self._graph_node_types = dict()
+        self._nodes_by_type = dict()
+        self._consumers = dict()
+        for node in self.graph:
+            for node_type in self._graph_node_types_of(node):
+                self._nodes_by_type.setdefault(node_type, []).append(node)
+            for input_node in node.inputs:
+                self._consumers.setdefault(input_node, []).append(node)
+        self._patterns = dict()
+
+    def remove_nodes(self, original_nodes):
+        """
+        Removes the nodes of original_nodes from the graph, leaving it as a TFGraphBuilder would build it without
+        them: remaining nodes which have a removed node as input get a non consumable node in its place.
+        :type original_nodes: set(tf.Operation)
+        """
+        removed_nodes = set([n for n in self.graph if n.original_node in original_nodes])
+        if len(removed_nodes) == 0:
+            return
+        # nodes standing for ops outside of the graph only exist as inputs of graph nodes
+        for node in list(removed_nodes):
+            for input_node in node.inputs:
+                if isinstance(input_node, NonConsumableTFOperationNode) and input_node in self._positions and \
+                        all(c in removed_nodes or c not in self._positions for c in self._consumers[input_node]):
+                    removed_nodes.add(input_node)
+
+        replacements = dict()
+        for node in removed_nodes:
+            remaining_consumers = [c for c in self._consumers.pop(node, []) if c in self._positions and
+                                   c not in removed_nodes]
+            if len(remaining_consumers) == 0:
+                continue
+            replacement = NonConsumableTFOperationNode(node.original_node, should_link_inputs=False)
+            replacements[node] = replacement
+            self._consumers[replacement] = remaining_consumers
+            for consumer in remaining_consumers:
+                consumer.inputs = [replacement if n is node else n for n in consumer.inputs]
+
+        def update(nodes):
+            return [replacements.get(n, n) for n in nodes if n not in removed_nodes or n in replacements]
+
+        self.graph = update(self.graph)
+        removed_types = set()
+        for node in removed_nodes:
+            removed_types.update(self._graph_node_types_of(node))
+            del self._graph_node_types[node]
+            position = self._positions.pop(node)
+            if node in replacements:
+                self._positions[replacements[node]] = position
+        for node_type in removed_types:
+            self._nodes_by_type[node_type] = update(self._nodes_by_type[node_type])
 
     def match_sequence(self, sequence):
         """
         :type sequence: GraphSequence
         :rtype: list(GraphMatch)
         """
-        self.consumed_nodes = []
+        self.consumed_nodes = set()
+        self._patterns = dict()
         roots_candidate_assignments = self._find_roots_candidate_assignments(sequence.output_nodes)
         mappings = self._match_sequence_from_roots(roots_candidate_assignments, sequence.output_nodes)
         return [GraphMatch(mapping, sequence) for mapping in mappings]
 
+    @classmethod
+    def _node_types(cls, node):
+        return frozenset(node_type.lower() for node_type in node.node_types)
+
+    def _graph_node_types_of(self, graph_node):
+        node_types = self._graph_node_types.get(graph_node, None)
+        if node_types is None:
+            node_types = self._node_types(graph_node)
+            self._graph_node_types[graph_node] = node_types
+        return node_types
+
+    def _compile(self, sequence_node):
+        """
+        Returns the lower cased types of a sequence node, whether it matches any type and the
+        number of inputs a graph node needs to match it, None if any number is fine.
+        :type sequence_node: IGraphNode
+        :rtype: (frozenset(str), bool, int)
+        """
+        pattern = self._patterns.get(sequence_node, None)
+        if pattern is None:
+            num_inputs = len(sequence_node.inputs)
+            if num_inputs == 0 or self._sequence_contains_repeatable_nodes(sequence_node.inputs):
+                num_inputs = None
+            pattern = (self._node_types(sequence_node), '?' in sequence_node.node_types, num_inputs)
+            self._patterns[sequence_node] = pattern
+        return pattern
+
     def _find_roots_candidate_assignments(self, sequence_graph_roots):
         candidate_roots_in_graph = []
-        for _ in sequence_graph_roots:
-            candidate_roots_in_graph.append([])
-        for graph_node in self.graph:
-            for root_index in range(0, len(sequence_graph_roots)):
-                if self._match_one_node_type(sequence_graph_roots[root_index], graph_node):
-                    candidate_roots_in_graph[root_index].append(graph_node)
-        # construct all combinations for multi_roots
-        candidate_roots_in_graph = list(itertools.product(*candidate_roots_in_graph))
-        combinations = []
-        for candidate in candidate_roots_in_graph:
+        for sequence_root in sequence_graph_roots:
+            node_types, _, num_inputs = self._compile(sequence_root)
+            candidates = set()
+            for node_type in node_types:
+                candidates.update(self._nodes_by_type.get(node_type, []))
+            candidate_roots_in_graph.append([node for node in sorted(candidates, key=self._positions.get)
+                                             if num_inputs is None or len(node.inputs) == num_inputs])
+        # construct combinations for multi_roots as they are explored
+        for candidate in itertools.product(*candidate_roots_in_graph):
             if len(set(candidate)) == len(sequence_graph_roots):
-                combinations.append(candidate)
-        return combinations
+                yield candidate
 
     def _match_sequence_from_roots(self, roots_candidate_assignments, sequence_graph_roots):
         """
-        :type roots_candidate_assignments:  list(list[IGraphNode])
+        :type roots_candidate_assignments:  iterable(list[IGraphNode])
         :param sequence_graph_roots: list[IGraphNode]
         :return: list(dict(IGraphNode, IGraphNode))
         """
@@ -249,24 +327,24 @@ class GraphMatcher(object):
     def _remove_consumed_nodes_for_next_iteration(self, match_assignments):
         for sequence_node, matched_node in match_assignments.iteritems():
             if sequence_node.is_consumable:
-                self.consumed_nodes.append(matched_node)
+                self.consumed_nodes.add(matched_node)
 
     def _match_next_level_with_assignments(self, not_visited_queue, current_assignments):
         if len(not_visited_queue) == 0:
             return current_assignments
 
-        next_sequence_node = not_visited_queue.pop(0)
+        next_sequence_node = not_visited_queue[0]
+        not_visited_queue = not_visited_queue[1:]
         if len(next_sequence_node.inputs) == 0:
             return self._match_next_level_with_assignments(not_visited_queue, current_assignments)
 
         candidate_node = current_assignments[next_sequence_node]
-        # check if types as set will match, then get 1-1 correspondance
-        next_level_assignments = self._match_nodes_types(next_sequence_node.inputs, candidate_node.inputs)
-        next_level_assignments = self._filter_invalid_candidate_assignments(next_level_assignments,
-                                                                            current_assignments)
-        for next_level_assignment in next_level_assignments:
-            next_level_visited_queue = not_visited_queue[:]
-            next_level_visited_queue.extend(set(next_level_assignment) - set(current_assignments))
+        # candidate assignments are generated one at a time, the first one which matches the
+        # rest of the sequence is kept
+        for next_level_assignment in self._match_nodes_types(next_sequence_node.inputs, candidate_node.inputs,
+                                                             current_assignments):
+            next_level_visited_queue = list(not_visited_queue)
+            next_level_visited_queue.extend([n for n, _ in next_level_assignment if n not in current_assignments])
             next_level_assignments = current_assignments.copy()
             next_level_assignments.update(next_level_assignment)
             result = self._match_next_level_with_assignments(next_level_visited_queue, next_level_assignments)
@@ -274,28 +352,44 @@ class GraphMatcher(object):
                 return result
         return None
 
-    def _filter_invalid_candidate_assignments(self, candidate_assignments, current_assignments):
-        valid_assignments = []
-        for assignment in candidate_assignments:
-            valid_assignments.append(assignment)
-            for sequence_node, graph_node in assignment.iteritems():
-                already_consumed = (sequence_node.is_consumable and graph_node in self.consumed_nodes)
-                conflicting_assignment = (sequence_node in current_assignments.keys() and
-                                          graph_node != current_assignments[sequence_node])
-                if already_consumed or conflicting_assignment:
-                    valid_assignments.pop()
-                    break
-        return valid_assignments
-
-    def _match_nodes_types(self, sequence_nodes, graph_nodes):
+    def _is_valid_candidate(self, sequence_node, graph_node, current_assignments):
+        node_types, any_type, num_inputs = self._compile(sequence_node)
+        if not any_type and node_types.isdisjoint(self._graph_node_types_of(graph_node)):
+            return False
+        if num_inputs is not None and len(graph_node.inputs) != num_inputs:
+            return False
+        return self._is_valid_assignment(sequence_node, graph_node, current_assignments)
+
+    def _is_valid_assignment(self, sequence_node, graph_node, current_assignments):
+        already_consumed = (sequence_node.is_consumable and graph_node in self.consumed_nodes)
+        conflicting_assignment = (sequence_node in current_assignments and
+                                  graph_node != current_assignments[sequence_node])
+        return not already_consumed and not conflicting_assignment
+
+    def _match_nodes_types(self, sequence_nodes, graph_nodes, current_assignments):
+        """
+        Generates the valid assignments of graph_nodes to sequence_nodes, in the order of the
+        product of the candidates of each sequence node, as (sequence node, graph node) pairs.
+        :type sequence_nodes: list(IGraphNode)
+        :type graph_nodes: list(IGraphNode)
+        :type current_assignments: dict(IGraphNode, IGraphNode)
+        :rtype: generator(list((IGraphNode, IGraphNode)))
+        """
         if self._sequence_contains_repeatable_nodes(sequence_nodes):
             sequence_nodes = self._prepare_nodes_list_for_repeatable_sequence(sequence_nodes, graph_nodes)
         if len(sequence_nodes) != len(graph_nodes):
-            return []
+            return iter([])
+
+        if len(set(sequence_nodes)) != len(sequence_nodes):
+            return self._create_candidate_assignments(sequence_nodes, graph_nodes, current_assignments)
 
-        nodes_matches = self._create_nodes_candidates_lists(sequence_nodes, graph_nodes)
-        assignments = self._create_candidate_assignments(nodes_matches, sequence_nodes)
-        return assignments
+        nodes_matches = []
+        for sequence_node in sequence_nodes:
+            matches = [n for n in graph_nodes if self._is_valid_candidate(sequence_node, n, current_assignments)]
+            if len(matches) == 0:
+                return iter([])
+            nodes_matches.append(matches)
+        return self._create_distinct_candidate_assignments(sequence_nodes, nodes_matches, [], set())
 
     @classmethod
     def _sequence_contains_repeatable_nodes(cls, sequence_nodes):
@@ -307,37 +401,36 @@ class GraphMatcher(object):
         return trigger_repeatable_tree_matching
 
     @classmethod
-    def _create_candidate_assignments(cls, matches_list, sequence_nodes):
-        matches_maps_list = []
-        for matches in matches_list:
-            # remove combinations that has duplicates
+    def _create_distinct_candidate_assignments(cls, sequence_nodes, nodes_matches, assigned, used):
+        if len(assigned) == len(sequence_nodes):
+            yield zip(sequence_nodes, assigned)
+            return
+        for graph_node in nodes_matches[len(assigned)]:
+            # distinct sequence nodes get distinct graph nodes
+            if graph_node in used:
+                continue
+            assigned.append(graph_node)
+            used.add(graph_node)
+            for assignment in cls._create_distinct_candidate_assignments(sequence_nodes, nodes_matches,
+                                                                         assigned, used):
+                yield assignment
+            used.remove(graph_node)
+            assigned.pop()
+
+    def _create_candidate_assignments(self, sequence_nodes, graph_nodes, current_assignments):
+        # a sequence node listed more than once as an input, its last assignment is kept
+        nodes_matches = []
+        for sequence_node in sequence_nodes:
+            node_types, any_type, _ = self._compile(sequence_node)
+            nodes_matches.append([n for n in graph_nodes
+                                  if any_type or not node_types.isdisjoint(self._graph_node_types_of(n))])
+        for matches in itertools.product(*nodes_matches):
             if len(set(sequence_nodes)) != len(set(matches)):
                 continue
-            matches_map = dict()
-            for nodeA_index in range(0, len(sequence_nodes)):
-                matches_map[sequence_nodes[nodeA_index]] = matches[nodeA_index]
-            matches_maps_list.append(matches_map)
-        return matches_maps_list
-
-    def _create_nodes_candidates_lists(self, sequence_nodes, graph_nodes):
-        matches = []
-        for _ in sequence_nodes:
-            matches.append([])
-        for nodeA_index in range(0, len(sequence_nodes)):
-            for nodeB in graph_nodes:
-                if '?' in sequence_nodes[nodeA_index].node_types:
-                    matches[nodeA_index].append(nodeB)
-                elif self._match_one_node_type(sequence_nodes[nodeA_index], nodeB):
-                    matches[nodeA_index].append(nodeB)
-        return list(itertools.product(*matches))
-
-    @classmethod
-    def _match_one_node_type(cls, node1, node2):
-        for nodeA_type in node1.node_types:
-            for nodeB_type in node2.node_types:
-                if nodeA_type.lower() == nodeB_type.lower():
-                    return True
-        return False
+            matches_map = OrderedDict(zip(sequence_nodes, matches))
+            if all(self._is_valid_assignment(sequence_node, graph_node, current_assignments)
+                   for sequence_node, graph_node in matches_map.iteritems()):
+                yield matches_map.items()
 
     @classmethod
     def _prepare_nodes_list_for_repeatable_sequence(cls, sequence_nodes, graph_nodes):
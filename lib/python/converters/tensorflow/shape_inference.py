@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+#=============================================================================
+#
+#  Copyright (c) 2018 Qualcomm Technologies, Inc.
+#  All Rights Reserved.
+#  Confidential and Proprietary - Qualcomm Technologies, Inc.
+#
+#=============================================================================
+import numpy as np
+
+
+class StaticShapeInference(object):
+    def __init__(self, fixed_shapes, tensor_values):
+        """
+        Infers tensor shapes from the shapes of the graph inputs without running the graph. Shapes known to
+        Tensorflow are taken as is, the others are propagated with the shape rules of the op types the layer
+        resolvers handle. Tensors whose shape depends on data, or on ops without a rule, are left unresolved.
+        Values of evaluated tensors, such as the constants, give the shape operands of Reshape, Pad or Concat.
+        :type fixed_shapes: dict(str, list[int])
+        :type tensor_values: dict(str, np.ndarray)
+        """
+        self._shapes = dict(fixed_shapes)  # type: dict(str, list[int])
+        self._tensor_values = tensor_values
+        self._inferred_ops = set()
+
+    def infer(self, tensor):
+        """
+        :type tensor: tensorflow.Tensor
+        :rtype: list[int]
+        """
+        if tensor.name not in self._shapes:
+            self._infer_op(tensor.op)
+        return self._shapes.get(tensor.name, None)
+
+    def _infer_op(self, root_op):
+        # depth first, without recursion as graphs can be deep, and without following cycles
+        in_progress = set()
+        stack = [root_op]
+        while len(stack) > 0:
+            op = stack[-1]
+            if op in self._inferred_ops:
+                stack.pop()
+                continue
+            pending = [t.op for t in op.inputs if t.op not in self._inferred_ops and t.op not in in_progress]
+            if op not in in_progress and len(pending) > 0:
+                in_progress.add(op)
+                stack.extend(pending)
+                continue
+            stack.pop()
+            in_progress.discard(op)
+            self._inferred_ops.add(op)
+            rule_shapes = self._apply_rule(op)
+            for index, t in enumerate(op.outputs):
+                if t.name not in self._shapes:
+                    self._shapes[t.name] = self._merge_static_shape(t, rule_shapes[index])
+
+    def _apply_rule(self, op):
+        no_shapes = [None] * len(op.outputs)
+        rule = self._rules.get(op.type, None)
+        input_shapes = [self._shapes.get(t.name, None) for t in op.inputs]
+        if rule is None or (op.type not in self._partial_input_rules and None in input_shapes):
+            return no_shapes
+        try:
+            shapes = rule(self, op, input_shapes)
+        except (ValueError, TypeError, IndexError, ZeroDivisionError):
+            # missing attribute, unexpected value
+            return no_shapes
+        if not isinstance(shapes, tuple):
+            shapes = (shapes,) + tuple(no_shapes[1:])
+        return list(shapes)
+
+    @classmethod
+    def _merge_static_shape(cls, tensor, rule_shape):
+        static_shape = tensor.get_shape()
+        if static_shape.ndims is None:
+            return rule_shape
+        dims = static_shape.as_list()
+        if rule_shape is None:
+            return dims if None not in dims else None
+        if len(rule_shape) != len(dims):
+            return None
+        return [dim if dim is not None else rule_dim for dim, rule_dim in zip(dims, rule_shape)]
+
+    def _value(self, tensor):
+        """
+        :type tensor: tensorflow.Tensor
+        :rtype: np.ndarray
+        """
+        if tensor.name in self._tensor_values:
+            return np.asarray(self._tensor_values[tensor.name])
+        if tensor.op.type == 'Shape':
+            shape = self._shapes.get(tensor.op.inputs[0].name, None)
+            if shape is not None:
+                return np.array(shape, dtype=np.int32)
+        raise ValueError('{} is not a constant'.format(tensor.name))
+
+    def _same_as_input(self, op, input_shapes):
+        return list(input_shapes[0])
+
+    def _broadcast(self, op, input_shapes):
+        rank = max(len(shape) for shape in input_shapes)
+        output_shape = [1] * rank
+        for shape in input_shapes:
+            for index, dim in enumerate(shape, rank - len(shape)):
+                if dim != 1:
+                    if output_shape[index] not in (1, dim):
+                        raise ValueError('{} inputs are not broadcastable'.format(op.name))
+                    output_shape[index] = dim
+        return output_shape
+
+    @classmethod
+    def _attr(cls, op, name, default):
+        try:
+            return op.get_attr(name)
+        except ValueError:
+            return default
+
+    @classmethod
+    def _spatial_output_size(cls, size, kernel, stride, dilation, padding):
+        if padding == 'SAME':
+            return (size + stride - 1) // stride
+        elif padding == 'VALID':
+            return (size - (kernel - 1) * dilation - 1) // stride + 1
+        raise ValueError('Unsupported padding {}'.format(padding))
+
+    def _windowed(self, op, input_shape, kernel_h, kernel_w, output_channels):
+        if self._attr(op, 'data_format', 'NHWC') != 'NHWC':
+            raise ValueError('Unsupported data format')
+        strides = op.get_attr('strides')
+        dilations = self._attr(op, 'dilations', [1, 1, 1, 1])
+        padding = op.get_attr('padding')
+        batch, height, width, _ = input_shape
+        return [batch,
+                self._spatial_output_size(height, kernel_h, strides[1], dilations[1], padding),
+                self._spatial_output_size(width, kernel_w, strides[2], dilations[2], padding),
+                output_channels]
+
+    def _conv2d(self, op, input_shapes):
+        kernel_h, kernel_w, _, output_channels = input_shapes[1]
+        return self._windowed(op, input_shapes[0], kernel_h, kernel_w, output_channels)
+
+    def _depthwise_conv2d(self, op, input_shapes):
+        kernel_h, kernel_w, input_channels, multiplier = input_shapes[1]
+        return self._windowed(op, input_shapes[0], kernel_h, kernel_w, input_channels * multiplier)
+
+    def _pool(self, op, input_shapes):
+        ksize = op.get_attr('ksize')
+        return self._windowed(op, input_shapes[0], ksize[1], ksize[2], input_shapes[0][3])
+
+    def _matmul(self, op, input_shapes):
+        a_shape, b_shape = input_shapes
+        rows = a_shape[1] if op.get_attr('transpose_a') else a_shape[0]
+        columns = b_shape[0] if op.get_attr('transpose_b') else b_shape[1]
+        return [rows, columns]
+
+    def _reshape(self, op, input_shapes):
+        output_shape = [int(dim) for dim in self._value(op.inputs[1]).flatten()]
+        if -1 in output_shape:
+            index = output_shape.index(-1)
+            known = reduce(lambda x, y: x * y, [d for d in output_shape if d != -1], 1)
+            output_shape[index] = reduce(lambda x, y: x * y, input_shapes[0], 1) / known
+        return output_shape
+
+    def _concat(self, op, input_shapes):
+        if op.type == 'Concat':
+            axis_tensor, value_shapes = op.inputs[0], input_shapes[1:]
+        else:
+            axis_tensor, value_shapes = op.inputs[-1], input_shapes[:-1]
+        if None in value_shapes:
+            return None
+        axis = int(self._value(axis_tensor))
+        output_shape = list(value_shapes[0])
+        output_shape[axis] = sum(shape[axis] for shape in value_shapes)
+        return output_shape
+
+    def _pad(self, op, input_shapes):
+        paddings = self._value(op.inputs[1])
+        return [dim + int(before) + int(after) for dim, (before, after) in zip(input_shapes[0], paddings)]
+
+    def _squeeze(self, op, input_shapes):
+        rank = len(input_shapes[0])
+        axes = [axis % rank for axis in self._attr(op, 'squeeze_dims', [])]
+        return [dim for index, dim in enumerate(input_shapes[0])
+                if not (dim == 1 and (len(axes) == 0 or index in axes))]
+
+    def _resize(self, op, input_shapes):
+        height, width = [int(dim) for dim in self._value(op.inputs[1])]
+        return [input_shapes[0][0], height, width, input_shapes[0][3]]
+
+    def _shape(self, op, input_shapes):
+        return [len(input_shapes[0])]
+
+    def _fused_batch_norm(self, op, input_shapes):
+        return (list(input_shapes[0]),) + (None,) * (len(op.outputs) - 1)
+
+    _rules = {
+        'Identity': _same_as_input,
+        'Relu': _same_as_input,
+        'Relu6': _same_as_input,
+        'Sigmoid': _same_as_input,
+        'Tanh': _same_as_input,
+        'Elu': _same_as_input,
+        'Softmax': _same_as_input,
+        'LRN': _same_as_input,
+        'BiasAdd': _same_as_input,
+        'Neg': _same_as_input,
+        'Exp': _same_as_input,
+        'Rsqrt': _same_as_input,
+        'Sqrt': _same_as_input,
+        'Square': _same_as_input,
+        'StopGradient': _same_as_input,
+        'FusedBatchNorm': _fused_batch_norm,
+        'Add': _broadcast,
+        'Sub': _broadcast,
+        'Mul': _broadcast,
+        'RealDiv': _broadcast,
+        'Maximum': _broadcast,
+        'Minimum': _broadcast,
+        'AddN': _broadcast,
+        'Conv2D': _conv2d,
+        'DepthwiseConv2dNative': _depthwise_conv2d,
+        'MaxPool': _pool,
+        'AvgPool': _pool,
+        'MatMul': _matmul,
+        'Reshape': _reshape,
+        'Concat': _concat,
+        'ConcatV2': _concat,
+        'Pad': _pad,
+        'MirrorPad': _pad,
+        'Squeeze': _squeeze,
+        'ResizeBilinear': _resize,
+        'ResizeNearestNeighbor': _resize,
+        'Shape': _shape
+    }
+    # rules which need the shapes of some of their inputs only
+    _partial_input_rules = ['Concat', 'ConcatV2']
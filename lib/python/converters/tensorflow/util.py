@@ -6,7 +6,9 @@
 #  Confidential and Proprietary - Qualcomm Technologies, Inc.
 #
 #=============================================================================
+import hashlib
 import logging
+import os
 import tensorflow as tf
 import numpy as np
 import sys
@@ -15,6 +17,7 @@ from abc import ABCMeta
 from abc import abstractmethod
 from collections import OrderedDict
 from converters import code_to_message
+from converters.tensorflow.shape_inference import StaticShapeInference
 from tensorflow.python.framework.errors import InvalidArgumentError
 
 
@@ -89,13 +92,65 @@ class GraphPrinter(GraphVisitor, object):
             logging.debug(code_to_message.get_debugging_message('DEBUG_TF_OP_NAME_TYPE_PRINT')(op.name, op.type))
 
 
+class ConstantsCache(object):
+    def __init__(self, cache_dir, graph_def):
+        """
+        Stores the values of a graph's constant tensors in cache_dir, in a file named after the hash of the graph
+        definition, so that converting the same graph again needs not evaluate them.
+        :type cache_dir: str
+        :type graph_def: tensorflow.GraphDef
+        """
+        try:
+            serialized = graph_def.SerializeToString(deterministic=True)
+        except TypeError:
+            serialized = graph_def.SerializeToString()
+        self.path = os.path.join(cache_dir, hashlib.sha1(serialized).hexdigest() + '.npz')
+
+    def load(self):
+        """
+        :rtype: dict(str, np.ndarray)
+        """
+        if not os.path.exists(self.path):
+            return dict()
+        try:
+            with np.load(self.path) as cached:
+                names = cached['names']
+                return dict((str(name), cached['t{}'.format(i)]) for i, name in enumerate(names))
+        except Exception as e:
+            logging.getLogger().warning(
+                code_to_message.get_warning_message('WARNING_TF_CONSTANTS_CACHE_UNUSABLE')(self.path, str(e)))
+            return dict()
+
+    def save(self, values):
+        """
+        :type values: dict(str, np.ndarray)
+        :rtype: None
+        """
+        names = sorted(values.keys())
+        arrays = dict(('t{}'.format(i), values[name]) for i, name in enumerate(names))
+        # written aside and renamed, concurrent conversions of the graph only ever see a whole file
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            with open(temp_path, 'wb') as cache_file:
+                np.savez(cache_file, names=np.array(names), **arrays)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as e:
+            logging.getLogger().warning(
+                code_to_message.get_warning_message('WARNING_TF_CONSTANTS_CACHE_UNUSABLE')(self.path, str(e)))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
 class GraphHelper(object):
-    def __init__(self, session, model, ops):
+    def __init__(self, session, model, ops, constants_cache_dir=None):
         """
         Provides several helper methods to navigate the Tensorflow Graph.
         :type session: tensorflow.Session
         :type model: converters.tensorflow.loader.Model
         :type: ops: list[tensorflow.Operation]
+        :type constants_cache_dir: str
         """
         self._session = session
         self._model = model
@@ -108,6 +163,9 @@ class GraphHelper(object):
             input_names = [graph_input.name for graph_input in self._model.inputs]
             self._placeholders_stubs_map = self._create_placeholders_tensors(session, input_names)
         self._op_output_map = self._map_operations_outputs(ops)
+        if self._model is not None:
+            self._prefetch_constant_tensors(ops, constants_cache_dir)
+        self._shape_inference = StaticShapeInference(self._input_shapes(), self._tensor_value_cache)
         self._evaluate_tensor_shapes(ops)
 
     @classmethod
@@ -168,6 +226,10 @@ class GraphHelper(object):
         if tensor.name not in self._tensor_shape_cache:
             shape = self._get_tensor_output_shape(tensor)
             if len(shape) == 0:
+                shape = self._shape_inference.infer(tensor)
+                if shape is not None:
+                    self._tensor_shape_cache[tensor.name] = shape
+            if shape is None or len(shape) == 0:
                 shapes = self._evaluate_tensors_output_shape([tensor])
                 shape = shapes[tensor]
         else:
@@ -230,25 +292,79 @@ class GraphHelper(object):
                 requiring_evaluation.append(t)
 
         if len(requiring_evaluation) > 0:
-            try:
-                outputs = self._session.run(fetches=requiring_evaluation, feed_dict=input_tensors)
-                outputs = dict(zip(requiring_evaluation, outputs))
-                for t, o in outputs.iteritems():
-                    self._tensor_value_cache[t.name] = o
-                outputs_map.update(outputs)
-                requiring_evaluation = []
-            except InvalidArgumentError:
-                pass
-
-        for t in requiring_evaluation:
-            try:
-                outputs = self._session.run(fetches=[t], feed_dict=input_tensors)
-                self._tensor_value_cache[t.name] = outputs[0]
-                outputs_map[t] = outputs[0]
-            except InvalidArgumentError:
-                outputs_map[t] = np.zeros((1,), dtype=np.float32)
+            outputs_map.update(self._run_tensors(requiring_evaluation, input_tensors))
+        return outputs_map
+
+    def _run_tensors(self, tensors, feed_dict):
+        """
+        Evaluates the tensors in a single session run. When that fails, the tensors are split in halves evaluated
+        the same way, so that the tensors which cannot be evaluated cost a few runs instead of one run per tensor.
+        Those evaluate to a zero.
+        :type tensors: list(tensorflow.Tensor)
+        :type feed_dict: dict(str, np.ndarray)
+        :return: dict(tensorflow.Tensor, np.ndarray)
+        """
+        try:
+            outputs = self._session.run(fetches=tensors, feed_dict=feed_dict)
+        except InvalidArgumentError:
+            if len(tensors) == 1:
+                return {tensors[0]: np.zeros((1,), dtype=np.float32)}
+            half = len(tensors) / 2
+            outputs_map = self._run_tensors(tensors[:half], feed_dict)
+            outputs_map.update(self._run_tensors(tensors[half:], feed_dict))
+            return outputs_map
+
+        outputs_map = dict(zip(tensors, outputs))
+        for t, o in outputs_map.iteritems():
+            self._tensor_value_cache[t.name] = o
         return outputs_map
 
+    @classmethod
+    def _constant_tensors(cls, ops):
+        """
+        The outputs of the Const operations and of the Identity operations reading them, which hold the weights
+        and parameters the layer resolvers evaluate.
+        :type ops: list(tensorflow.Operation)
+        :rtype: list(tensorflow.Tensor)
+        """
+        constant_ops = set()
+        for op in ops:
+            chain = []
+            while op.type == 'Identity' and op not in constant_ops:
+                chain.append(op)
+                op = op.inputs[0].op
+            if op.type == 'Const' or op in constant_ops:
+                constant_ops.add(op)
+                constant_ops.update(chain)
+        return [t for o in ops if o in constant_ops for t in o.outputs]
+
+    def _prefetch_constant_tensors(self, ops, constants_cache_dir):
+        """
+        Evaluates the constant tensors of the graph together rather than as each layer resolver asks for them,
+        loading them from, and saving them to, the constants cache when a cache directory is given.
+        :type ops: list(tensorflow.Operation)
+        :type constants_cache_dir: str
+        :rtype: None
+        """
+        tensors = self._constant_tensors(ops)
+        cache = None
+        if constants_cache_dir is not None:
+            cache = ConstantsCache(constants_cache_dir, self._model.graph_def)
+            cached_values = cache.load()
+            for t in tensors:
+                if t.name in cached_values:
+                    self._tensor_value_cache[t.name] = cached_values[t.name]
+            logging.getLogger().info(code_to_message.get_progress_message('INFO_TF_CONSTANTS_CACHE_LOADED')(
+                len([t for t in tensors if t.name in cached_values]), len(tensors), cache.path))
+
+        missing = [t for t in tensors if t.name not in self._tensor_value_cache]
+        if len(missing) == 0:
+            return
+        self.evaluate_tensors_output(missing)
+        if cache is not None:
+            cache.save(dict((t.name, self._tensor_value_cache[t.name])
+                            for t in tensors if t.name in self._tensor_value_cache))
+
     @classmethod
     def _get_tensor_output_shape(cls, tensor):
         """
@@ -367,8 +483,23 @@ class GraphHelper(object):
                 raise OperationNotFoundError()
         return result
 
+    def _input_shapes(self):
+        """
+        The shapes of the tensors fed when evaluating the graph.
+        :rtype: dict(str, list[int])
+        """
+        shapes = dict()
+        if self._model is not None:
+            for i in self._model.inputs:
+                shapes[GraphHelper.indexed_tensor_name(i.name)] = list(i.shape)
+        for name, tensor in self._placeholders_stubs_map.iteritems():
+            shapes[GraphHelper.indexed_tensor_name(name)] = list(tensor.shape)
+        return shapes
+
     def _evaluate_tensor_shapes(self, ops):
         """
+        Infers the shapes of the ops' inputs and outputs statically, evaluating only the tensors whose shape
+        cannot be inferred.
         :type ops: list(tensorflow.Operation)
         :rtype: None
         """
@@ -379,8 +510,20 @@ class GraphHelper(object):
         for t in [t for op in ops for t in op.inputs]:
             tensors.add(t)
 
+        unresolved = []
+        for t in tensors:
+            shape = self._shape_inference.infer(t)
+            if shape is None:
+                unresolved.append(t)
+            else:
+                self._tensor_shape_cache[t.name] = shape
+        logging.getLogger().info(code_to_message.get_progress_message('INFO_TF_STATIC_SHAPES')(
+            len(tensors) - len(unresolved), len(tensors), len(unresolved)))
+        if len(unresolved) == 0:
+            return
+
         try:
-            self._evaluate_tensors_output_shape(tensors)
+            self._evaluate_tensors_output_shape(unresolved)
         except Exception:
             # If we can't evaluate the graph ops in one pass
             # fallback to on-demand evaluation later
@@ -5,6 +5,8 @@
 #  Confidential and Proprietary - Qualcomm Technologies, Inc.
 #
 #==============================================================================
+import time
+from collections import namedtuple
 
 class Translation(object):
     def __init__(self):
@@ -24,30 +26,143 @@ class TranslationBank(object):
         # string type name -> translation
         # the same value may exist for multiple keys.
         self.translations = {}
+        # (op type, method name) -> indexed method, filled on first use
+        self.dispatch_table = {}
 
     def __get_translation(self, op_type):
         if not op_type in self.translations:
             raise KeyError("No translation registered for op type %s" % op_type)
         return self.translations[op_type]
 
+    def get_translation(self, op_type):
+        return self.__get_translation(op_type)
+
+    def get_method(self, op_type, method_name):
+        """The indexed method of the op type's translation, to be called
+        directly"""
+        key = (op_type, method_name)
+        if not key in self.dispatch_table:
+            translation = self.__get_translation(op_type)
+            if not translation.has_indexed_method(method_name):
+                raise KeyError("Translation for '%s' does not define an indexed method '%s'" % (op_type, method_name))
+            self.dispatch_table[key] = translation.indexed_methods[method_name]
+        return self.dispatch_table[key]
+
     def apply_specific(self, op_type, method_name, *args):
-        translation = self.__get_translation(op_type)
-        if not translation.has_indexed_method(method_name):
-            raise KeyError("Translation for '%s' does not define an indexed method '%s'" % (op_type, method_name))
-        return translation.apply_method(method_name, *args)
+        return self.get_method(op_type, method_name)(*args)
 
     def apply_partial(self, method_name, graph, *args):
-        for node in graph.list_nodes():
-            translation = self.__get_translation(node.op.type)
-            if translation.has_indexed_method(method_name):
-                translation.apply_method(method_name, node, graph, *args)
+        for node in graph.list_nodes_of_types(self.op_types_with_method(method_name)):
+            if graph.has_node(node):
+                self.apply_specific(node.op.type, method_name, node, graph, *args)
 
     def apply_total(self, method_name, graph, *args):
         for node in graph.list_nodes():
             self.apply_specific(node.op.type, method_name, node, graph, *args)
 
+    def op_types_with_method(self, method_name):
+        return [op_type for op_type, translation in self.translations.items()
+                if translation.has_indexed_method(method_name)]
+
     def register(self, translation, *op_types):
         for op_type in op_types:
             if op_type in self.translations:
                 raise KeyError("A translation is already registed for op type '%s'" % op_type)
             self.translations[op_type] = translation
+        self.dispatch_table.clear()
+
+class OpTypeProfile(object):
+    """Number of calls and cumulative time of some work, per op type"""
+    def __init__(self):
+        self.counts = {}
+        self.seconds = {}
+
+    def add(self, op_type, seconds):
+        self.counts[op_type] = self.counts.get(op_type, 0) + 1
+        self.seconds[op_type] = self.seconds.get(op_type, 0.0) + seconds
+
+    def timed(self, op_type, function, *args):
+        start = time.time()
+        try:
+            return function(*args)
+        finally:
+            self.add(op_type, time.time() - start)
+
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def rows(self):
+        """(op type, count, seconds), the most time consuming first"""
+        return sorted([(op_type, self.counts[op_type], self.seconds[op_type]) for op_type in self.counts],
+                      key=lambda row: -row[2])
+
+PassStats = namedtuple('PassStats', ['method_name', 'seconds', 'rounds', 'visited', 'changed'])
+
+class PassManager(object):
+    """Applies indexed translation methods to a graph as a sequence of passes.
+
+    A partial pass only visits the nodes whose translation defines the
+    method, found through the graph's op type index. Unless it is added with
+    fixpoint=False, it is then repeated on the changed nodes and their
+    neighbours only, until it stops changing the graph. A total pass visits
+    every node once, in order. The time, rounds, nodes visited and nodes
+    changed of every pass run are kept in stats."""
+    MAX_ROUNDS = 100
+
+    def __init__(self, translations):
+        self.translations = translations
+        self.passes = []
+        self.stats = []
+
+    def add_partial(self, method_name, fixpoint=True):
+        self.passes.append((method_name, False, fixpoint))
+        return self
+
+    def add_total(self, method_name):
+        self.passes.append((method_name, True, False))
+        return self
+
+    def run(self, graph, *args):
+        for method_name, total, fixpoint in self.passes:
+            self.run_pass(graph, method_name, total, fixpoint, *args)
+        return self.stats
+
+    def run_pass(self, graph, method_name, total=False, fixpoint=True, *args):
+        start = time.time()
+        if total:
+            op_types = None
+            worklist = graph.list_nodes()
+        else:
+            op_types = set(self.translations.op_types_with_method(method_name))
+            worklist = graph.list_nodes_of_types(op_types)
+        rounds = 0
+        visited = 0
+        changed = set()
+        graph.track_changes()
+        try:
+            while worklist:
+                if rounds == self.MAX_ROUNDS:
+                    raise RuntimeError("Pass %s did not reach a fixpoint in %d rounds" % (method_name, rounds))
+                rounds += 1
+                for node in worklist:
+                    # an earlier node of the round may have removed it
+                    if graph.has_node(node):
+                        self.translations.apply_specific(node.op.type, method_name, node, graph, *args)
+                        visited += 1
+                round_changed = graph.pop_changed_nodes()
+                changed.update(round_changed)
+                if not fixpoint:
+                    break
+                # revisit what changed and its neighbours, the neighbours of
+                # removed nodes were marked changed by the graph already
+                candidates = set()
+                for node in round_changed:
+                    if graph.has_node(node):
+                        candidates.add(node)
+                        candidates.update(graph.get_neighbours(node))
+                worklist = sorted([node for node in candidates if node.op.type in op_types],
+                                  key=graph.nodes_in_order.position)
+        finally:
+            graph.track_changes(False)
+        self.stats.append(PassStats(method_name, time.time() - start, rounds, visited, len(changed)))
+        return self.stats[-1]